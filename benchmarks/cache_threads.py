@@ -0,0 +1,69 @@
+"""Benchmark cache lookups from several threads.
+
+Compares a single :class:`stormpath.cache.memory_store.MemoryStore` (one
+lock) with a :class:`stormpath.cache.memory_store.ShardedMemoryStore` (one
+lock per shard) as the number of threads grows.
+
+Usage::
+
+    python benchmarks/cache_threads.py --threads 1 2 4 8 16 --lookups 50000
+"""
+
+import random
+import time
+
+from argparse import ArgumentParser
+from threading import Thread
+
+from stormpath.cache.cache import Cache
+from stormpath.cache.memory_store import MemoryStore, ShardedMemoryStore
+
+
+def run(cache, hrefs, threads, lookups):
+    def worker(keys):
+        for href in keys:
+            if cache.get(href) is None:
+                cache.put(href, {'href': href})
+
+    # A skewed workload: a few hrefs are much more popular than the others.
+    workloads = []
+    for i in range(threads):
+        r = random.Random(i)
+        workloads.append([hrefs[int(len(hrefs) * r.random() ** 3)] for _ in range(lookups)])
+
+    workers = [Thread(target=worker, args=(keys,)) for keys in workloads]
+    started_at = time.time()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    return threads * lookups / (time.time() - started_at)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--lookups', type=int, default=50000, help='lookups per thread')
+    parser.add_argument('--hrefs', type=int, default=5000)
+    parser.add_argument('--max-entries', type=int, default=2000)
+    parser.add_argument('--shards', type=int, default=ShardedMemoryStore.SHARDS)
+    args = parser.parse_args()
+
+    hrefs = ['https://api.stormpath.com/v1/accounts/%d' % i for i in range(args.hrefs)]
+    stores = [
+        ('memory', MemoryStore, {}),
+        ('sharded', ShardedMemoryStore, {'shards': args.shards}),
+    ]
+
+    print('%-8s %8s %14s %8s' % ('store', 'threads', 'lookups/s', 'hits'))
+    for name, store, opts in stores:
+        for threads in args.threads:
+            opts = dict(opts, max_entries=args.max_entries)
+            cache = Cache(store=store, store_opts=opts)
+            rate = run(cache, hrefs, threads, args.lookups)
+            print('%-8s %8d %14.0f %8.2f' % (name, threads, rate, cache.stats.hit_ratio))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark the cache entry codecs used by remote cache stores.
+
+Usage::
+
+    python benchmarks/codecs.py --entries 10000
+"""
+
+import time
+
+from argparse import ArgumentParser
+
+from stormpath.cache.codecs import EntryCodec, JSONCodec
+from stormpath.cache.entry import CacheEntry
+
+
+def account(i):
+    href = 'https://api.stormpath.com/v1/accounts/%d' % i
+    return {
+        'href': href,
+        'username': 'user%d' % i,
+        'email': 'user%d@example.com' % i,
+        'givenName': 'Given',
+        'surname': 'Surname',
+        'status': 'ENABLED',
+        'createdAt': '2016-01-01T00:00:00.000Z',
+        'modifiedAt': '2016-01-01T00:00:00.000Z',
+        'customData': {'href': href + '/customData'},
+        'directory': {'href': 'https://api.stormpath.com/v1/directories/D'},
+        'groups': {'href': href + '/groups'},
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    args = parser.parse_args()
+
+    entries = [CacheEntry(account(i), etag='"%d"' % i) for i in range(args.entries)]
+    codecs = [
+        ('json', JSONCodec()),
+        ('marshal', EntryCodec()),
+        ('marshal+zlib', EntryCodec(compression='zlib', compress_threshold=256)),
+    ]
+    for name, options in [('msgpack', {}), ('msgpack+lz4', {'compression': 'lz4', 'compress_threshold': 256})]:
+        try:
+            codecs.append((name, EntryCodec('msgpack', **options)))
+        except RuntimeError as e:
+            print('skipping %s: %s' % (name, e))
+
+    print('%-14s %12s %12s %10s' % ('codec', 'encode/s', 'decode/s', 'bytes'))
+    for name, codec in codecs:
+        started_at = time.time()
+        encoded = [codec.encode(entry) for entry in entries]
+        encode_rate = len(entries) / (time.time() - started_at)
+
+        started_at = time.time()
+        for data in encoded:
+            codec.decode(data)
+        decode_rate = len(entries) / (time.time() - started_at)
+
+        print('%-14s %12.0f %12.0f %10.0f' % (name, encode_rate, decode_rate, sum(map(len, encoded)) / float(len(encoded))))
+
+
+if __name__ == '__main__':
+    main()
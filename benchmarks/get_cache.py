@@ -0,0 +1,63 @@
+"""Benchmark the per call overhead of routing hrefs to cache regions.
+
+Compares ``DataStore._get_cache`` (a routing table compiled once, and a memo
+of the recent hrefs) with the previous implementation splitting hrefs on
+every call.
+
+Usage::
+
+    python benchmarks/get_cache.py --calls 1000000
+"""
+
+import timeit
+
+from argparse import ArgumentParser
+from functools import partial
+
+from stormpath.data_store import DataStore, NO_CACHE
+
+
+def split_get_cache(ds, href):
+    # The routing DataStore._get_cache used to do on every call.
+    if '/' not in href:
+        return NO_CACHE
+
+    parts = href.split('/')
+    if parts[-2] in ds.CACHE_REGIONS:
+        return ds.cache_manager.get_cache(parts[-2]) or NO_CACHE
+    elif parts[-1] in ds.CACHE_REGIONS and parts[-1] == 'customData':
+        return ds.cache_manager.get_cache(parts[-1]) or NO_CACHE
+
+    return NO_CACHE
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--calls', type=int, default=1000000)
+    parser.add_argument('--hrefs', type=int, default=1000, help='distinct hrefs')
+    args = parser.parse_args()
+
+    base = 'https://api.stormpath.com/v1'
+    hrefs = []
+    for i in range(args.hrefs):
+        hrefs.append(['%s/accounts/%d' % (base, i), '%s/accounts/%d/customData' % (base, i),
+            '%s/applications/%d/accounts' % (base, i), '%s/groups/%d' % (base, i)][i % 4])
+
+    ds = DataStore(None)
+    n = len(hrefs)
+    calls = args.calls // n * n
+
+    def run(get_cache):
+        return timeit.timeit(lambda: [get_cache(href) for href in hrefs], number=calls // n) / calls * 1e9
+
+    results = [
+        ('split', run(partial(split_get_cache, ds))),
+        ('routes', run(ds._route)),
+        ('routes+memo', run(ds._get_cache)),
+    ]
+    for name, ns in results:
+        print('%-12s %6.0f ns/call' % (name, ns))
+
+
+if __name__ == '__main__':
+    main()
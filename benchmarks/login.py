@@ -0,0 +1,67 @@
+"""Benchmark logins and account reads against the fake Stormpath API.
+
+The fake API runs in process, so the numbers measure the SDK itself plus the
+simulated API latency, and are repeatable without a tenant or a network.
+Pass ``--replay`` to replay a recording made with
+:class:`stormpath.testing.RecordingAdapter` instead.
+
+Usage::
+
+    python benchmarks/login.py --threads 8 --logins 2000 --latency 0.005
+"""
+
+import time
+
+from argparse import ArgumentParser
+from threading import Thread
+
+from stormpath.testing import FakeStormpathAPI, ReplayAdapter
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--logins', type=int, default=1000, help='logins per thread')
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated API latency, in seconds')
+    parser.add_argument('--replay', help='a recording to replay instead of using the fake API')
+    args = parser.parse_args()
+
+    api = FakeStormpathAPI()
+    client = api.client()
+    application = client.applications.create({'name': 'benchmark'}, create_directory=True)
+    emails = ['user%d@example.com' % i for i in range(args.accounts)]
+    for email in emails:
+        application.accounts.create({'email': email, 'password': 'Password1!', 'given_name': 'Bench', 'surname': 'Mark'})
+
+    if args.replay:
+        client = api.client(transport=ReplayAdapter(args.replay, latency=args.latency))
+    else:
+        api.latency = args.latency
+        client = api.client()
+
+    application = client.applications.get(application.href)
+    requests = api.requests
+
+    def worker(offset):
+        for i in range(args.logins):
+            account = application.authenticate_account(emails[(offset + i) % len(emails)], 'Password1!').account
+            account.given_name
+
+    threads = [Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started_at = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - started_at
+
+    logins = args.threads * args.logins
+    print('%d logins in %.2fs: %.0f logins/s, %d API requests' % (logins, elapsed, logins / elapsed, api.requests - requests))
+    for region, stats in sorted(client.data_store.cache_manager.stats.items()):
+        if stats.puts:
+            print('cache %-20s %s' % (region, stats.summary))
+
+
+if __name__ == '__main__':
+    main()
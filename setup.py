@@ -87,7 +87,9 @@ setup(
         'isodate>=0.5.4',
     ],
     extras_require = {
-        'test': ['codacy-coverage', 'mock', 'python-coveralls', 'pytest', 'pytest-cov', 'sphinx'],
+        'async': ['aiohttp'],
+        'streaming': ['ijson'],
+        'test': ['codacy-coverage', 'ijson', 'mock', 'python-coveralls', 'pytest', 'pytest-cov', 'sphinx'],
     },
     packages = find_packages(exclude=['*.tests', '*.tests.*', 'tests.*', 'tests']),
     classifiers = [
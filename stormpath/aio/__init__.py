@@ -0,0 +1 @@
+"""Native asyncio support (requires Python 3.7+ and aiohttp)."""
@@ -0,0 +1,192 @@
+"""Stormpath asyncio API client."""
+
+
+from contextvars import ContextVar
+
+from dateutil.parser import parse
+from pydispatch import dispatcher
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE
+
+from ..auth import Auth
+from ..client import Client
+from ..resources.base import (
+    SIGNAL_RESOURCE_CREATED,
+    SIGNAL_RESOURCE_DELETED,
+    SIGNAL_RESOURCE_UPDATED,
+)
+from ..resources.custom_data import CustomData
+from ..resources.tenant import Tenant
+from .data_store import AsyncDataStore
+from .http import AsyncHttpExecutor
+
+
+class AsyncClient(Client):
+    """The AsyncClient is the asyncio counterpart of
+    :class:`stormpath.client.Client`.
+
+    It exposes the same resources, but all the API calls run on the event
+    loop: resources are loaded with ``await``, collections are iterated with
+    ``async for``, and creating, saving and deleting resources is done with
+    the coroutines of the client. The tenant has to be loaded before its
+    collections can be accessed, which entering the client's context does.
+
+    Examples::
+
+        async with AsyncClient(id='xxx', secret='xxx') as client:
+            application = await client.applications.get(href)
+
+            async for account in application.accounts:
+                ...
+
+            account = await client.create(application.accounts, {
+                'given_name': 'John',
+                'surname': 'Doe',
+                'email': 'john@example.com',
+                'password': 'Password123!',
+            })
+            account.given_name = 'Johnny'
+            await client.save(account)
+            await client.delete(account)
+    """
+
+    def __init__(self, base_url=None, cache_options=None, expand=None, proxies=None, user_agent=None, backoff_strategy=None,
+            pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE, pool_block=DEFAULT_POOLBLOCK,
+            pool_idle_timeout=None, pool_max_age=None, retry_policy=None, circuit_breaker=None,
+            rate_limiter=None, stream_collections=False, transport=None, invalidation_bus=None, **auth_kwargs):
+        """
+        Initialize the client by setting the
+        :class:`stormpath.aio.data_store.AsyncDataStore` and
+        :class:`stormpath.resources.tenant.Tenant`.
+
+        It accepts the same parameters as :class:`stormpath.client.Client`,
+        except ``stream_collections`` and ``transport``: they only apply to
+        the blocking :class:`stormpath.http.HttpExecutor`, and a
+        ``ValueError`` is raised when they are set.
+        """
+        if stream_collections:
+            raise ValueError('The async client does not support stream_collections.')
+        if transport is not None:
+            raise ValueError('The async client does not support custom transports.')
+
+        self.BASE_URL = base_url or self.BASE_URL
+
+        self.auth = Auth(**auth_kwargs)
+        executor = AsyncHttpExecutor(self.BASE_URL, self.auth.scheme, proxies, user_agent=user_agent, get_delay=backoff_strategy,
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block,
+            pool_idle_timeout=pool_idle_timeout, pool_max_age=pool_max_age, retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker, rate_limiter=rate_limiter)
+        self.data_store = AsyncDataStore(executor, cache_options, invalidation_bus)
+        self.tenant = Tenant(client=self, href='/tenants/current', expand=expand)
+        self._identity_map = ContextVar('stormpath_identity_map', default=None)
+
+    @property
+    def identity_map(self):
+        """The identity map of the current session, see
+        :meth:`stormpath.client.Client.session`. Sessions are bound to the
+        current context instead of the current thread, so that every task
+        (i.e. every request) gets its own."""
+        return self._identity_map.get()
+
+    def _bind_identity_map(self, identity_map):
+        return self._identity_map.set(identity_map)
+
+    def _unbind_identity_map(self, token):
+        self._identity_map.reset(token)
+
+    async def create(self, collection, properties=None, expand=None, **params):
+        """Create a new resource in the collection.
+
+        :param collection: The collection to create the resource in, e.g.
+            ``application.accounts``.
+        :param dict properties: The properties of the new resource.
+        :returns: The created resource.
+        """
+        if properties is None:
+            properties = {}
+        data, params = collection._prepare_for_create(properties, expand, **params)
+
+        created = collection.resource_class(
+            self,
+            properties=await self.data_store.create_resource(collection._get_create_path(), data, params=params)
+        )
+        dispatcher.send(signal=SIGNAL_RESOURCE_CREATED, sender=collection.resource_class, data=data, params=params)
+
+        return created
+
+    async def save(self, resource):
+        """Save the changes made to the resource (and its autosaved
+        sub-resources, like custom data)."""
+        if resource.is_new():
+            raise ValueError("Can't save new resources, use create instead.")
+
+        properties = resource._get_properties()
+
+        if isinstance(resource, CustomData):
+            for href in resource._deletes:
+                await self.data_store.delete_resource(href)
+
+            resource._deletes = set()
+
+            if not properties:
+                return
+
+        data = await self.data_store.update_resource(resource.href, properties)
+
+        dispatcher.send(signal=SIGNAL_RESOURCE_UPDATED, sender=resource, href=resource.href, properties=properties)
+
+        if 'modified_at' in resource.__dict__ and 'modifiedAt' in data:
+            resource.__dict__['modified_at'] = parse(data.get('modifiedAt'))
+
+        for res in resource.autosaves:
+            if res in resource.__dict__:
+                await self.save(resource.__dict__[res])
+
+    async def delete(self, resource):
+        """Delete the resource."""
+        if resource.is_new():
+            return
+
+        await self.data_store.delete_resource(resource.href)
+        dispatcher.send(signal=SIGNAL_RESOURCE_DELETED, sender=resource, href=resource.href)
+
+    async def _preload_collection(self, href, kind, limit):
+        items = []
+        while True:
+            params = dict(self._get_warm_cache_params(kind, limit), offset=len(items), limit=limit)
+            page = await self.data_store.preload_resource(href, params=params)
+            items.extend(page.get('items', []))
+
+            if not page.get('items') or len(items) >= page.get('size', 0):
+                return items
+
+    async def warm_cache(self, applications=None, limit=100):
+        """Fetch and cache the resources needed by the first requests of
+        most applications, see :meth:`stormpath.client.Client.warm_cache`.
+        Connections are kept open."""
+        store = self.data_store
+        tenant = await store.get_resource(self.tenant.href)
+
+        if applications is None:
+            applications = await self._preload_collection(tenant['applications']['href'], 'applications', limit)
+            await self._preload_collection(tenant['directories']['href'], 'directories', limit)
+            directories = []
+        else:
+            applications = [await store.preload_resource(getattr(application, 'href', application),
+                params=self._get_warm_cache_params('applications', limit)) for application in applications]
+            directories = [mapping['accountStore']['href'] for application in applications
+                for mapping in application.get('accountStoreMappings', {}).get('items', [])
+                if '/directories/' in mapping.get('accountStore', {}).get('href', '')]
+
+        for href in sorted(set(directories)):
+            await store.preload_resource(href, params=self._get_warm_cache_params('directories', limit))
+
+    async def close(self):
+        """Close the connections held by the client."""
+        await self.data_store.executor.close()
+
+    async def __aenter__(self):
+        await self.tenant
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,173 @@
+"""Asyncio data store abstractions."""
+
+
+import asyncio
+
+from ..data_store import DataStore
+from ..error import CircuitOpenError, Error
+
+
+class AsyncDataStore(DataStore):
+    """
+    The AsyncDataStore is the asyncio counterpart of
+    :class:`stormpath.data_store.DataStore`. It shares the cache regions and
+    cache handling with the blocking data store, but every API call is a
+    coroutine executed by :class:`stormpath.aio.http.AsyncHttpExecutor`.
+
+    Resources bound to an async data store are not lazy loaded on attribute
+    access, they are loaded with ``await resource`` and collections are
+    iterated with ``async for``.
+
+    Examples::
+
+        data = await data_store.get_resource('https://api.stormpath.com/v1/accounts/xxx')
+        account = await client.accounts.get(href)
+
+        async for account in application.accounts:
+            ...
+    """
+    is_async = True
+
+    def __init__(self, executor, cache_options=None, invalidation_bus=None):
+        super(AsyncDataStore, self).__init__(executor, cache_options, invalidation_bus)
+        self._pending = {}
+
+    async def _fetch_resource(self, href, params=None):
+        cache = self._get_cache(href)
+        entry, headers = self._get_fetch_headers(cache, href, params)
+
+        if headers is None:
+            data = await self.executor.get(href, params=params)
+        else:
+            data = await self.executor.get(href, params=params, headers=headers)
+            if data.get('sp_http_status') == 304:
+                cache.revalidate(href, entry)
+                return entry.value
+
+        self._cache_fetched(href, data, params)
+
+        return data
+
+    def _get_fetch(self, href, params=None):
+        # Coroutines waiting for the same resource share a single fetch.
+        key = self._get_request_key(href, params)
+        stats = self.single_flight
+        stats.calls += 1
+
+        fetch = self._pending.get(key)
+        if fetch is None:
+            fetch = self._pending[key] = asyncio.ensure_future(self._fetch_resource(href, params=params))
+            fetch.add_done_callback(lambda f: self._pending.pop(key, None))
+            stats.fetches += 1
+        else:
+            stats.collapsed += 1
+
+        return fetch
+
+    def _refresh_resource(self, href, params=None):
+        # Refreshes run as tasks on the event loop instead of the refresher
+        # thread, and are shared with the pending fetches.
+        key = self._get_request_key(href, params)
+        if key in self._pending:
+            self.refresher.deduplicated += 1
+            return
+
+        self.refresher.scheduled += 1
+        self._get_fetch(href, params=params).add_done_callback(self._refreshed)
+
+    def _refreshed(self, fetch):
+        if fetch.cancelled() or fetch.exception() is not None:
+            self.refresher.failed += 1
+        else:
+            self.refresher.refreshed += 1
+
+    async def get_resource(self, href, params=None):
+        data = self._cache_get_resource(href, params)
+        if data is None:
+            self._raise_if_not_found(href)
+
+            try:
+                data = await asyncio.shield(self._get_fetch(href, params=params))
+            except CircuitOpenError:
+                data = self._cache_get_stale(href)
+                if data is None:
+                    raise
+            except Error as e:
+                self._cache_not_found(href, e)
+                raise
+
+        return data
+
+    async def create_resource(self, href, data, params=None):
+        data = await self.executor.post(href, data, params=params)
+        self._cache_put(href, data)
+        self._expire_queries(href)
+        if 'href' in data:
+            self._uncache_not_found(data['href'])
+            self._publish(data['href'])
+
+        return data
+
+    async def update_resource(self, href, data):
+        data = await self.executor.post(href, data)
+        self._cache_put(href, data, new=False)
+        self._expire_queries(href)
+        self._publish(href)
+
+        return data
+
+    async def delete_resource(self, href):
+        await self.executor.delete(href)
+        self.uncache_resource(href)
+        self._publish(href)
+
+    async def preload_resource(self, href, params=None):
+        data = await self.executor.get(href, params=params)
+        self._cache_fetched(href, data, params)
+
+        return data
+
+    async def load_resource(self, resource, overwrite=False):
+        """
+        Fetch the resource data and hydrate the resource with it.
+
+        :param resource: The resource to load.
+        :type resource: :class:`stormpath.resources.base.Resource`
+        :returns: The loaded resource.
+        """
+        if not resource.is_new():
+            data = await self.get_resource(resource.href, params=resource._get_params())
+            resource._set_properties(data, overwrite=overwrite)
+
+        return resource
+
+    async def iter_collection(self, collection):
+        """
+        Asynchronously iterate over all the items of a collection, fetching
+        the following pages as needed.
+
+        :param collection: The collection to iterate over.
+        :type collection: :class:`stormpath.resources.base.CollectionResource`
+        """
+        await self.load_resource(collection)
+
+        items = collection.__dict__['items']
+        offset = collection.__dict__['offset']
+        limit = collection.__dict__['limit']
+
+        while len(items) > 0:
+            for item in items:
+                yield item
+
+            # don't attempt to do another page as we've fetched all items
+            if len(items) < limit:
+                break
+
+            offset += len(items)
+            params = collection._get_next_page_params(offset, limit)
+            if params is None:
+                break
+
+            items = collection._add_page(await self.get_resource(collection.href, params=params))
+
+        collection.__dict__['limit'] = limit
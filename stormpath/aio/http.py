@@ -0,0 +1,210 @@
+"""Asyncio HTTP request handling utilities."""
+
+import asyncio
+import json
+import time
+
+from collections import OrderedDict
+from json import dumps
+
+from requests import Request
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE
+from requests.structures import CaseInsensitiveDict
+
+from ..error import Error
+from ..http import HttpExecutor
+from ..retry import RetryPolicy
+
+
+class AsyncResponse(object):
+    """A fully read HTTP response.
+
+    It exposes the subset of the :class:`requests.Response` interface used
+    by :class:`stormpath.http.HttpExecutor`, so response and error handling
+    can be shared between the blocking and the async executors.
+    """
+
+    def __init__(self, status_code, headers, content, encoding=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncHttpExecutor(HttpExecutor):
+    """Handles HTTP requests to the Stormpath service on an asyncio event
+    loop.
+
+    It uses the aiohttp library: https://aiohttp.readthedocs.io/. Requests are
+    signed by the same authentication handlers as
+    :class:`stormpath.http.HttpExecutor`, retried with the same rules, and
+    their responses are processed the same way. A single connection pool is
+    shared by all the coroutines running on the loop.
+
+    :param base_url: The root of the Stormpath service.
+        Paths to specific resources will be prepended by this url.
+
+    :param auth: Authentication manager, like
+        :class:`stormpath.auth.Sauthc1Signer`.
+
+    :param get_delay: A Function that will return the number of milliseconds
+        to wait before retrying the request (see
+        :meth:`stormpath.http.HttpExecutor.get_backoff_delay`).
+
+    :param pool_maxsize: The maximum number of connections per host. It is
+        only enforced when ``pool_block`` is True, aiohttp doesn't have
+        overflow connections.
+
+    :param pool_idle_timeout: Number of seconds idle keep-alive connections
+        are kept open.
+
+    ``pool_connections`` and ``pool_max_age`` are accepted for compatibility
+    with :class:`stormpath.http.HttpExecutor` and ignored.
+    """
+
+    def __init__(self, base_url, auth, proxies=None, user_agent=None, get_delay=None,
+            pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE, pool_block=DEFAULT_POOLBLOCK,
+            pool_idle_timeout=None, pool_max_age=None, retry_policy=None, circuit_breaker=None,
+            rate_limiter=None):
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError('Asyncio support is not available. Run "pip install aiohttp".')
+
+        self._aiohttp = aiohttp
+
+        if user_agent is not None:
+            self.USER_AGENT = user_agent + ' ' + self.USER_AGENT
+
+        self.get_delay = get_delay
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.rate_limiter = rate_limiter
+        self.base_url = base_url
+        self.auth = auth
+        self.proxies = proxies or {}
+        self.headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Content-Type': 'application/json',
+            'User-Agent': self.USER_AGENT,
+        }
+        self.connector_options = {'limit_per_host': pool_maxsize if pool_block else 0}
+        if pool_idle_timeout is not None:
+            self.connector_options['keepalive_timeout'] = pool_idle_timeout
+
+        self.session = None
+
+    @property
+    def pool_stats(self):
+        return None
+
+    def is_throttling_or_unexpected_error(self, status):
+        if isinstance(status, (self._aiohttp.ClientError, asyncio.TimeoutError)):
+            return True
+
+        return super(AsyncHttpExecutor, self).is_throttling_or_unexpected_error(status)
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = self._aiohttp.TCPConnector(**self.connector_options)
+            self.session = self._aiohttp.ClientSession(connector=connector)
+
+        return self.session
+
+    def _sign(self, method, url, data, params, headers):
+        request_headers = dict(self.headers)
+        if headers:
+            request_headers.update(headers)
+
+        prepared = Request(method, url, data=data, params=params, headers=request_headers).prepare()
+        if self.auth is not None:
+            prepared = self.auth(prepared)
+
+        return prepared
+
+    async def _send(self, method, url, data=None, params=None, headers=None, timeout=None):
+        prepared = self._sign(method, url, data, params, headers)
+        proxy = self.proxies.get(url.split(':', 1)[0])
+
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = self._aiohttp.ClientTimeout(total=timeout)
+
+        async with self._get_session().request(
+                prepared.method, prepared.url, data=prepared.body,
+                headers=dict(prepared.headers), proxy=proxy,
+                allow_redirects=False, **kwargs) as r:
+            content = await r.read()
+
+            return AsyncResponse(r.status, r.headers, content, r.charset)
+
+    async def request(self, method, url, data=None, params=None, headers=None, retry_count=0):
+        if params:
+            params = OrderedDict(sorted(params.items()))
+
+        if not url.startswith(self.base_url):
+            url = self.base_url + url
+
+        deadline = self.retry_policy.get_deadline()
+        self.retry_policy.start()
+
+        while True:
+            self.check_circuit()
+            if self.rate_limiter is not None:
+                await asyncio.sleep(self.rate_limiter.reserve())
+
+            r = None
+            started_at = time.time()
+            try:
+                r = await self._send(method, url, data=data, params=params, headers=headers,
+                    timeout=self.get_attempt_timeout(deadline))
+            except Exception as e:
+                status = e
+                self.record_attempt(status, started_at)
+            else:
+                self.record_attempt(r.status_code, started_at, r.headers)
+
+                if r.status_code in [301, 302] and 'location' in r.headers:
+                    if not r.headers['location'].startswith(self.base_url):
+                        message = 'Trying to redirect outside of API base url: {}'.format(r.headers['location'])
+                        raise Error({'developerMessage': message})
+
+                    return await self.request('GET', r.headers['location'], params=params)
+
+                if not (r.status_code >= 400 and r.status_code <= 600):
+                    return self.return_response(r)
+
+                status = r.status_code
+
+            delay = self.get_retry_delay(method, retry_count, status, response=r, deadline=deadline)
+            if delay is None:
+                if r is None:
+                    raise Error({'developerMessage': str(status)})
+
+                self.raise_error(r)
+
+            await asyncio.sleep(delay / float(1000))
+            retry_count += 1
+
+    async def get(self, url, params=None, headers=None):
+        return await self.request('GET', url, params=params, headers=headers)
+
+    async def post(self, url, data, params=None, headers=None):
+        return await self.request('POST', url, data=dumps(data), params=params, headers=headers)
+
+    async def delete(self, url):
+        return await self.request('DELETE', url)
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+        self.session = None
@@ -2,7 +2,8 @@
 
 
 from .entry import CacheEntry
-from .memory_store import MemoryStore
+from .memory_store import MemoryStore, ShardedMemoryStore
+from .sqlite_store import SQLiteStore
 from .stats import CacheStats
 
 
@@ -13,50 +14,185 @@ class Cache(object):
     :class:`stormpath.cache.memory_store.MemoryStore`.
     It also provides usage statistics with
     :class:`stormpath.cache.stats.CacheStats`.
+
+    With a ``stale_ttl`` (in seconds), expired entries are kept around for
+    that much longer so they can be served with :meth:`get_stale` when the
+    Stormpath API is unavailable.
+
+    Expired entries with ``ETag`` or ``Last-Modified`` validators can be
+    kept as well, so they can be revalidated (see :meth:`revalidate`).
+
+    Two options let :meth:`get` hide refresh latency from callers which pass
+    a ``refresh`` callback:
+
+    * ``stale_while_revalidate`` (in seconds): entries which expired less
+      than that long ago are still returned, and ``refresh`` is called so
+      the entry can be updated in the background.
+    * ``refresh_ahead_ratio`` (between 0 and 1): ``refresh`` is called as
+      soon as an entry is older than that fraction of its ``ttl``, so that
+      popular entries are refreshed before they expire.
+
+    ``region`` is the name of the cache region, set by
+    :class:`stormpath.cache.manager.CacheManager`. It is passed along to
+    :class:`stormpath.cache.sqlite_store.SQLiteStore` instances, so that the
+    regions sharing a database file don't share their entries.
     """
     DEFAULT_STORE = MemoryStore
+    MEMORY_STORES = (MemoryStore, ShardedMemoryStore)
+    BOUNDED_STORES = MEMORY_STORES + (SQLiteStore,)
     DEFAULT_TTL = 5 * 60  # seconds
     DEFAULT_TTI = 5 * 60  # seconds
 
     def __init__(self, store=DEFAULT_STORE, ttl=DEFAULT_TTL, tti=DEFAULT_TTI,
-            **kwargs):
+            stale_ttl=0, stale_while_revalidate=0, refresh_ahead_ratio=None, region=None, **kwargs):
+        if refresh_ahead_ratio is not None and not 0 < refresh_ahead_ratio < 1:
+            raise ValueError('refresh_ahead_ratio must be between 0 and 1.')
+
         self.ttl = ttl
         self.tti = tti
+        self.stale_ttl = stale_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.refresh_ahead_ratio = refresh_ahead_ratio
         store_opts = kwargs.get('store_opts', {})
 
-        # Pass along max entries only to memory store instances.
-        if store != MemoryStore:
+        # Pass along max entries and the eviction policy only to memory store
+        # instances (and max entries to the other bounded stores).
+        if store not in self.BOUNDED_STORES:
             store_opts.pop('max_entries', None)
+        if store not in self.MEMORY_STORES:
+            store_opts.pop('max_bytes', None)
+            store_opts.pop('policy', None)
+            store_opts.pop('shards', None)
+        if store is SQLiteStore and region is not None:
+            # Regions often share their store options, don't change them.
+            store_opts = dict(store_opts, region=region)
 
         self.store = store(**store_opts)
         self.stats = CacheStats()
-
-    def get(self, key):
-        entry = self.store[key]
-
+        # Only memory stores keep track of the size of their entries.
+        if isinstance(self.store, self.MEMORY_STORES):
+            self.stats.track_bytes(self.store)
+
+    def get(self, key, revalidate=False, refresh=None):
+        return self._get_value(key, self.store[key], revalidate, refresh)
+
+    def get_many(self, keys, revalidate=False):
+        """Get the values of several keys at once, with a single round trip
+        for stores supporting batches. Returns a dict of the keys found."""
+        keys = list(keys)
+        get_many = getattr(self.store, 'get_many', None)
+        if get_many is None:
+            entries = dict((key, self.store[key]) for key in keys)
+        else:
+            entries = get_many(keys) or {}
+
+        values = {}
+        for key in keys:
+            value = self._get_value(key, entries.get(key), revalidate)
+            if value is not None:
+                values[key] = value
+
+        return values
+
+    def _get_value(self, key, entry, revalidate=False, refresh=None):
         if entry:
             if entry.is_expired(self.ttl, self.tti):
+                if refresh is not None and self.stale_while_revalidate and \
+                        not self._is_expired_by(entry, self.stale_while_revalidate):
+                    self.stats.stale_hit()
+                    refresh()
+                    return entry.value
+
                 self.stats.miss(expired=True)
-                del self.store[key]
+
+                grace = max(self.stale_ttl, self.stale_while_revalidate)
+                keep = revalidate and entry.has_validators
+                if not keep and (not grace or self._is_expired_by(entry, grace)):
+                    del self.store[key]
 
                 return None
 
             self.stats.hit()
             entry.touch()
 
+            if refresh is not None and self.refresh_ahead_ratio and \
+                    entry.is_expired(self.ttl * self.refresh_ahead_ratio, self.tti):
+                refresh()
+
             return entry.value
 
         self.stats.miss()
         return None
 
-    def put(self, key, value, new=True):
-        self.store[key] = CacheEntry(value)
+    def _is_expired_by(self, entry, grace):
+        return entry.is_expired(self.ttl + grace, self.tti + grace)
+
+    def _is_too_stale(self, entry):
+        return self._is_expired_by(entry, self.stale_ttl)
+
+    def get_stale(self, key):
+        """Get the value of an entry even if it expired less than
+        ``stale_ttl`` seconds ago."""
+        if not self.stale_ttl:
+            return None
+
+        entry = self.store[key]
+        if entry and not self._is_too_stale(entry):
+            self.stats.stale_hit()
+            return entry.value
+
+        return None
+
+    def get_entry(self, key):
+        """Get the raw cache entry, even if it has expired."""
+        return self.store[key]
+
+    def revalidate(self, key, entry):
+        """Mark an expired entry as fresh, because the Stormpath API
+        confirmed that it hasn't changed."""
+        entry.refresh()
+        self.store[key] = entry
+        self.stats.revalidation()
+
+    def put(self, key, value, new=True, validators=None):
+        self.store[key] = CacheEntry(value, **(validators or {}))
         self.stats.put(new=new)
 
+    def put_many(self, items, new=True, validators=None):
+        """Put several ``(key, value)`` pairs at once, with a single round
+        trip for stores supporting batches.
+
+        :param validators: The validators of some of the keys, as a dict.
+        """
+        validators = validators or {}
+        entries = [(key, CacheEntry(value, **validators.get(key, {}))) for key, value in items]
+
+        put_many = getattr(self.store, 'put_many', None)
+        if put_many is None:
+            for key, entry in entries:
+                self.store[key] = entry
+        else:
+            put_many(entries)
+
+        for _ in entries:
+            self.stats.put(new=new)
+
     def delete(self, key):
         del self.store[key]
         self.stats.delete()
 
+    def delete_many(self, keys):
+        keys = list(keys)
+        delete_many = getattr(self.store, 'delete_many', None)
+        if delete_many is None:
+            for key in keys:
+                del self.store[key]
+        else:
+            delete_many(keys)
+
+        for _ in keys:
+            self.stats.delete()
+
     def clear(self):
         self.store.clear()
         self.stats.clear()
@@ -0,0 +1,126 @@
+"""Cache entry codecs, serializing entries for remote cache stores."""
+
+import marshal
+import struct
+import zlib
+
+from json import dumps, loads
+
+from .entry import CacheEntry
+
+
+class JSONCodec(object):
+    """The original cache entry format: :meth:`CacheEntry.to_dict` as JSON,
+    with formatted timestamps. It is the default, since it's the only format
+    older versions of the SDK can read."""
+
+    def encode(self, entry):
+        return dumps(entry.to_dict()).encode('utf-8')
+
+    def decode(self, data):
+        return CacheEntry.parse(loads(data.decode('utf-8')))
+
+
+class EntryCodec(object):
+    """A compact binary cache entry format.
+
+    Entries are serialized as a tuple of their value, epoch timestamps and
+    validators (with marshal or msgpack), optionally compressed when they
+    are larger than ``compress_threshold`` bytes, and prefixed by a header::
+
+        MAGIC (1 byte) | VERSION (1 byte) | serializer (1 byte) | flags (1 byte)
+
+    The header lets any codec decode entries written with another
+    serializer or compression, entries in the original JSON format (see
+    :class:`JSONCodec`) written by older versions of the SDK, and ignore
+    (treat as cache misses) entries written by future versions.
+
+    :param serializer: ``'marshal'`` (the default, fast and part of the
+        standard library) or ``'msgpack'`` (portable between Python
+        versions, requires the msgpack library).
+
+    :param compression: ``None`` (the default), ``'zlib'`` or ``'lz4'``
+        (requires the lz4 library).
+
+    :param compress_threshold: The minimum size, in bytes, of the serialized
+        entries which are compressed.
+
+    Example, in the cache options::
+
+        'store': RedisStore,
+        'store_opts': {'codec': EntryCodec('msgpack', compression='zlib')},
+    """
+    MAGIC = b'\xfe'  # never the first byte of a JSON (UTF-8) document
+    VERSION = 1
+    HEADER = struct.Struct('>cBcB')
+    SERIALIZERS = {'marshal': b'm', 'msgpack': b'p'}
+    COMPRESSED = {'zlib': 1, 'lz4': 2}
+
+    def __init__(self, serializer='marshal', compression=None, compress_threshold=1024):
+        if serializer not in self.SERIALIZERS:
+            raise ValueError('Unknown cache entry serializer %r.' % serializer)
+        if compression is not None and compression not in self.COMPRESSED:
+            raise ValueError('Unknown cache entry compression %r.' % compression)
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self._dumps, _ = self._get_serializer(serializer)
+        if compression is not None:
+            self._compress, _ = self._get_compressor(compression)
+
+    @staticmethod
+    def _get_serializer(name):
+        if name == 'marshal':
+            return lambda obj: marshal.dumps(obj, 2), marshal.loads
+
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError('Msgpack support is not available. Run "pip install msgpack".')
+
+        return lambda obj: msgpack.packb(obj, use_bin_type=True), lambda data: msgpack.unpackb(data, raw=False)
+
+    @staticmethod
+    def _get_compressor(name):
+        if name == 'zlib':
+            return zlib.compress, zlib.decompress
+
+        try:
+            import lz4.frame
+        except ImportError:
+            raise RuntimeError('LZ4 support is not available. Run "pip install lz4".')
+
+        return lz4.frame.compress, lz4.frame.decompress
+
+    def encode(self, entry):
+        data = self._dumps((entry.value, entry.created_at, entry.last_accessed_at, entry.etag, entry.last_modified))
+
+        flags = 0
+        if self.compression is not None and len(data) >= self.compress_threshold:
+            data = self._compress(data)
+            flags = self.COMPRESSED[self.compression]
+
+        return self.HEADER.pack(self.MAGIC, self.VERSION, self.SERIALIZERS[self.serializer], flags) + data
+
+    def decode(self, data):
+        if data[:1] != self.MAGIC:
+            return JSONCodec().decode(data)
+
+        _, version, code, flags = self.HEADER.unpack(data[:self.HEADER.size])
+        if version > self.VERSION:
+            return None
+
+        data = data[self.HEADER.size:]
+        for name, flag in self.COMPRESSED.items():
+            if flags == flag:
+                data = self._get_compressor(name)[1](data)
+
+        serializers = [name for name, c in self.SERIALIZERS.items() if c == code]
+        if not serializers:
+            return None
+
+        value, created_at, last_accessed_at, etag, last_modified = self._get_serializer(serializers[0])[1](data)
+
+        return CacheEntry(value, created_at=created_at, last_accessed_at=last_accessed_at, etag=etag,
+            last_modified=last_modified)
@@ -2,42 +2,89 @@
 
 
 from datetime import datetime, timedelta
+from time import time
+
+
+EPOCH = datetime(1970, 1, 1)
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def to_timestamp(d):
+    """Convert a naive UTC datetime to seconds since the epoch."""
+    return (d - EPOCH).total_seconds()
+
+
+def from_timestamp(ts):
+    """Convert seconds since the epoch to a naive UTC datetime."""
+    return EPOCH + timedelta(seconds=ts)
 
 
 class CacheEntry(object):
     """A single entry inside a cache.
 
     It contains the data as originally returned by Stormpath along with
-    additional metadata like timestamps.
+    additional metadata like timestamps (in seconds since the epoch), and
+    the ``ETag`` and ``Last-Modified`` validators used to revalidate the
+    entry once it expires.
+
+    Entries are read on every cache hit, so they are slotted and their
+    expiry is checked with plain float arithmetic. Nothing is memoized on
+    the entry, since it is shared by threads which check it with different
+    ``ttl`` and ``tti`` (e.g. refresh-ahead and stale grace windows).
     """
+    __slots__ = ('value', 'created_at', 'last_accessed_at', 'etag', 'last_modified')
+
+    def __init__(self, value, created_at=None, last_accessed_at=None, etag=None, last_modified=None):
+        if isinstance(created_at, datetime):
+            created_at = to_timestamp(created_at)
+        if isinstance(last_accessed_at, datetime):
+            last_accessed_at = to_timestamp(last_accessed_at)
 
-    def __init__(self, value, created_at=None, last_accessed_at=None):
         self.value = value
-        self.created_at = created_at or datetime.utcnow()
+        self.created_at = created_at or time()
         self.last_accessed_at = last_accessed_at or self.created_at
+        self.etag = etag
+        self.last_modified = last_modified
 
     def touch(self):
-        self.last_accessed_at = datetime.utcnow()
+        self.last_accessed_at = time()
+
+    def refresh(self):
+        """Mark the entry as fresh again, e.g. after a successful
+        revalidation."""
+        self.created_at = self.last_accessed_at = time()
+
+    @property
+    def has_validators(self):
+        return bool(self.etag or self.last_modified)
 
     def is_expired(self, ttl, tti):
-        now = datetime.utcnow()
-        return (now >= self.created_at + timedelta(seconds=ttl) or now >= self.last_accessed_at + timedelta(seconds=tti))
+        now = time()
+        return now >= self.created_at + ttl or now >= self.last_accessed_at + tti
 
     @classmethod
     def parse(cls, data):
         def parse_date(val):
             try:
-                return datetime.strptime(val, '%Y-%m-%d %H:%M:%S.%f')
+                return to_timestamp(datetime.strptime(val, DATE_FORMAT))
             except Exception:
                 return None
 
-        return cls(data.get('value'), created_at=parse_date(data.get('created_at')), last_accessed_at=parse_date(data.get('last_accessed_at')))
+        return cls(data.get('value'), created_at=parse_date(data.get('created_at')), last_accessed_at=parse_date(data.get('last_accessed_at')),
+            etag=data.get('etag'), last_modified=data.get('last_modified'))
 
     def to_dict(self):
-        format_date = lambda d: d.strftime('%Y-%m-%d %H:%M:%S.%f')
+        format_date = lambda ts: from_timestamp(ts).strftime(DATE_FORMAT)
 
-        return {
+        data = {
             'created_at': format_date(self.created_at),
             'last_accessed_at': format_date(self.last_accessed_at),
             'value': self.value,
         }
+
+        if self.etag:
+            data['etag'] = self.etag
+        if self.last_modified:
+            data['last_modified'] = self.last_modified
+
+        return data
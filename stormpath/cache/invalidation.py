@@ -0,0 +1,280 @@
+"""Cache invalidation buses, broadcasting evictions between processes."""
+
+import errno
+import os
+import socket
+import weakref
+
+from collections import namedtuple
+from json import dumps, loads
+from tempfile import gettempdir
+from threading import Lock, Thread
+from uuid import uuid4
+
+
+class InvalidationBus(object):
+    """Broadcasts the hrefs of modified or deleted resources to all the
+    subscribed data stores, in this process and in others, so that they
+    evict them from their caches instead of serving them until they expire.
+
+    Publishing is best effort: failures, of the bus or of a subscriber, are
+    counted in ``failed`` but never raised, since entries still expire
+    according to the cache TTLs.
+
+    Subclasses implement :meth:`_start` (start receiving messages and hand
+    them to :meth:`_received`), :meth:`_send` and :meth:`_stop`. A bus used
+    before a fork starts again in the child process, so that every worker of
+    a preforking server gets its own subscription.
+    """
+    Summary = namedtuple('InvalidationBusStats', 'published received failed')
+
+    def __init__(self):
+        self.callbacks = []
+        self.published = 0
+        self.received = 0
+        self.failed = 0
+        self._lock = Lock()
+        self._pid = None
+        self._closed = False
+
+        if hasattr(os, 'register_at_fork'):
+            ref = weakref.ref(self)
+
+            def restart():
+                bus = ref()
+                if bus is not None and bus.callbacks:
+                    # Another thread may have held the lock while forking.
+                    bus._lock = Lock()
+                    bus._ensure_started()
+
+            os.register_at_fork(after_in_child=restart)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._closed:
+                return False
+
+            if self._pid != os.getpid():
+                # Messages we sent are ignored by origin, a new process needs
+                # a new one.
+                self.origin = uuid4().hex
+                self._start()
+                self._pid = os.getpid()
+
+            return True
+
+    def subscribe(self, callback):
+        """Call ``callback(href)`` for each href published to the bus."""
+        self.callbacks.append(callback)
+        self._ensure_started()
+
+    def unsubscribe(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def publish(self, href, exclude=None):
+        """Evict ``href`` from the caches of all the subscribers, except
+        the ``exclude`` callback (the publisher, which is already up to
+        date)."""
+        if not self._ensure_started():
+            return
+
+        self._notify(href, exclude)
+
+        try:
+            self._send(dumps({'origin': self.origin, 'href': href}).encode('utf-8'))
+        except Exception:
+            self.failed += 1
+        else:
+            self.published += 1
+
+    def _notify(self, href, exclude=None):
+        for callback in list(self.callbacks):
+            if callback == exclude:
+                continue
+
+            # A failing subscriber must neither stop the others nor the
+            # thread receiving messages, nor fail the publisher.
+            try:
+                callback(href)
+            except Exception:
+                self.failed += 1
+
+    def _received(self, message):
+        try:
+            message = loads(message.decode('utf-8'))
+        except ValueError:
+            return
+
+        # Local subscribers were notified when the message was published.
+        if not isinstance(message, dict) or 'href' not in message or message.get('origin') == self.origin:
+            return
+
+        self.received += 1
+        self._notify(message['href'])
+
+    def close(self):
+        """Stop receiving and publishing messages."""
+        with self._lock:
+            if self._pid == os.getpid():
+                self._stop()
+
+            self._pid = None
+            self._closed = True
+
+    def _start(self):
+        raise NotImplementedError
+
+    def _send(self, message):
+        raise NotImplementedError
+
+    def _stop(self):
+        raise NotImplementedError
+
+    @property
+    def summary(self):
+        return self.Summary(self.published, self.received, self.failed)
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """An invalidation bus between the processes of a single host, like the
+    workers of a gunicorn or uWSGI server.
+
+    Every process binds a unix datagram socket in the ``path`` directory,
+    and messages are sent to all the sockets found there. Sockets left
+    behind by dead processes are removed when sending to them fails.
+
+    :param path: The directory shared by the processes. Defaults to
+        ``stormpath-invalidation`` in the temporary directory.
+
+    Example::
+
+        client = Client(id='xxx', secret='xxx', invalidation_bus=LocalInvalidationBus())
+    """
+    MAX_MESSAGE_SIZE = 8192
+
+    def __init__(self, path=None):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError('Local invalidation is only available on platforms with unix sockets.')
+
+        self.path = path or os.path.join(gettempdir(), 'stormpath-invalidation')
+        self._socket = None
+        self._address = None
+        super(LocalInvalidationBus, self).__init__()
+
+    def _start(self):
+        try:
+            os.makedirs(self.path, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        self._address = os.path.join(self.path, '%s.sock' % self.origin)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self._address)
+
+        t = Thread(target=self._run, args=(self._socket,), name='stormpath-invalidation')
+        t.daemon = True
+        t.start()
+
+    def _run(self, sock):
+        while True:
+            try:
+                message = sock.recv(self.MAX_MESSAGE_SIZE)
+            except (OSError, socket.error):
+                return
+
+            if sock is not self._socket:
+                sock.close()
+                return
+
+            self._received(message)
+
+    def _send(self, message):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for name in os.listdir(self.path):
+                address = os.path.join(self.path, name)
+                if not name.endswith('.sock') or address == self._address:
+                    continue
+
+                try:
+                    sock.sendto(message, address)
+                except (OSError, socket.error) as e:
+                    if e.errno in (errno.ECONNREFUSED, errno.ENOENT):
+                        self._remove(address)
+                    else:
+                        raise
+        finally:
+            sock.close()
+
+    @staticmethod
+    def _remove(address):
+        try:
+            os.remove(address)
+        except OSError:
+            pass
+
+    def _stop(self):
+        # Closing a socket doesn't wake up a thread blocked reading it, the
+        # receiving thread closes it after an empty wake up message.
+        self._socket = None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.sendto(b'', self._address)
+        except (OSError, socket.error):
+            pass
+        finally:
+            sock.close()
+
+        self._remove(self._address)
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """An invalidation bus between processes on any number of hosts, using
+    Redis pub/sub.
+
+    :param channel: The Redis channel messages are published to.
+    :param redis_opts: The options of the Redis client (host, port, db,
+        password, ...), see :class:`stormpath.cache.redis_store.RedisStore`.
+
+    Example::
+
+        bus = RedisInvalidationBus(host='redis.example.com')
+        client = Client(id='xxx', secret='xxx', invalidation_bus=bus)
+    """
+    CHANNEL = 'stormpath:invalidations'
+
+    def __init__(self, channel=CHANNEL, **redis_opts):
+        try:
+            from redis import Redis
+        except ImportError:
+            raise RuntimeError('Redis support is not available. Run "pip install redis".')
+
+        self.channel = channel
+        self.redis = Redis(**redis_opts)
+        self._pubsub = None
+        super(RedisInvalidationBus, self).__init__()
+
+    def _start(self):
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+
+        t = Thread(target=self._run, args=(self._pubsub,), name='stormpath-invalidation')
+        t.daemon = True
+        t.start()
+
+    def _run(self, pubsub):
+        try:
+            for message in pubsub.listen():
+                if message.get('type') == 'message':
+                    self._received(message['data'])
+        except Exception:
+            # The subscription was closed.
+            return
+
+    def _send(self, message):
+        self.redis.publish(self.channel, message)
+
+    def _stop(self):
+        self._pubsub.close()
@@ -20,7 +20,7 @@ class CacheManager(object):
         self.caches = {}
 
     def create_cache(self, region, **options):
-        self.caches[region] = Cache(**options)
+        self.caches[region] = Cache(region=region, **options)
 
     def get_cache(self, region):
         return self.caches.get(region)
@@ -9,6 +9,7 @@ from .entry import CacheEntry
 
 STR_VALUE = 1
 JSON_VALUE = 2
+CODEC_VALUE = 3
 
 
 def json_serializer(key, value):
@@ -26,6 +27,31 @@ def json_deserializer(key, value, flags):
     raise Exception("Unknown serialization format")
 
 
+def codec_serializer(codec):
+    """A serializer encoding entries with a
+    :class:`stormpath.cache.codecs.EntryCodec`."""
+    def serializer(key, value):
+        if isinstance(value, str):
+            return value, STR_VALUE
+
+        return codec.encode(value), CODEC_VALUE
+
+    return serializer
+
+
+def codec_deserializer(codec):
+    """A deserializer decoding entries with a
+    :class:`stormpath.cache.codecs.EntryCodec`, and entries in the original
+    JSON format."""
+    def deserializer(key, value, flags):
+        if flags == CODEC_VALUE:
+            return codec.decode(value)
+
+        return json_deserializer(key, value, flags)
+
+    return deserializer
+
+
 def memcache_error_handling(f):
     @wraps(f)
     def wrapper(self, *args, **kwargs):
@@ -66,6 +92,9 @@ class MemcachedStore(object):
     :param key_prefix: Prefix of key. You can use this as namespace. Defaults
         to b''.
 
+    :param codec: optional :class:`stormpath.cache.codecs.EntryCodec`,
+        a faster entry format than the default JSON.
+
     """
 
     DEFAULT_TTL = 5 * 60  # seconds
@@ -73,7 +102,7 @@ class MemcachedStore(object):
     def __init__(self, host='localhost', port=11211,
             connect_timeout=None, timeout=None,
             no_delay=False, ignore_exc=True,
-            key_prefix=b'', socket_module=socket, ttl=DEFAULT_TTL):
+            key_prefix=b'', socket_module=socket, ttl=DEFAULT_TTL, codec=None):
         self.ttl = ttl
 
         try:
@@ -83,8 +112,8 @@ class MemcachedStore(object):
 
         self.memcache = Memcache(
                 (host, port),
-                serializer=json_serializer,
-                deserializer=json_deserializer,
+                serializer=codec_serializer(codec) if codec else json_serializer,
+                deserializer=codec_deserializer(codec) if codec else json_deserializer,
                 connect_timeout=connect_timeout,
                 timeout=timeout,
                 socket_module=socket_module,
@@ -96,8 +125,13 @@ class MemcachedStore(object):
     def __getitem__(self, key):
         entry = self.memcache.get(key)
 
-        if entry is None:
-            return None
+        return self._parse(entry)
+
+    @staticmethod
+    def _parse(entry):
+        # Codecs decode entries, the JSON deserializer only loads them.
+        if entry is None or isinstance(entry, CacheEntry):
+            return entry
 
         return CacheEntry.parse(entry)
 
@@ -109,6 +143,20 @@ class MemcachedStore(object):
     def __delitem__(self, key):
         self.memcache.delete(key)
 
+    @memcache_error_handling
+    def get_many(self, keys):
+        entries = self.memcache.get_many(list(keys))
+        entries = ((key, self._parse(entry)) for key, entry in entries.items())
+        return dict((key, entry) for key, entry in entries if entry is not None)
+
+    @memcache_error_handling
+    def put_many(self, entries):
+        self.memcache.set_many(dict(entries), expire=self.ttl)
+
+    @memcache_error_handling
+    def delete_many(self, keys):
+        self.memcache.delete_many(list(keys))
+
     @memcache_error_handling
     def clear(self):
         self.memcache.flush_all()
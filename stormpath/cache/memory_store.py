@@ -1,47 +1,507 @@
 """A memory store cache backend."""
 
+import threading
+
 from collections import OrderedDict
+from sys import getsizeof
+
+
+# Roughly the size of a cache entry object with its timestamps.
+ENTRY_OVERHEAD = 256
+
+
+def approximate_size(value):
+    """The approximate number of bytes of memory used by a JSON-like value
+    (strings, numbers, dicts and lists)."""
+    size = getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approximate_size(v) for v in value)
+
+    return size
+
+
+def approximate_entry_size(key, entry):
+    """The approximate number of bytes used by a cache entry and its key."""
+    return approximate_size(key) + approximate_size(getattr(entry, 'value', entry)) + ENTRY_OVERHEAD
 
 
 class LimitedSizeDict(OrderedDict):
+    """A dict holding at most ``max_entries`` items, or at most
+    ``max_bytes`` worth of items (as measured by ``sizeof``), which evicts
+    the oldest inserted items first (FIFO)."""
 
     def __init__(self, *args, **kwargs):
         self.size_limit = kwargs.pop("max_entries")
+        self.bytes_limit = kwargs.pop('max_bytes', None)
+        self.sizeof = kwargs.pop('sizeof', None) or approximate_entry_size
         if self.size_limit < 1:
             raise ValueError('Memory store: max entries needs to be a positive number.')
+        if self.bytes_limit is not None and self.bytes_limit < 1:
+            raise ValueError('Memory store: max bytes needs to be a positive number.')
+        self.evictions = 0
+        self.bytes = 0
+        self.evicted_bytes = 0
+        self._sizes = {}
         OrderedDict.__init__(self, *args, **kwargs)
         self._check_size_limit()
 
     def __setitem__(self, key, value):
+        if self.bytes_limit is not None:
+            size = self.sizeof(key, value)
+            if size > self.bytes_limit:
+                # Don't flush the whole cache for an entry which can't fit.
+                if key in self:
+                    del self[key]
+                self.evictions += 1
+                self.evicted_bytes += size
+                return
+
+            self.bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+
         OrderedDict.__setitem__(self, key, value)
         self._check_size_limit()
 
+    def __delitem__(self, key):
+        OrderedDict.__delitem__(self, key)
+        self.bytes -= self._sizes.pop(key, 0)
+
+    def clear(self):
+        OrderedDict.clear(self)
+        self._sizes.clear()
+        self.bytes = 0
+
+    def _is_full(self):
+        if self.bytes_limit is None:
+            return len(self) > self.size_limit
+
+        return self.bytes > self.bytes_limit
+
     def _check_size_limit(self):
-        while len(self) > self.size_limit:
-            self.popitem(last=False)
+        while self._is_full():
+            key = next(iter(self))
+            size = self._sizes.get(key, 0)
+            del self[key]
+            self.evictions += 1
+            self.evicted_bytes += size
+
+
+class LRUDict(LimitedSizeDict):
+    """A :class:`LimitedSizeDict` which evicts the least recently used items
+    first: reading an item moves it to the end of the eviction queue."""
+
+    def _move_to_end(self, key):
+        move_to_end = getattr(OrderedDict, 'move_to_end', None)
+        if move_to_end is not None:
+            move_to_end(self, key)
+        else:
+            value = OrderedDict.__getitem__(self, key)
+            OrderedDict.__delitem__(self, key)
+            OrderedDict.__setitem__(self, key, value)
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+
+        self._move_to_end(key)
+        return OrderedDict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        if key in self:
+            LimitedSizeDict.__delitem__(self, key)
+
+        LimitedSizeDict.__setitem__(self, key, value)
+
+
+class FrequencySketch(object):
+    """An approximate access frequency counter (a count-min sketch of 4-bit
+    counters), aged by halving all the counters once ``sample_size``
+    accesses were recorded, so that past popularity fades away."""
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, max_entries):
+        width = 16
+        while width < max_entries:
+            width *= 2
+
+        self.mask = width - 1
+        self.sample_size = 10 * max(max_entries, 1)
+        self.samples = 0
+        self.table = [bytearray(width) for _ in range(self.DEPTH)]
+
+    def _indexes(self, key):
+        h = hash(key)
+        for i in range(self.DEPTH):
+            # Spread the bits of the hash differently for every row.
+            h = (h * 0x9E3779B1 + i) & 0xFFFFFFFF
+            yield i, (h ^ (h >> 15)) & self.mask
+
+    def increment(self, key):
+        for row, i in self._indexes(key):
+            if self.table[row][i] < self.MAX_COUNT:
+                self.table[row][i] += 1
+
+        self.samples += 1
+        if self.samples >= self.sample_size:
+            self._reset()
+
+    def frequency(self, key):
+        return min(self.table[row][i] for row, i in self._indexes(key))
+
+    def _reset(self):
+        for row in self.table:
+            for i, count in enumerate(row):
+                if count:
+                    row[i] = count >> 1
+
+        self.samples //= 2
+
+
+class WeightedSegment(OrderedDict):
+    """An ordered dict keeping track of the total weight of its items."""
+
+    def __init__(self):
+        OrderedDict.__init__(self)
+        self.weight = 0
+        self.weights = {}
+
+    def add(self, key, value, weight):
+        OrderedDict.__setitem__(self, key, value)
+        self.weights[key] = weight
+        self.weight += weight
+
+    def remove(self, key):
+        value = OrderedDict.pop(self, key)
+        weight = self.weights.pop(key)
+        self.weight -= weight
+
+        return value, weight
+
+    def clear(self):
+        OrderedDict.clear(self)
+        self.weights.clear()
+        self.weight = 0
+
+
+class TinyLFUDict(object):
+    """A dict holding at most ``max_entries`` items (or at most ``max_bytes``
+    worth of items), with a W-TinyLFU eviction policy.
+
+    New items enter a small LRU admission window. Items evicted from the
+    window are only admitted to the main (segmented LRU) area if they were
+    accessed more often than the items the main area would evict, according
+    to a :class:`FrequencySketch`. Unlike plain LRU, a burst of one-off
+    reads (like iterating over a large collection) can't flush the popular
+    items out of the cache.
+    """
+    WINDOW_RATIO = 0.01
+    PROTECTED_RATIO = 0.8
+
+    def __init__(self, max_entries, max_bytes=None, sizeof=None):
+        if max_entries < 1:
+            raise ValueError('Memory store: max entries needs to be a positive number.')
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError('Memory store: max bytes needs to be a positive number.')
+
+        self.size_limit = max_entries
+        self.bytes_limit = max_bytes
+        self.sizeof = sizeof or approximate_entry_size
+
+        capacity = max_entries if max_bytes is None else max_bytes
+        self.window_limit = max(1, int(capacity * self.WINDOW_RATIO))
+        self.main_limit = capacity - self.window_limit
+        self.protected_limit = int(self.main_limit * self.PROTECTED_RATIO)
+
+        self.sketch = FrequencySketch(max_entries)
+        self.window = WeightedSegment()
+        self.probation = WeightedSegment()
+        self.protected = WeightedSegment()
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.rejections = 0
+
+    def _segment(self, key):
+        for segment in (self.window, self.probation, self.protected):
+            if key in segment:
+                return segment
+
+        return None
+
+    def _weigh(self, key, value):
+        if self.bytes_limit is None:
+            return 1
+
+        return self.sizeof(key, value)
+
+    def _evict(self, segment, key):
+        _, weight = segment.remove(key)
+        self.evictions += 1
+        if self.bytes_limit is not None:
+            self.evicted_bytes += weight
+
+    def get(self, key, default=None):
+        self.sketch.increment(key)
+
+        segment = self._segment(key)
+        if segment is None:
+            return default
+
+        value, weight = segment.remove(key)
+        if segment is self.window:
+            self.window.add(key, value, weight)
+        else:
+            # Items read again in the main area get protected, pushing the
+            # least recently used protected items back to probation.
+            self.protected.add(key, value, weight)
+            while self.protected.weight > self.protected_limit and len(self.protected) > 1:
+                demoted = next(iter(self.protected))
+                self.probation.add(demoted, *self.protected.remove(demoted))
+
+        return value
+
+    def __setitem__(self, key, value):
+        segment = self._segment(key)
+        if segment is not None:
+            segment.remove(key)
+        else:
+            self.sketch.increment(key)
+
+        weight = self._weigh(key, value)
+        self.window.add(key, value, weight)
+
+        while self.window.weight > self.window_limit:
+            candidate = next(iter(self.window))
+            self._admit(candidate, *self.window.remove(candidate))
+
+    def _reject(self, weight):
+        self.rejections += 1
+        self.evictions += 1
+        if self.bytes_limit is not None:
+            self.evicted_bytes += weight
+
+    def _admit(self, key, value, weight):
+        # Don't flush the main area for an item which can't fit.
+        if weight > self.main_limit:
+            self._reject(weight)
+            return
+
+        while self.probation.weight + self.protected.weight + weight > self.main_limit:
+            victims = self.probation or self.protected
+            if not victims or self.sketch.frequency(key) <= self.sketch.frequency(next(iter(victims))):
+                self._reject(weight)
+                return
+
+            self._evict(victims, next(iter(victims)))
+
+        self.probation.add(key, value, weight)
+
+    @property
+    def bytes(self):
+        if self.bytes_limit is None:
+            return 0
+
+        return self.window.weight + self.probation.weight + self.protected.weight
+
+    def __contains__(self, key):
+        return self._segment(key) is not None
+
+    def __delitem__(self, key):
+        self._segment(key).remove(key)
+
+    def clear(self):
+        self.window.clear()
+        self.probation.clear()
+        self.protected.clear()
+
+    def __len__(self):
+        return len(self.window) + len(self.probation) + len(self.protected)
 
 
 class MemoryStore(object):
-    """Simple caching implementation that uses memory as data storage."""
+    """Simple caching implementation that uses memory as data storage.
+
+    Stores are safe to share between threads: every access goes through a
+    lock (a gevent lock once gevent monkey patched the threading module).
+    See :class:`ShardedMemoryStore` to avoid contending for it.
+
+    :param max_entries: The maximum number of entries kept in the store.
+    :param max_bytes: Limit the store to the approximate size in memory of
+        its entries (see :func:`approximate_size`) instead of their number.
+        Entries larger than that are not stored at all.
+    :param policy: How entries are evicted once the store is full:
+        ``'lru'`` (least recently used first, the default), ``'tinylfu'``
+        (see :class:`TinyLFUDict`) or ``'fifo'`` (oldest first).
+
+    Example, in the cache options of a region::
+
+        'applications': {
+            'store_opts': {'max_entries': 100, 'policy': 'tinylfu'},
+        },
+        'customData': {
+            'store_opts': {'max_bytes': 16 * 1024 * 1024},
+        }
+    """
 
     MAX_ENTRIES = 1000  # Maximum number of entries in cache
+    POLICIES = {
+        'fifo': LimitedSizeDict,
+        'lru': LRUDict,
+        'tinylfu': TinyLFUDict,
+    }
 
     def __init__(self, *args, **kwargs):
         max_entries = kwargs.pop('max_entries', self.MAX_ENTRIES)
-        self.store = LimitedSizeDict(max_entries=max_entries)
+        max_bytes = kwargs.pop('max_bytes', None)
+        policy = kwargs.pop('policy', 'lru')
+        if policy not in self.POLICIES:
+            raise ValueError('Memory store: unknown eviction policy %r.' % policy)
+
+        self.policy = policy
+        self.store = self.POLICIES[policy](max_entries=max_entries, max_bytes=max_bytes)
+        self._lock = threading.Lock()
 
     def __getitem__(self, key):
-        return self.store.get(key)
+        # Reads reorder the eviction queues, so they need the lock as well.
+        with self._lock:
+            return self.store.get(key)
 
     def __setitem__(self, key, entry):
-        self.store[key] = entry
+        with self._lock:
+            self.store[key] = entry
 
     def __delitem__(self, key):
-        if key in self.store:
-            del self.store[key]
+        with self._lock:
+            if key in self.store:
+                del self.store[key]
+
+    def get_many(self, keys):
+        with self._lock:
+            entries = ((key, self.store.get(key)) for key in keys)
+            return dict((key, entry) for key, entry in entries if entry is not None)
+
+    def put_many(self, entries):
+        with self._lock:
+            for key, entry in entries:
+                self.store[key] = entry
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self.store:
+                    del self.store[key]
 
     def clear(self):
-        self.store.clear()
+        with self._lock:
+            self.store.clear()
+
+    @property
+    def evictions(self):
+        """The number of entries evicted (or, with TinyLFU, not admitted)
+        because the store was full."""
+        return self.store.evictions
+
+    @property
+    def bytes(self):
+        """The approximate size of the entries, when limited by
+        ``max_bytes``."""
+        return self.store.bytes
+
+    @property
+    def evicted_bytes(self):
+        return self.store.evicted_bytes
 
     def __len__(self):
         return len(self.store)
+
+
+class ShardedMemoryStore(object):
+    """A memory store split into ``shards`` independent
+    :class:`MemoryStore` segments, each with its own lock, so that threads
+    looking up different hrefs rarely wait for each other.
+
+    Keys are assigned to shards by hash. ``max_entries`` and ``max_bytes``
+    are split evenly between the shards, and each shard evicts its own
+    entries with the given ``policy``, so eviction is only approximately
+    global.
+
+    Example, in the cache options::
+
+        'store': ShardedMemoryStore,
+        'store_opts': {'shards': 32, 'max_entries': 10000},
+    """
+    SHARDS = 16
+
+    def __init__(self, *args, **kwargs):
+        shards = kwargs.pop('shards', self.SHARDS)
+        if shards < 1:
+            raise ValueError('Memory store: shards needs to be a positive number.')
+
+        max_entries = kwargs.pop('max_entries', MemoryStore.MAX_ENTRIES)
+        max_bytes = kwargs.pop('max_bytes', None)
+        if max_bytes is not None:
+            max_bytes = -(-max_bytes // shards)
+
+        self.shards = [
+            MemoryStore(max_entries=-(-max_entries // shards), max_bytes=max_bytes, **kwargs)
+            for _ in range(shards)
+        ]
+
+    # Lookups are on the hot path of every resource access, so they go
+    # straight to the shard's lock and dict.
+    def __getitem__(self, key):
+        shard = self.shards[hash(key) % len(self.shards)]
+        with shard._lock:
+            return shard.store.get(key)
+
+    def __setitem__(self, key, entry):
+        shard = self.shards[hash(key) % len(self.shards)]
+        with shard._lock:
+            shard.store[key] = entry
+
+    def __delitem__(self, key):
+        del self.shards[hash(key) % len(self.shards)][key]
+
+    def _group(self, items, key=lambda item: item):
+        groups = {}
+        for item in items:
+            groups.setdefault(hash(key(item)) % len(self.shards), []).append(item)
+
+        return ((self.shards[i], group) for i, group in groups.items())
+
+    def get_many(self, keys):
+        entries = {}
+        for shard, group in self._group(keys):
+            entries.update(shard.get_many(group))
+
+        return entries
+
+    def put_many(self, entries):
+        for shard, group in self._group(entries, key=lambda entry: entry[0]):
+            shard.put_many(group)
+
+    def delete_many(self, keys):
+        for shard, group in self._group(keys):
+            shard.delete_many(group)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    @property
+    def evictions(self):
+        return sum(shard.evictions for shard in self.shards)
+
+    @property
+    def bytes(self):
+        return sum(shard.bytes for shard in self.shards)
+
+    @property
+    def evicted_bytes(self):
+        return sum(shard.evicted_bytes for shard in self.shards)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
@@ -1,12 +1,7 @@
 """A redis cache backend."""
 
 
-from json import (
-    dumps,
-    loads,
-)
-
-from .entry import CacheEntry
+from .codecs import JSONCodec
 
 
 class RedisStore(object):
@@ -35,6 +30,10 @@ class RedisStore(object):
         (see redis-py docs for more details)
 
     :param ttl: Default TTL
+
+    :param codec: How entries are serialized, see
+        :class:`stormpath.cache.codecs.EntryCodec` for a faster format than
+        the default :class:`stormpath.cache.codecs.JSONCodec`.
     """
 
     DEFAULT_TTL = 5 * 60  # seconds
@@ -42,8 +41,9 @@ class RedisStore(object):
     def __init__(self, host='localhost', port=6379, db=0, password=None,
             socket_timeout=None, connection_pool=None, charset='utf-8',
             errors='strict', decode_responses=False, unix_socket_path=None,
-            ttl=DEFAULT_TTL):
+            ttl=DEFAULT_TTL, codec=None):
         self.ttl = ttl
+        self.codec = codec or JSONCodec()
         try:
             from redis import Redis
         except ImportError:
@@ -55,21 +55,46 @@ class RedisStore(object):
                 errors=errors, decode_responses=decode_responses,
                 unix_socket_path=unix_socket_path)
 
+    def _decode(self, data):
+        return self.codec.decode(data)
+
+    def _encode(self, entry):
+        return self.codec.encode(entry)
+
     def __getitem__(self, key):
         entry = self.redis.get(key)
         if entry is None:
             return None
 
-        entry = loads(entry.decode('utf-8'))
-        return CacheEntry.parse(entry)
+        return self._decode(entry)
 
     def __setitem__(self, key, entry):
-        data = dumps(entry.to_dict()).encode('utf-8')
-        self.redis.setex(key, data, self.ttl)
+        self.redis.setex(key, self._encode(entry), self.ttl)
 
     def __delitem__(self, key):
         self.redis.delete(key)
 
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        values = self.redis.mget(keys)
+        entries = ((key, self._decode(value)) for key, value in zip(keys, values) if value is not None)
+        return dict((key, entry) for key, entry in entries if entry is not None)
+
+    def put_many(self, entries):
+        # A pipeline sends all the writes in a single round trip.
+        pipe = self.redis.pipeline(transaction=False)
+        for key, entry in entries:
+            pipe.setex(key, self._encode(entry), self.ttl)
+        pipe.execute()
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if keys:
+            self.redis.delete(*keys)
+
     def clear(self):
         self.redis.flushdb()
 
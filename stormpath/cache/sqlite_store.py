@@ -0,0 +1,164 @@
+"""A SQLite (on disk) cache backend."""
+
+import os
+import re
+import threading
+import time
+
+from .codecs import EntryCodec
+
+
+class SQLiteStore(object):
+    """Caching implementation that uses a SQLite database file as data
+    storage, so that cached resources survive restarts.
+
+    The database uses write-ahead logging, so any number of processes of a
+    host can share the same file: readers don't block each other nor the
+    writer. Every thread (and process) uses its own connection.
+
+    Entries expire ``ttl`` seconds after they were written. Once in a while
+    (every ``TRIM_INTERVAL`` writes) expired entries are removed, and so are
+    the entries closest to expiring when there are more than
+    ``max_entries``.
+
+    Every cache region sharing the database file keeps its entries in a
+    table of its own, so that clearing or trimming a region leaves the
+    entries of the other regions alone.
+
+    :param path: The database file, created if needed.
+
+    :param ttl: How long entries are kept, in seconds.
+
+    :param max_entries: The maximum number of entries kept in the database.
+
+    :param timeout: How long to wait for other processes writing to the
+        database, in seconds.
+
+    :param codec: How entries are serialized, defaults to a
+        :class:`stormpath.cache.codecs.EntryCodec`.
+
+    :param region: The cache region whose entries are stored, set by
+        :class:`stormpath.cache.cache.Cache`.
+
+    Example, in the cache options::
+
+        'store': SQLiteStore,
+        'store_opts': {'path': '/var/cache/myapp/stormpath.db'},
+    """
+    DEFAULT_TTL = 5 * 60  # seconds
+    MAX_ENTRIES = 100000
+    TRIM_INTERVAL = 100  # writes
+    MAX_VARIABLES = 500  # per query, SQLite allows 999 by default
+    TABLE = 'entries'
+    REGION_RE = re.compile(r'^\w+$')
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES, timeout=5.0, codec=None, region=None):
+        try:
+            import sqlite3
+        except ImportError:
+            raise RuntimeError('SQLite support is not available in this Python build.')
+
+        if max_entries < 1:
+            raise ValueError('SQLite store: max entries needs to be a positive number.')
+        if region is not None and not self.REGION_RE.match(region):
+            raise ValueError('SQLite store: region names can only contain letters, digits and underscores.')
+
+        self.sqlite3 = sqlite3
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.codec = codec or EntryCodec()
+        # Region names are checked above, they can be used as table names.
+        self.table = self.TABLE if region is None else '%s_%s' % (self.TABLE, region)
+        self.evictions = 0
+        self._writes = 0
+        self._local = threading.local()
+
+        with self._connection as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS %s ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)' % self.table)
+            conn.execute('CREATE INDEX IF NOT EXISTS %s_expires_at ON %s (expires_at)' % (self.table, self.table))
+
+    @property
+    def _connection(self):
+        # Connections can't be shared between threads, nor survive a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self.sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def _decode(self, value):
+        return self.codec.decode(bytes(value))
+
+    def _chunks(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), self.MAX_VARIABLES):
+            yield keys[i:i + self.MAX_VARIABLES]
+
+    def __getitem__(self, key):
+        row = self._connection.execute('SELECT value FROM %s WHERE key = ? AND expires_at > ?' % self.table,
+            (key, time.time())).fetchone()
+        if row is None:
+            return None
+
+        return self._decode(row[0])
+
+    def __setitem__(self, key, entry):
+        self.put_many([(key, entry)])
+
+    def __delitem__(self, key):
+        self.delete_many([key])
+
+    def get_many(self, keys):
+        entries = {}
+        now = time.time()
+        for chunk in self._chunks(keys):
+            rows = self._connection.execute('SELECT key, value FROM %s WHERE key IN (%s) AND expires_at > ?' %
+                (self.table, ', '.join('?' * len(chunk))), chunk + [now])
+            for key, value in rows:
+                entry = self._decode(value)
+                if entry is not None:
+                    entries[key] = entry
+
+        return entries
+
+    def put_many(self, entries):
+        expires_at = time.time() + self.ttl
+        rows = [(key, self.sqlite3.Binary(self.codec.encode(entry)), expires_at) for key, entry in entries]
+
+        with self._connection as conn:
+            conn.executemany('INSERT OR REPLACE INTO %s (key, value, expires_at) VALUES (?, ?, ?)' % self.table, rows)
+
+        self._writes += len(rows)
+        if self._writes >= self.TRIM_INTERVAL:
+            self._writes = 0
+            self.trim()
+
+    def delete_many(self, keys):
+        with self._connection as conn:
+            for chunk in self._chunks(keys):
+                conn.execute('DELETE FROM %s WHERE key IN (%s)' % (self.table, ', '.join('?' * len(chunk))), chunk)
+
+    def trim(self):
+        """Remove the expired entries, and the entries over
+        ``max_entries``."""
+        with self._connection as conn:
+            conn.execute('DELETE FROM %s WHERE expires_at <= ?' % self.table, (time.time(),))
+            cursor = conn.execute('DELETE FROM %s WHERE key IN '
+                '(SELECT key FROM %s ORDER BY expires_at DESC LIMIT -1 OFFSET ?)' % (self.table, self.table),
+                (self.max_entries,))
+            self.evictions += max(cursor.rowcount, 0)
+
+    def clear(self):
+        with self._connection as conn:
+            conn.execute('DELETE FROM %s' % self.table)
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM %s WHERE expires_at > ?' % self.table,
+            (time.time(),)).fetchone()[0]
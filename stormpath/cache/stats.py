@@ -1,41 +1,122 @@
 """Cache stats."""
 
 
+import threading
+
 from collections import namedtuple
+from six.moves import _thread
 
 
 class CacheStats(object):
-    """Represents cache statistics."""
-    Summary = namedtuple('CacheStats', 'puts hits misses expirations size')
+    """Represents cache statistics.
+
+    ``bytes`` and ``evicted_bytes`` are the approximate size of the entries
+    of memory stores limited by ``max_bytes``, and of the entries they
+    evicted.
+
+    The counters are striped over ``SLOTS`` slots, each with its own lock,
+    and every thread (or greenlet) updates the slot picked by its id. The
+    slots are summed when the counters are read, so that threads sharing
+    the stats neither lose updates nor contend for a single lock on every
+    cache lookup.
+    """
+    Summary = namedtuple('CacheStats', 'puts hits misses expirations size bytes evicted_bytes')
+    COUNTERS = ('puts', 'hits', 'misses', 'expirations', 'stale_hits', 'revalidations', 'size')
+    SLOT_BITS = 4
+    SLOTS = 1 << SLOT_BITS
 
     def __init__(self):
-        self.puts = 0
-        self.hits = 0
-        self.misses = 0
-        self.expirations = 0
-        self.size = 0
+        self._slots = [dict.fromkeys(self.COUNTERS, 0) for _ in range(self.SLOTS)]
+        self._locks = [threading.Lock() for _ in range(self.SLOTS)]
+        self._cleared_size = 0
+        self._store = None
+
+    def _incr(self, name, amount=1):
+        # Thread ids are aligned addresses, their low bits are all the same.
+        # Fibonacci hashing picks the slot from the top bits of the product.
+        slot = ((_thread.get_ident() * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.SLOT_BITS)
+        with self._locks[slot]:
+            self._slots[slot][name] += amount
+
+    def _sum(self, name):
+        return sum(slot[name] for slot in self._slots)
 
     def put(self, new=True):
-        self.puts += 1
+        self._incr('puts')
         if new:
-            self.size += 1
+            self._incr('size')
 
     def hit(self):
-        self.hits += 1
+        self._incr('hits')
+
+    def revalidation(self):
+        self._incr('revalidations')
+
+    def stale_hit(self):
+        self._incr('stale_hits')
 
     def miss(self, expired=False):
-        self.misses += 1
+        self._incr('misses')
         if expired:
-            self.expirations += 1
+            self._incr('expirations')
 
     def delete(self):
         if self.size > 0:
-            self.size -= 1
+            self._incr('size', -1)
 
     def clear(self):
-        self.size = 0
+        self._cleared_size = self._sum('size')
+
+    def track_bytes(self, store):
+        """Read ``bytes`` and ``evicted_bytes`` from a memory store when
+        they are needed."""
+        self._store = store
+
+    @property
+    def puts(self):
+        return self._sum('puts')
+
+    @property
+    def hits(self):
+        return self._sum('hits')
+
+    @property
+    def misses(self):
+        return self._sum('misses')
+
+    @property
+    def expirations(self):
+        return self._sum('expirations')
+
+    @property
+    def stale_hits(self):
+        return self._sum('stale_hits')
+
+    @property
+    def revalidations(self):
+        return self._sum('revalidations')
+
+    @property
+    def size(self):
+        return max(self._sum('size') - self._cleared_size, 0)
+
+    @property
+    def bytes(self):
+        return self._store.bytes if self._store is not None else 0
+
+    @property
+    def evicted_bytes(self):
+        return self._store.evicted_bytes if self._store is not None else 0
+
+    @property
+    def hit_ratio(self):
+        """The share of lookups which were hits, to compare eviction
+        policies."""
+        hits = self.hits
+        lookups = hits + self.misses
+        return hits / float(lookups) if lookups else 0.0
 
     @property
     def summary(self):
         return self.Summary(self.puts, self.hits, self.misses,
-            self.expirations, self.size)
+            self.expirations, self.size, self.bytes, self.evicted_bytes)
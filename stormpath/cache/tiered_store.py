@@ -0,0 +1,158 @@
+"""A two-tier cache backend: a memory store in front of a shared store."""
+
+import time
+
+from collections import namedtuple
+
+from .memory_store import MemoryStore
+from .redis_store import RedisStore
+from .stats import CacheStats
+
+
+class TieredEntry(object):
+    """A cache entry held by the first tier until ``expires_at``."""
+    __slots__ = ('entry', 'expires_at')
+
+    def __init__(self, entry, expires_at):
+        self.entry = entry
+        self.expires_at = expires_at
+
+    @property
+    def value(self):
+        return self.entry.value
+
+
+class TieredStore(object):
+    """Caching implementation that keeps a per-process first tier (L1) in
+    front of a shared second tier (L2), like Redis or Memcached.
+
+    Reads are served from L1 for ``l1_ttl`` seconds at most, which saves a
+    network round trip and a decode for hot entries while bounding how long
+    a process can miss updates made by other processes. L2 hits are
+    promoted to L1, and writes and deletes go through to both tiers.
+
+    Each tier has its own :class:`stormpath.cache.stats.CacheStats`, in
+    ``l1_stats`` and ``l2_stats``: hits, misses (L1 expirations being
+    entries older than ``l1_ttl``) and puts, including promotions for L1.
+    The number of entries is only tracked by the cache itself.
+
+    :param l2_store: The second tier store class. Defaults to
+        :class:`stormpath.cache.redis_store.RedisStore`.
+
+    :param l2_opts: The options of the second tier store.
+
+    :param l1_store: The first tier store class. Defaults to
+        :class:`stormpath.cache.memory_store.MemoryStore`.
+
+    :param l1_opts: The options of the first tier store, e.g.
+        ``{'max_entries': 500}``.
+
+    :param l1_ttl: How long entries are served from the first tier, in
+        seconds.
+
+    Example, in the cache options of a region::
+
+        'applications': {
+            'store': TieredStore,
+            'store_opts': {
+                'l2_store': RedisStore,
+                'l2_opts': {'host': 'localhost'},
+                'l1_ttl': 10,
+            },
+        }
+    """
+    Summary = namedtuple('TieredStoreStats', 'l1 l2')
+    L1_TTL = 5  # seconds
+
+    def __init__(self, l2_store=RedisStore, l2_opts=None, l1_store=MemoryStore,
+            l1_opts=None, l1_ttl=L1_TTL):
+        self.l1 = l1_store(**(l1_opts or {}))
+        self.l2 = l2_store(**(l2_opts or {}))
+        self.l1_ttl = l1_ttl
+        self.l1_stats = CacheStats()
+        self.l2_stats = CacheStats()
+
+    def __getitem__(self, key):
+        now = time.time()
+
+        item = self.l1[key]
+        if item is not None and item.expires_at > now:
+            self.l1_stats.hit()
+            return item.entry
+
+        self.l1_stats.miss(expired=item is not None)
+
+        entry = self.l2[key]
+        if entry is None:
+            self.l2_stats.miss()
+            return None
+
+        self.l2_stats.hit()
+        self.l1[key] = TieredEntry(entry, now + self.l1_ttl)
+        self.l1_stats.put(new=False)
+
+        return entry
+
+    def __setitem__(self, key, entry):
+        self.l2[key] = entry
+        self.l2_stats.put(new=False)
+        self.l1[key] = TieredEntry(entry, time.time() + self.l1_ttl)
+        self.l1_stats.put(new=False)
+
+    def __delitem__(self, key):
+        del self.l2[key]
+        del self.l1[key]
+
+    def get_many(self, keys):
+        now = time.time()
+        entries = {}
+        missing = []
+
+        for key in keys:
+            item = self.l1[key]
+            if item is not None and item.expires_at > now:
+                self.l1_stats.hit()
+                entries[key] = item.entry
+            else:
+                self.l1_stats.miss(expired=item is not None)
+                missing.append(key)
+
+        if missing:
+            found = self.l2.get_many(missing) or {}
+            for key in missing:
+                if key in found:
+                    self.l2_stats.hit()
+                    self.l1[key] = TieredEntry(found[key], now + self.l1_ttl)
+                    self.l1_stats.put(new=False)
+                else:
+                    self.l2_stats.miss()
+
+            entries.update(found)
+
+        return entries
+
+    def put_many(self, entries):
+        entries = list(entries)
+        self.l2.put_many(entries)
+        expires_at = time.time() + self.l1_ttl
+        for key, entry in entries:
+            self.l2_stats.put(new=False)
+            self.l1[key] = TieredEntry(entry, expires_at)
+            self.l1_stats.put(new=False)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        self.l2.delete_many(keys)
+        for key in keys:
+            del self.l1[key]
+
+    def clear(self):
+        self.l2.clear()
+        self.l1.clear()
+
+    @property
+    def summary(self):
+        return self.Summary(self.l1_stats.summary, self.l2_stats.summary)
+
+    def __len__(self):
+        return len(self.l2)
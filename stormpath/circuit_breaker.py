@@ -0,0 +1,149 @@
+"""Client-side circuit breaker for the Stormpath API."""
+
+import time
+
+from collections import deque, namedtuple
+from threading import Lock
+
+
+class CircuitBreaker(object):
+    """Stops sending requests to the Stormpath API while it is failing.
+
+    The breaker starts *closed*, and keeps track of the outcome of the
+    requests made in the last ``window`` seconds. Once at least
+    ``minimum_calls`` requests were made, it *opens* if the share of failed
+    requests (connection errors and 5xx responses) reaches
+    ``failure_rate_threshold``, or if the share of requests slower than
+    ``slow_call_duration`` seconds reaches ``slow_call_rate_threshold``.
+
+    While open, requests fail fast with
+    :class:`stormpath.error.CircuitOpenError` (and the
+    :class:`stormpath.data_store.DataStore` serves stale cache entries, if
+    its cache regions keep them, see ``stale_ttl``). After ``open_timeout``
+    seconds the breaker goes *half-open* and lets ``half_open_max_calls``
+    probe requests through: it closes again once they all succeed, and
+    re-opens as soon as one of them fails.
+
+    :param on_state_change: A callable invoked as
+        ``on_state_change(breaker, old_state, new_state)`` on every state
+        transition, e.g. to feed metrics.
+
+    Example::
+
+        breaker = CircuitBreaker(failure_rate_threshold=0.5, slow_call_duration=5,
+            on_state_change=lambda b, old, new: statsd.incr('stormpath.circuit.' + new))
+        client = Client(id='xxx', secret='xxx', circuit_breaker=breaker)
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    Summary = namedtuple('CircuitBreakerStats', 'state calls failures slow_calls rejected opened')
+
+    def __init__(self, failure_rate_threshold=0.5, slow_call_duration=None, slow_call_rate_threshold=1.0,
+            minimum_calls=20, window=30, open_timeout=30, half_open_max_calls=1, on_state_change=None):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.on_state_change = on_state_change
+
+        self._lock = Lock()
+        self._calls = deque()
+        self._opened_at = None
+        self._probes = 0
+        self._successes = 0
+        self.state = self.CLOSED
+        self.rejected = 0
+        self.opened = 0
+
+    def _transition(self, state, now):
+        old_state = self.state
+        self.state = state
+        self._calls.clear()
+        self._probes = 0
+        self._successes = 0
+
+        if state == self.OPEN:
+            self._opened_at = now
+            self.opened += 1
+
+        return old_state
+
+    def _notify(self, old_state, new_state):
+        if old_state is not None and old_state != new_state and self.on_state_change is not None:
+            self.on_state_change(self, old_state, new_state)
+
+    def allow_request(self):
+        """Whether a request may be sent to the API right now."""
+        old_state = None
+
+        with self._lock:
+            now = time.time()
+
+            if self.state == self.OPEN:
+                if now < self._opened_at + self.open_timeout:
+                    self.rejected += 1
+                    return False
+
+                old_state = self._transition(self.HALF_OPEN, now)
+
+            state = self.state
+            if state == self.HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self.rejected += 1
+                    allowed = False
+                else:
+                    self._probes += 1
+                    allowed = True
+            else:
+                allowed = True
+
+        self._notify(old_state, state)
+        return allowed
+
+    def record(self, failed, duration):
+        """Record the outcome of a request which took ``duration`` seconds."""
+        slow = self.slow_call_duration is not None and duration >= self.slow_call_duration
+        old_state = new_state = None
+
+        with self._lock:
+            now = time.time()
+
+            if self.state == self.HALF_OPEN:
+                if failed or slow:
+                    new_state = self.OPEN
+                else:
+                    self._successes += 1
+                    if self._successes >= self.half_open_max_calls:
+                        new_state = self.CLOSED
+            elif self.state == self.CLOSED:
+                self._calls.append((now, failed, slow))
+                while self._calls and self._calls[0][0] < now - self.window:
+                    self._calls.popleft()
+
+                if len(self._calls) >= self.minimum_calls:
+                    calls = float(len(self._calls))
+                    failure_rate = len([c for c in self._calls if c[1]]) / calls
+                    slow_rate = len([c for c in self._calls if c[2]]) / calls
+
+                    if failure_rate >= self.failure_rate_threshold or \
+                            (self.slow_call_duration is not None and slow_rate >= self.slow_call_rate_threshold):
+                        new_state = self.OPEN
+
+            if new_state is not None:
+                old_state = self._transition(new_state, now)
+
+        self._notify(old_state, new_state)
+
+    @property
+    def summary(self):
+        with self._lock:
+            calls = len(self._calls)
+            failures = len([c for c in self._calls if c[1]])
+            slow_calls = len([c for c in self._calls if c[2]])
+
+        return self.Summary(self.state, calls, failures, slow_calls, self.rejected, self.opened)
@@ -1,12 +1,19 @@
 """Stormpath API client."""
 
 
+from contextlib import contextmanager
+from threading import local
+
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE
+
 from .auth import Auth
 from .data_store import DataStore
 from .http import HttpExecutor
+from .identity_map import IdentityMap
 from .resources.account_store_mapping import AccountStoreMappingList
 from .resources.account_link import AccountLinkList
 from .resources.api_key import ApiKeyList
+from .resources.base import Expansion
 from .resources.group_membership import GroupMembershipList
 from .resources.organization_account_store_mapping import OrganizationAccountStoreMappingList
 from .resources.tenant import Tenant
@@ -30,7 +37,30 @@ class Client(object):
     """
     BASE_URL = 'https://api.stormpath.com/v1'
 
-    def __init__(self, base_url=None, cache_options=None, expand=None, proxies=None, user_agent=None, backoff_strategy=None, **auth_kwargs):
+    # The resources expanded by warm_cache, by kind.
+    WARM_CACHE_EXPANSIONS = {
+        'applications': (
+            'accountStoreMappings',
+            'customData',
+            'defaultAccountStoreMapping',
+            'defaultGroupStoreMapping',
+            'oauthPolicy',
+            'accountLinkingPolicy',
+            'webConfig',
+        ),
+        'directories': (
+            'customData',
+            'accountCreationPolicy',
+            'passwordPolicy',
+            'provider',
+            'accountSchema',
+        ),
+    }
+
+    def __init__(self, base_url=None, cache_options=None, expand=None, proxies=None, user_agent=None, backoff_strategy=None,
+            pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE, pool_block=DEFAULT_POOLBLOCK,
+            pool_idle_timeout=None, pool_max_age=None, retry_policy=None, circuit_breaker=None,
+            rate_limiter=None, stream_collections=False, transport=None, invalidation_bus=None, **auth_kwargs):
         """
         Initialize the client by setting the
         :class:`stormpath.data_store.DataStore` and
@@ -45,14 +75,183 @@ class Client(object):
         :param backoff_strategy: A Function that will return the number of milliseconds
             to wait before retrying the request. The function must take one parameter
             which is the number of retries already done. If no function is supplied
-            the default backoff strategy is used (see the :meth:`stormpath.http.HttpExecutor.pause_exponentially` method).
+            the default backoff strategy is used (see the :meth:`stormpath.http.HttpExecutor.get_backoff_delay` method).
+
+        :param int pool_connections: (optional) The number of per host
+            connection pools to keep.
+
+        :param int pool_maxsize: (optional) The maximum number of keep-alive
+            connections kept per host. Set it to at least the number of
+            threads sharing this client.
+
+        :param bool pool_block: (optional) Wait for a free pooled connection
+            when all of them are in use, instead of opening an overflow
+            connection which is discarded after use.
+
+        :param pool_idle_timeout: (optional) Number of seconds after which
+            idle keep-alive connections are reaped.
+
+        :param pool_max_age: (optional) Number of seconds after which
+            connections are closed and re-established.
+
+        :param retry_policy: (optional) A
+            :class:`stormpath.retry.RetryPolicy` setting the maximum number of
+            retries, the overall request deadline, the retry budget shared by
+            all the threads using this client, and whether non-idempotent
+            requests may be retried.
+
+        :param circuit_breaker: (optional) A
+            :class:`stormpath.circuit_breaker.CircuitBreaker`. While it is
+            open requests fail fast, or are served from stale cache entries
+            for cache regions configured with a ``stale_ttl``.
+
+        :param rate_limiter: (optional) A
+            :class:`stormpath.rate_limiter.AdaptiveRateLimiter` shared by all
+            the threads using this client, which adapts the request rate to
+            the throttling (429) responses of the API.
+
+        :param bool stream_collections: (optional) Parse the items of
+            collection pages while they are downloaded, instead of reading
+            whole pages in memory first. It requires the ijson library
+            (``pip install stormpath[streaming]``).
+
+        :param transport: (optional) A requests transport adapter used instead
+            of the pooling HTTP adapter, see :mod:`stormpath.testing` for
+            recording, replaying and faking the Stormpath API.
+
+        :param invalidation_bus: (optional) A
+            :class:`stormpath.cache.invalidation.InvalidationBus` evicting
+            updated and deleted resources from the caches of the other
+            processes (and hosts) using it, so that they don't serve them
+            until they expire.
+
+        Connection pool and retry statistics are available through
+        ``client.data_store.executor.pool_stats.summary`` and
+        ``client.data_store.executor.retry_stats.summary``.
         """
         self.BASE_URL = base_url or self.BASE_URL
 
         self.auth = Auth(**auth_kwargs)
-        executor = HttpExecutor(self.BASE_URL, self.auth.scheme, proxies, user_agent=user_agent, get_delay=backoff_strategy)
-        self.data_store = DataStore(executor, cache_options)
+        executor = HttpExecutor(self.BASE_URL, self.auth.scheme, proxies, user_agent=user_agent, get_delay=backoff_strategy,
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block,
+            pool_idle_timeout=pool_idle_timeout, pool_max_age=pool_max_age, retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker, rate_limiter=rate_limiter, stream_collections=stream_collections,
+            transport=transport)
+        self.data_store = DataStore(executor, cache_options, invalidation_bus)
         self.tenant = Tenant(client=self, href='/tenants/current', expand=expand)
+        self._local = local()
+
+    @property
+    def identity_map(self):
+        """The :class:`stormpath.identity_map.IdentityMap` of the current
+        session (see :meth:`session`), or None."""
+        return getattr(self._local, 'identity_map', None)
+
+    def _bind_identity_map(self, identity_map):
+        self._local.identity_map = identity_map
+
+    def _unbind_identity_map(self, token):
+        self._local.identity_map = None
+
+    @contextmanager
+    def session(self):
+        """
+        A unit of work, like a web request, in which each href is
+        represented by a single resource object: walking the same resources
+        again (e.g. ``account.group_memberships`` then ``membership.group``)
+        returns the objects already loaded instead of building and
+        hydrating new ones.
+
+        Sessions are bound to the current thread, and nested sessions share
+        the outer session's identity map. Collections and resources fetched
+        with an expansion aren't mapped.
+
+        Example::
+
+            with client.session() as identity_map:
+                for membership in account.group_memberships:
+                    print(membership.group.name)
+
+            identity_map.summary  # hits, misses and size
+        """
+        identity_map = self.identity_map
+        if identity_map is not None:
+            yield identity_map
+            return
+
+        identity_map = IdentityMap()
+        token = self._bind_identity_map(identity_map)
+        try:
+            yield identity_map
+        finally:
+            self._unbind_identity_map(token)
+
+    def _get_warm_cache_params(self, kind, limit):
+        expansion = Expansion(*self.WARM_CACHE_EXPANSIONS[kind])
+        if 'accountStoreMappings' in expansion.items:
+            expansion.add_property('accountStoreMappings', limit=limit)
+
+        return {'expand': expansion.get_params()}
+
+    def _preload_collection(self, href, kind, limit):
+        # Collection items are expanded like single resources, so a page
+        # warms up to `limit` resources with a single API call.
+        items = []
+        while True:
+            params = dict(self._get_warm_cache_params(kind, limit), offset=len(items), limit=limit)
+            page = self.data_store.preload_resource(href, params=params)
+            items.extend(page.get('items', []))
+
+            if not page.get('items') or len(items) >= page.get('size', 0):
+                return items
+
+    def warm_cache(self, applications=None, limit=100):
+        """
+        Fetch the resources needed by the first requests of most
+        applications, with as few (expanded) API calls as possible, and
+        cache them: the tenant, the applications with their account store
+        mappings, custom data and policies, and the directories they use
+        with their custom data and policies. See
+        :attr:`WARM_CACHE_EXPANSIONS`.
+
+        It is meant to be called once at startup, in the master process of
+        a preforking server (with a memory cache store) so that all the
+        workers start with a warm cache: e.g. from the ``when_ready`` hook
+        of gunicorn, which runs once before the first workers are forked.
+        Not from ``pre_fork``, which runs before every fork, including
+        worker restarts. Pooled connections are closed afterwards, worker
+        processes open their own.
+
+        :param applications: The applications (resources or hrefs) to warm
+            up. Defaults to all the applications and directories of the
+            tenant.
+
+        :param int limit: The number of resources fetched per API call, at
+            most 100.
+
+        Example::
+
+            def when_ready(server):
+                client.warm_cache([application_href])
+        """
+        store = self.data_store
+        tenant = store.get_resource(self.tenant.href)
+
+        if applications is None:
+            applications = self._preload_collection(tenant['applications']['href'], 'applications', limit)
+            self._preload_collection(tenant['directories']['href'], 'directories', limit)
+            directories = []
+        else:
+            applications = [store.preload_resource(getattr(application, 'href', application),
+                params=self._get_warm_cache_params('applications', limit)) for application in applications]
+            directories = [mapping['accountStore']['href'] for application in applications
+                for mapping in application.get('accountStoreMappings', {}).get('items', [])
+                if '/directories/' in mapping.get('accountStore', {}).get('href', '')]
+
+        for href in sorted(set(directories)):
+            store.preload_resource(href, params=self._get_warm_cache_params('directories', limit))
+
+        store.executor.close()
 
     @property
     def account_store_mappings(self):
@@ -1,7 +1,208 @@
 """Data store abstractions."""
 
 
+import re
+
+from collections import OrderedDict, namedtuple
+from threading import Event, Lock, Thread
+
+from pydispatch import dispatcher
+from six.moves.queue import Queue
+from six.moves.urllib.parse import urlencode
+
 from .cache.manager import CacheManager
+from .error import CircuitOpenError, Error
+from .resources.base import (
+    SIGNAL_RESOURCE_CREATED,
+    SIGNAL_RESOURCE_DELETED,
+    SIGNAL_RESOURCE_UPDATED,
+)
+
+
+class SingleFlight(object):
+    """Collapses concurrent identical calls into a single one.
+
+    The first caller for a key executes the call while concurrent callers
+    for the same key wait for it to finish, and share its result (or its
+    exception). It is used by the :class:`DataStore` so that a popular
+    resource expiring from the cache is fetched from the Stormpath API once,
+    not once per thread.
+    """
+    Summary = namedtuple('SingleFlightStats', 'calls fetches collapsed')
+
+    class Call(object):
+        def __init__(self):
+            self.done = Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls = {}
+        self.calls = 0
+        self.fetches = 0
+        self.collapsed = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = self.Call()
+                self.fetches += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.done.set()
+
+        return call.result
+
+    @property
+    def summary(self):
+        return self.Summary(self.calls, self.fetches, self.collapsed)
+
+
+class BackgroundRefresher(object):
+    """Runs cache refreshes in a background thread.
+
+    Refreshes are keyed, and a refresh scheduled while another one with the
+    same key is still pending is dropped, so a hot cache entry is refreshed
+    once no matter how many requests notice it needs to be. At most
+    ``max_pending`` refreshes are queued, further ones are dropped as well.
+    """
+    Summary = namedtuple('RefresherStats', 'scheduled deduplicated dropped refreshed failed pending')
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self._lock = Lock()
+        self._queue = Queue()
+        self._pending = set()
+        self._thread = None
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.refreshed = 0
+        self.failed = 0
+
+    def schedule(self, key, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` unless a refresh for ``key`` is
+        already pending, returns whether it was queued."""
+        with self._lock:
+            if key in self._pending:
+                self.deduplicated += 1
+                return False
+
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+
+            self._pending.add(key)
+            self.scheduled += 1
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name='stormpath-cache-refresher')
+                self._thread.daemon = True
+                self._thread.start()
+
+        self._queue.put((key, fn, args, kwargs))
+        return True
+
+    def _run(self):
+        while True:
+            key, fn, args, kwargs = self._queue.get()
+
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                failed = True
+            else:
+                failed = False
+
+            with self._lock:
+                self._pending.discard(key)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.refreshed += 1
+
+    @property
+    def summary(self):
+        with self._lock:
+            return self.Summary(self.scheduled, self.deduplicated, self.dropped,
+                self.refreshed, self.failed, len(self._pending))
+
+
+class ExpansionStats(object):
+    """Counts the API calls avoided by serving expanded resources from the
+    cache: collections expanded in a cached resource (``avoided``), and the
+    cached resources fetched again because they lack a requested expansion
+    (``refetched``, a single expanded call instead of one per expanded
+    resource).
+    """
+    Summary = namedtuple('ExpansionStats', 'avoided refetched')
+
+    def __init__(self):
+        self._lock = Lock()
+        self.avoided = 0
+        self.refetched = 0
+
+    def avoid(self):
+        with self._lock:
+            self.avoided += 1
+
+    def refetch(self):
+        with self._lock:
+            self.refetched += 1
+
+    @property
+    def summary(self):
+        return self.Summary(self.avoided, self.refetched)
+
+
+class NoCache(object):
+    """The cache of the hrefs which aren't cached."""
+
+    def get(self, *args, **kwargs):
+        return None
+
+    def get_many(self, *args, **kwargs):
+        return {}
+
+    def put(self, *args, **kwargs):
+        pass
+
+    def put_many(self, *args, **kwargs):
+        pass
+
+    def delete(self, *args, **kwargs):
+        pass
+
+    def get_stale(self, *args, **kwargs):
+        return None
+
+    def get_entry(self, *args, **kwargs):
+        return None
+
+
+NO_CACHE = NoCache()
 
 
 class DataStore(object):
@@ -33,9 +234,33 @@ class DataStore(object):
                 'directories': {
                     'ttl': 60,
                     'tti': 60,
+                },
+                'accounts': {
+                    'stale_while_revalidate': 30,
+                    'refresh_ahead_ratio': 0.8,
                 }
+            },
+            'not_found': {
+                'ttl': 30,
+            },
+            'queries': {
+                'ttl': 10,
             }
         })
+
+    The ``not_found`` options enable negative caching: resources the API
+    answered with a 404 are remembered (in the ``notFound`` region, by href)
+    and the 404 error is raised again without any API call until the entry
+    expires, or a resource is created at that href.
+
+    The ``queries`` options enable the caching of collection pages and
+    search results (in the ``queries`` region, by collection href and
+    query params). Only the hrefs of their items are cached, the items
+    themselves are resolved through their own regions, and the page is
+    fetched again when one of them isn't cached anymore. Cached queries of
+    a resource type expire as soon as a resource of that type is created,
+    updated or deleted; all of them when a membership or mapping is, since
+    those link resources of other types.
     """
     CACHE_REGIONS = (
         'accounts',
@@ -50,8 +275,25 @@ class DataStore(object):
         'tenants',
         'nonces',
     )
-
-    def __init__(self, executor, cache_options=None):
+    NOT_FOUND_REGION = 'notFound'
+    QUERIES_REGION = 'queries'
+    ROUTE_CACHE_SIZE = 10000
+    EXPANDED_PAGES_SIZE = 10000
+    STREAM_BATCH_SIZE = 25  # items
+    EXPANSION_RE = re.compile(r'(\w+)(?:\([^)]*\))?')
+    NOT_FOUND_OPTIONS = {
+        'ttl': 30,
+        'tti': 30,
+        'store_opts': {'max_entries': 10000},
+    }
+    QUERIES_OPTIONS = {
+        'ttl': 10,
+        'tti': 10,
+        'store_opts': {'max_entries': 1000},
+    }
+    LINK_TYPES = ('Memberships', 'Mappings')
+
+    def __init__(self, executor, cache_options=None, invalidation_bus=None):
         """
         Initialize the DataStore.
 
@@ -59,11 +301,21 @@ class DataStore(object):
         :type executor: :class:`stormpath.http.HttpExecutor`
         :param cache_options: A dictionary with cache settings.
         :type cache_options: dict or None, optional
+        :param invalidation_bus: A bus broadcasting the hrefs of updated and
+            deleted resources to the data stores of other processes, see
+            :mod:`stormpath.cache.invalidation`.
+        :type invalidation_bus: :class:`stormpath.cache.invalidation.InvalidationBus` or None, optional
         :returns: The initialized DataStore object.
         :rtype: :class:`stormpath.data_store.DataStore`
         """
         self.cache_manager = CacheManager()
         self.executor = executor
+        self.single_flight = SingleFlight()
+        self.refresher = BackgroundRefresher()
+        self.invalidation_bus = invalidation_bus
+        self.expansion_stats = ExpansionStats()
+        self._query_versions = {}
+        self._expanded_pages = {}
 
         if cache_options is None:
             cache_options = {}
@@ -71,63 +323,141 @@ class DataStore(object):
         for region in self.CACHE_REGIONS:
             opts = cache_options.get('regions', {}).get(region, {})
             for k, v in cache_options.items():
-                if k not in opts and k != 'regions':
+                if k not in opts and k not in ('regions', 'not_found', 'queries'):
                     opts[k] = v
 
             self.cache_manager.create_cache(region, **opts)
 
-    def _get_cache(self, href):
-        class NoCache(object):
-            def get(self, *args, **kwargs):
-                return None
+        self._compile_routes()
+
+        if cache_options.get('not_found') is not None:
+            opts = dict(self.NOT_FOUND_OPTIONS, **cache_options['not_found'])
+            opts['store_opts'] = dict(opts['store_opts'])
+            self.cache_manager.create_cache(self.NOT_FOUND_REGION, **opts)
 
-            def put(self, *args, **kwargs):
-                pass
+        if cache_options.get('queries') is not None:
+            opts = dict(self.QUERIES_OPTIONS, **cache_options['queries'])
+            opts['store_opts'] = dict(opts['store_opts'])
+            self.cache_manager.create_cache(self.QUERIES_REGION, **opts)
 
-            def delete(self, *args, **kwargs):
-                pass
+        if invalidation_bus is not None:
+            invalidation_bus.subscribe(self.uncache_resource)
+            for signal in (SIGNAL_RESOURCE_CREATED, SIGNAL_RESOURCE_UPDATED, SIGNAL_RESOURCE_DELETED):
+                dispatcher.connect(self._resource_changed, signal=signal)
 
-        if '/' not in href:
-            return NoCache()
+    def _publish(self, href):
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.publish(href, exclude=self.uncache_resource)
 
-        parts = href.split('/')
+    def _resource_changed(self, sender, href=None, data=None):
+        # Resources of this data store were already published by
+        # create_resource, update_resource and delete_resource, the signals
+        # only add the changes made through other data stores of this
+        # process.
+        if getattr(sender, '_store', None) is self:
+            return
 
+        href = href or (data or {}).get('href')
+        if href:
+            self._publish(href)
+
+    def _compile_routes(self):
         # resource hrefs are in format:
         # ".../resource/resource_uid"
-        if parts[-2] in self.CACHE_REGIONS:  # We only care about instances.
-            return self.cache_manager.get_cache(parts[-2]) or NoCache()
+        # so they are routed by their second to last segment.
+        self._routes = {}
+        for region in self.CACHE_REGIONS:
+            cache = self.cache_manager.get_cache(region)
+            if cache is not None:
+                self._routes[region] = cache
 
         # custom data hrefs are in format:
         # ".../resource/resource_uid/customData"
-        elif parts[-1] in self.CACHE_REGIONS and parts[-1] == 'customData':
-            return self.cache_manager.get_cache(parts[-1]) or NoCache()
+        self._custom_data_cache = self._routes.get('customData', NO_CACHE)
+        self._route_cache = {}
 
-        else:
-            return NoCache()
+    def _route(self, href):
+        head, sep, last = href.rpartition('/')
+        if not sep:
+            return NO_CACHE
+
+        cache = self._routes.get(head.rpartition('/')[2])
+        if cache is not None:  # We only care about instances.
+            return cache
+
+        if last == 'customData':
+            return self._custom_data_cache
+
+        return NO_CACHE
+
+    def _get_cache(self, href):
+        cache = self._route_cache.get(href)
+        if cache is None:
+            # A bounded memo of the recent hrefs, simply emptied once full.
+            if len(self._route_cache) >= self.ROUTE_CACHE_SIZE:
+                self._route_cache.clear()
+
+            cache = self._route_cache[href] = self._route(href)
 
-    def _cache_get(self, href):
-        return self._get_cache(href).get(href)
+        return cache
 
-    def _cache_put(self, href, data, new=True):
+    def _cache_get(self, href, refresh=None):
+        return self._get_cache(href).get(href, revalidate=True, refresh=refresh)
+
+    def _cache_get_stale(self, href):
+        return self._get_cache(href).get_stale(href)
+
+    def _collect_puts(self, href, data, puts):
+        # Expanded resources and collection items are cached on their own,
+        # and replaced by a reference to their href.
         resource_data = {}
         for name, value in data.items():
             if isinstance(value, dict) and 'href' in value:
                 v2 = {'href': value['href']}
                 if 'items' in value:
+                    # Expanded collection pages keep their paging, so that
+                    # they can be served from the resource, see
+                    # _cache_get_expanded.
+                    v2 = dict(value)
                     v2['items'] = []
 
                     for item in value['items']:
-                        self._cache_put(item['href'], item)
+                        self._collect_puts(item['href'], item, puts)
                         v2['items'].append({'href': item['href']})
+
+                    self._add_expanded_page(value['href'])
                 else:
                     if len(value) > 1:
-                        self._cache_put(value['href'], value)
+                        self._collect_puts(value['href'], value, puts)
             else:
                 v2 = value
 
             resource_data[name] = v2
 
-        self._get_cache(href).put(href, resource_data, new=new)
+        puts.append((href, resource_data))
+
+    def _cache_put_many(self, puts):
+        # Batch the puts by region, so that shared stores (like Redis) get a
+        # single round trip per region.
+        batches = OrderedDict()
+        for href, data in puts:
+            batches.setdefault(self._get_cache(href), []).append((href, data))
+
+        for cache, items in batches.items():
+            cache.put_many(items)
+
+    def _cache_put(self, href, data, new=True, validators=None, puts=None):
+        if puts is None:
+            puts = []
+
+        self._collect_puts(href, data, puts)
+        href, resource_data = puts.pop()
+        self._cache_put_many(puts)
+
+        if validators:
+            self._get_cache(href).put(href, resource_data, new=new, validators=validators)
+        else:
+            self._get_cache(href).put(href, resource_data, new=new)
 
     def uncache_resource(self, href):
         """
@@ -155,6 +485,222 @@ class DataStore(object):
             href = '/'.join(parts[:-1])
 
         self._get_cache(href).delete(href)
+        self._uncache_not_found(href)
+        self._expire_queries(href)
+
+    def _cache_not_found(self, href, error):
+        cache = self.cache_manager.get_cache(self.NOT_FOUND_REGION)
+        if cache is not None and error.status == 404:
+            cache.put(href, {
+                'status': error.status,
+                'code': error.code,
+                'developerMessage': error.developer_message,
+                'message': error.user_message,
+                'moreInfo': error.more_info,
+                'requestId': error.request_id,
+            })
+
+    def _raise_if_not_found(self, href):
+        cache = self.cache_manager.get_cache(self.NOT_FOUND_REGION)
+        error = cache.get(href) if cache is not None else None
+        if error is not None:
+            raise Error(error)
+
+    def _uncache_not_found(self, href):
+        cache = self.cache_manager.get_cache(self.NOT_FOUND_REGION)
+        if cache is not None:
+            cache.delete(href)
+
+    def _get_query_version(self, href):
+        # Queries are versioned by the type of their items, and by the links
+        # between types, see _expire_queries.
+        versions = self._query_versions
+        return '%d.%d' % (versions.get(None, 0), versions.get(href.rpartition('/')[2], 0))
+
+    def _get_query_key(self, href, params=None):
+        return '%s?%s#%s' % (href, urlencode(sorted((k, str(v)) for k, v in (params or {}).items())),
+            self._get_query_version(href))
+
+    def _expire_queries(self, href):
+        # Collection hrefs end with the type of their items, instance hrefs
+        # with an id after it.
+        head, _, kind = href.rpartition('/')
+        if kind not in self.CACHE_REGIONS and not kind.endswith(self.LINK_TYPES):
+            kind = head.rpartition('/')[2]
+
+        if kind.endswith(self.LINK_TYPES):
+            kind = None
+
+        self._query_versions[kind] = self._query_versions.get(kind, 0) + 1
+
+    def _cache_query(self, href, params, data):
+        cache = self.cache_manager.get_cache(self.QUERIES_REGION)
+        items = data.get('items')
+        if cache is None or not isinstance(items, list):
+            return
+
+        # Pages can only be resolved later if all their items are cached.
+        hrefs = [item.get('href') for item in items]
+        if not all(h and self._get_cache(h) is not NO_CACHE for h in hrefs):
+            return
+
+        page = dict((k, v) for k, v in data.items() if k != 'items')
+        page['items'] = hrefs
+        cache.put(self._get_query_key(href, params), page)
+
+    def _cache_get_query(self, href, params=None):
+        cache = self.cache_manager.get_cache(self.QUERIES_REGION)
+        if cache is None or self._get_cache(href) is not NO_CACHE:
+            return None
+
+        key = self._get_query_key(href, params)
+        page = cache.get(key)
+        if page is None:
+            return None
+
+        items = self._cache_get_items(page['items'])
+        if items is None:
+            # Some items expired, the page has to be fetched again.
+            cache.delete(key)
+            return None
+
+        return dict(page, items=items)
+
+    def _cache_get_items(self, hrefs):
+        batches = OrderedDict()
+        for href in hrefs:
+            batches.setdefault(self._get_cache(href), []).append(href)
+
+        items = {}
+        for cache, keys in batches.items():
+            items.update(cache.get_many(keys))
+
+        if len(items) < len(set(hrefs)):
+            return None
+
+        return [items[href] for href in hrefs]
+
+    def _add_expanded_page(self, href):
+        # The expanded collections are remembered with the version of their
+        # queries, so that they're no longer served from their resource once
+        # a resource of their type is created or deleted.
+        if len(self._expanded_pages) >= self.EXPANDED_PAGES_SIZE:
+            self._expanded_pages.clear()
+
+        self._expanded_pages[href] = self._get_query_version(href)
+
+    def _cache_get_expanded(self, href, params=None):
+        # Collections expanded in a cached resource are served from it, e.g.
+        # ".../accounts/A/groups" from ".../accounts/A".
+        version = self._expanded_pages.get(href)
+        if version is None or version != self._get_query_version(href):
+            return None
+
+        parent, _, name = href.rpartition('/')
+        data = self._get_cache(parent).get(parent)
+        page = data.get(name) if data is not None else None
+        if not isinstance(page, dict) or 'items' not in page:
+            return None
+
+        if params:
+            paging = {'offset': page.get('offset'), 'limit': page.get('limit')}
+            if set(params) != set(paging) or any(str(params[k]) != str(v) for k, v in paging.items()):
+                return None
+        elif page.get('offset') or len(page['items']) < page.get('size', 0):
+            return None
+
+        items = self._cache_get_items([item['href'] for item in page['items']])
+        if items is None:
+            return None
+
+        self.expansion_stats.avoid()
+        return dict(page, items=items)
+
+    def _is_expanded(self, data, params=None):
+        """Whether the resources expanded by ``params`` are cached along
+        with the cached ``data``."""
+        for name in self.EXPANSION_RE.findall((params or {}).get('expand') or ''):
+            value = data.get(name)
+            if not isinstance(value, dict) or 'href' not in value or 'items' in value:
+                continue
+
+            # Resources which aren't cached (like policies) can't be found
+            # however they were fetched, they're loaded lazily as before.
+            cache = self._get_cache(value['href'])
+            if cache is not NO_CACHE and cache.get(value['href']) is None:
+                return False
+
+        return True
+
+    def _cache_get_resource(self, href, params=None):
+        data = self._cache_get(href, refresh=lambda: self._refresh_resource(href, params))
+        if data is not None:
+            if params and 'expand' in params and not self._is_expanded(data, params):
+                self.expansion_stats.refetch()
+                return None
+
+            return data
+
+        data = self._cache_get_expanded(href, params)
+        if data is None:
+            data = self._cache_get_query(href, params)
+
+        return data
+
+    @staticmethod
+    def _get_request_key(href, params=None):
+        return (href, tuple(sorted((k, str(v)) for k, v in (params or {}).items())))
+
+    @staticmethod
+    def _get_revalidation_headers(entry):
+        if entry is None or not entry.has_validators:
+            return None
+
+        if entry.etag:
+            return {'If-None-Match': entry.etag}
+
+        return {'If-Modified-Since': entry.last_modified}
+
+    def _cache_fetched(self, href, data, params=None):
+        puts = []
+        for item in data.get('items') or []:
+            self._collect_puts(item['href'], item, puts)
+
+        self._cache_put(href, data, validators=getattr(data, 'validators', None), puts=puts)
+        self._cache_query(href, params, data)
+
+    def _get_fetch_headers(self, cache, href, params=None):
+        # Validators don't cover expanded resources, so expanded fetches
+        # aren't conditional.
+        if params and 'expand' in params:
+            return None, None
+
+        entry = cache.get_entry(href)
+        return entry, self._get_revalidation_headers(entry)
+
+    def _fetch_resource(self, href, params=None):
+        # An expired entry with validators only needs to be revalidated, if
+        # it hasn't changed the API replies with an empty 304 response.
+        cache = self._get_cache(href)
+        entry, headers = self._get_fetch_headers(cache, href, params)
+
+        if headers is None:
+            data = self.executor.get(href, params=params)
+        else:
+            data = self.executor.get(href, params=params, headers=headers)
+            if data.get('sp_http_status') == 304:
+                cache.revalidate(href, entry)
+                return entry.value
+
+        self._cache_fetched(href, data, params)
+
+        return data
+
+    def _refresh_resource(self, href, params=None):
+        # Background refreshes go through the single flight as well, so that
+        # they're shared with concurrent foreground fetches.
+        key = self._get_request_key(href, params)
+        self.refresher.schedule(key, self.single_flight.do, key, self._fetch_resource, href, params=params)
 
     def get_resource(self, href, params=None):
         """
@@ -162,7 +708,33 @@ class DataStore(object):
         Stormpath API service.
 
         If the resource needs to be retrieved from the Stormpath API service, it
-        will also be inserted into the cache.
+        will also be inserted into the cache. Concurrent requests for the same
+        resource (and params) are collapsed into a single API call, see
+        ``data_store.single_flight.summary`` for statistics.
+
+        While the executor's circuit breaker is open, stale cache entries are
+        returned for regions configured with a ``stale_ttl``.
+
+        With query caching enabled (see the ``queries`` cache option),
+        collection pages and search results are served from the cache as
+        well.
+
+        Resources cached without the expansions requested by ``params`` are
+        fetched again (expanded), and collections expanded in cached
+        resources are served from them, see ``data_store.expansion_stats``.
+
+        With negative caching enabled (see the ``not_found`` cache option),
+        the 404 errors of recently missing resources are raised again
+        without calling the API.
+
+        Expired cache entries which came with ``ETag`` or ``Last-Modified``
+        validators are revalidated with a conditional request, and refreshed
+        without being downloaded again if they haven't changed.
+
+        For regions configured with ``stale_while_revalidate`` or
+        ``refresh_ahead_ratio``, expired (or about to expire) entries are
+        returned right away and refreshed by ``data_store.refresher`` in the
+        background.
 
         :param str href: The href of the resource to retrieve.
         :param params: Any additional params to use when fetching the resource.
@@ -183,30 +755,88 @@ class DataStore(object):
         #   no)
         #   - recursively cache resources via expansions
         #   - remove expanded resources and 'clean' objects before caching
-        data = self._cache_get(href)
+        data = self._cache_get_resource(href, params)
         if data is None:
-            data = self.executor.get(href, params=params)
+            self._raise_if_not_found(href)
+
+            try:
+                data = self.single_flight.do(self._get_request_key(href, params), self._fetch_resource, href, params=params)
+            except CircuitOpenError:
+                data = self._cache_get_stale(href)
+                if data is None:
+                    raise
+            except Error as e:
+                self._cache_not_found(href, e)
+                raise
 
-            if data.get('items') and len(data['items']) > 0:
-                for item in data.get('items'):
-                    self._cache_put(item['href'], item)
+        return data
+
+    def preload_resource(self, href, params=None):
+        """
+        Fetch a resource from the Stormpath API service even if it is
+        cached, and cache it along with its expanded resources (and the
+        items of collections).
 
-            self._cache_put(href, data)
+        :param str href: The href of the resource to fetch.
+        :param params: Any additional params, usually an ``expand``.
+        :type params: dict or None, optional
+        :returns: The fetched resource.
+        :rtype: dict
+        """
+        data = self.executor.get(href, params=params)
+        self._cache_fetched(href, data, params)
 
         return data
 
+    @property
+    def stream_collections(self):
+        """Whether collection pages are parsed incrementally, see
+        :meth:`iter_resource_items`."""
+        return getattr(self.executor, 'stream_collections', False) is True
+
+    def iter_resource_items(self, href, params=None):
+        """
+        Fetch a collection page from the Stormpath API service and yield its
+        items as they are parsed, caching them on the way (in batches of
+        ``STREAM_BATCH_SIZE`` items). The page itself is neither cached nor
+        held in memory.
+
+        :param str href: The href of the collection.
+        :param params: The query params, e.g. offset and limit.
+        :type params: dict or None, optional
+        """
+        puts = []
+        try:
+            for item in self.executor.iter_items(href, params=params):
+                self._collect_puts(item['href'], item, puts)
+                if len(puts) >= self.STREAM_BATCH_SIZE:
+                    self._cache_put_many(puts)
+                    puts = []
+
+                yield item
+        finally:
+            # Also when the caller stops early.
+            self._cache_put_many(puts)
+
     def create_resource(self, href, data, params=None):
         data = self.executor.post(href, data, params=params)
         self._cache_put(href, data)
+        self._expire_queries(href)
+        if 'href' in data:
+            self._uncache_not_found(data['href'])
+            self._publish(data['href'])
 
         return data
 
     def update_resource(self, href, data):
         data = self.executor.post(href, data)
         self._cache_put(href, data, new=False)
+        self._expire_queries(href)
+        self._publish(href)
 
         return data
 
     def delete_resource(self, href):
         self.executor.delete(href)
         self.uncache_resource(href)
+        self._publish(href)
@@ -55,3 +55,16 @@ class Error(RuntimeError):
         self.more_info = error.get('moreInfo')
         self.message = msg
         self.request_id = error.get('requestId')
+
+
+class CircuitOpenError(Error):
+    """Error raised instead of sending a request to the Stormpath API while
+    the :class:`stormpath.circuit_breaker.CircuitBreaker` is open."""
+    def __init__(self, error=None, http_status=None):
+        if error is None:
+            error = {
+                'developerMessage': 'The Stormpath API circuit breaker is open, the request was not sent.',
+                'message': 'The service is temporarily unavailable.',
+            }
+
+        super(CircuitOpenError, self).__init__(error, http_status=http_status)
@@ -4,11 +4,20 @@ import cgi
 import time
 import random
 
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 from json import dumps
 from requests import Session
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
 from requests.exceptions import RequestException
+from six import string_types
 from sys import version_info as vi
+from threading import Lock
+from weakref import WeakSet
+
+try:
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+except ImportError:
+    from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 # Hack for Google App Engine
 # GAE doesn't allow users to import `win32_ver` as it's sandbox mode rips
@@ -21,7 +30,177 @@ except ImportError:
 
 
 from stormpath import __version__ as STORMPATH_VERSION
-from .error import Error
+from .error import CircuitOpenError, Error
+from .retry import RetryPolicy, parse_retry_after
+
+
+class ResponseData(dict):
+    """The JSON body of a response, along with the cache validators
+    (``ETag`` and ``Last-Modified`` headers) the API sent for it."""
+    etag = None
+    last_modified = None
+
+    @property
+    def validators(self):
+        validators = {}
+        if self.etag:
+            validators['etag'] = self.etag
+        if self.last_modified:
+            validators['last_modified'] = self.last_modified
+
+        return validators
+
+
+class ConnectionPoolStats(object):
+    """Represents HTTP connection pool statistics.
+
+    ``created`` counts connections which had to be (re)established,
+    ``reused`` counts requests sent over an already open keep-alive
+    connection, and ``reaped`` counts connections closed because they were
+    idle or too old. ``in_use`` and ``idle`` are the current pool occupancy.
+    """
+    Summary = namedtuple('ConnectionPoolStats', 'created reused reaped in_use idle')
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pools = WeakSet()
+        self.created = 0
+        self.reused = 0
+        self.reaped = 0
+        self.in_use = 0
+
+    def add_pool(self, pool):
+        with self._lock:
+            self._pools.add(pool)
+
+    def checkout(self, reused, reaped=False):
+        with self._lock:
+            self.in_use += 1
+            if reused:
+                self.reused += 1
+            else:
+                self.created += 1
+            if reaped:
+                self.reaped += 1
+
+    def checkin(self):
+        with self._lock:
+            if self.in_use > 0:
+                self.in_use -= 1
+
+    @property
+    def idle(self):
+        idle = 0
+        for pool in list(self._pools):
+            queue = pool.pool
+            if queue is not None:
+                idle += len([conn for conn in list(queue.queue) if conn is not None])
+
+        return idle
+
+    @property
+    def summary(self):
+        return self.Summary(self.created, self.reused, self.reaped, self.in_use, self.idle)
+
+
+class ManagedConnectionPoolMixin(object):
+    """Adds connection reaping and usage statistics to urllib3 connection
+    pools.
+
+    Connections which have been idle in the pool for longer than
+    ``idle_timeout`` seconds, or which were established more than
+    ``max_age`` seconds ago, are closed when checked out and transparently
+    re-established. This keeps us from reusing connections which were
+    silently dropped by load balancers, and spreads long lived clients over
+    the API hosts.
+    """
+    idle_timeout = None
+    max_age = None
+    stats = None
+
+    def __init__(self, *args, **kwargs):
+        super(ManagedConnectionPoolMixin, self).__init__(*args, **kwargs)
+        self.stats.add_pool(self)
+
+    def _is_expired(self, conn, now):
+        if self.idle_timeout is not None and now - getattr(conn, '_sp_released_at', now) > self.idle_timeout:
+            return True
+
+        if self.max_age is not None and now - getattr(conn, '_sp_connected_at', now) > self.max_age:
+            return True
+
+        return False
+
+    def _get_conn(self, timeout=None):
+        conn = super(ManagedConnectionPoolMixin, self)._get_conn(timeout=timeout)
+        now = time.time()
+        reaped = False
+
+        if getattr(conn, 'sock', None) is not None and self._is_expired(conn, now):
+            conn.close()
+            reaped = True
+
+        reused = getattr(conn, 'sock', None) is not None
+        if not reused:
+            conn._sp_connected_at = now
+
+        self.stats.checkout(reused, reaped=reaped)
+
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._sp_released_at = time.time()
+
+        self.stats.checkin()
+        super(ManagedConnectionPoolMixin, self)._put_conn(conn)
+
+
+class PoolingHTTPAdapter(HTTPAdapter):
+    """A Requests transport adapter with tunable connection pooling.
+
+    :param pool_connections: The number of per host connection pools to keep.
+    :param pool_maxsize: The maximum number of connections kept per host.
+    :param pool_block: Whether to block waiting for a free connection when
+        the pool is exhausted, instead of opening an overflow connection which
+        is discarded after use.
+    :param idle_timeout: Number of seconds after which idle keep-alive
+        connections are reaped (None disables reaping).
+    :param max_age: Number of seconds after which connections are closed and
+        re-established (None disables the limit).
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['idle_timeout', 'max_age']
+
+    def __init__(self, pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE,
+            pool_block=DEFAULT_POOLBLOCK, idle_timeout=None, max_age=None, **kwargs):
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.stats = ConnectionPoolStats()
+
+        super(PoolingHTTPAdapter, self).__init__(pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize, pool_block=pool_block, **kwargs)
+
+    def _managed_pool_classes(self):
+        attrs = {'idle_timeout': self.idle_timeout, 'max_age': self.max_age, 'stats': self.stats}
+
+        return {
+            'http': type('HTTPConnectionPool', (ManagedConnectionPoolMixin, HTTPConnectionPool), attrs),
+            'https': type('HTTPSConnectionPool', (ManagedConnectionPoolMixin, HTTPSConnectionPool), attrs),
+        }
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PoolingHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._managed_pool_classes()
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super(PoolingHTTPAdapter, self).proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = self._managed_pool_classes()
+
+        return manager
+
+    def __setstate__(self, state):
+        self.stats = ConnectionPoolStats()
+        super(PoolingHTTPAdapter, self).__setstate__(state)
 
 
 class HttpExecutor(object):
@@ -39,9 +218,50 @@ class HttpExecutor(object):
     :param get_delay: A Function that will return the number of milliseconds
         to wait before retrying the request. The function must take one parameter
         which is the number of retries already done. If no function is supplied
-        the default backoff strategy is used (see the pause_exponentially method).
+        the default backoff strategy is used (see the get_backoff_delay method).
+
+    :param pool_connections: The number of per host connection pools to keep.
+
+    :param pool_maxsize: The maximum number of keep-alive connections kept per
+        host. It should be at least the number of threads sharing the client.
+
+    :param pool_block: If True, requests wait for a free pooled connection
+        when all of them are in use. Otherwise an overflow connection is
+        opened and discarded after use (default).
+
+    :param pool_idle_timeout: Number of seconds after which idle keep-alive
+        connections are reaped instead of reused.
+
+    :param pool_max_age: Number of seconds after which connections are
+        closed and re-established.
+
+    :param retry_policy: A :class:`stormpath.retry.RetryPolicy` controlling
+        the maximum number of retries, the request deadline, the retry budget
+        and which requests may be retried. Clients should use a single policy
+        so that the budget is shared.
+
+    :param circuit_breaker: An optional
+        :class:`stormpath.circuit_breaker.CircuitBreaker`. While it is open,
+        requests fail fast with :class:`stormpath.error.CircuitOpenError`.
+
+    :param rate_limiter: An optional
+        :class:`stormpath.rate_limiter.AdaptiveRateLimiter` every request
+        (including retries) has to go through.
+
+    :param transport: A requests transport adapter sending the requests
+        instead of the default pooling adapter (the ``pool_*`` options are
+        ignored then), e.g. a :class:`stormpath.testing.ReplayAdapter` or a
+        :class:`stormpath.testing.FakeStormpathAPI`.
+
+    :param stream_collections: Parse the items of collection pages
+        incrementally while they are downloaded (see :meth:`iter_items`),
+        instead of reading the whole page in memory first. It requires the
+        ijson library (``pip install stormpath[streaming]``).
+
+    Responses are requested gzip or deflate compressed.
     """
-    DEFAULT_MAX_RETRIES = 4
+    DEFAULT_MAX_RETRIES = RetryPolicy.DEFAULT_MAX_RETRIES
+    BASE_BACKOFF_IN_MILLISECONDS = 500
     MAX_BACKOFF_IN_MILLISECONDS = 20 * 1000
 
     os_info = platform()
@@ -58,24 +278,59 @@ class HttpExecutor(object):
         os_versions.get(system(), ''),
     )
 
-    def __init__(self, base_url, auth, proxies=None, user_agent=None, get_delay=None):
+    def __init__(self, base_url, auth, proxies=None, user_agent=None, get_delay=None,
+            pool_connections=DEFAULT_POOLSIZE, pool_maxsize=DEFAULT_POOLSIZE, pool_block=DEFAULT_POOLBLOCK,
+            pool_idle_timeout=None, pool_max_age=None, retry_policy=None, circuit_breaker=None,
+            rate_limiter=None, stream_collections=False, transport=None):
         # If a custom user agent is specified, we'll append it to the end of
         # our built-in user agent.  This way we'll get very detailed user agent
         # strings.
         if user_agent is not None:
             self.USER_AGENT = user_agent + ' ' + self.USER_AGENT
 
+        self.stream_collections = stream_collections
+        if stream_collections:
+            try:
+                import ijson
+            except ImportError:
+                raise RuntimeError('Streaming JSON parsing is not available. Run "pip install stormpath[streaming]".')
+
+            self._ijson = ijson
+
         self.get_delay = get_delay
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.rate_limiter = rate_limiter
         self.base_url = base_url
         self.session = Session()
         self.session.proxies = proxies or {}
         self.session.auth = auth
         self.session.headers.update({
             'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
             'Content-Type': 'application/json',
             'User-Agent': self.USER_AGENT,
         })
 
+        self.adapter = transport or PoolingHTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block, idle_timeout=pool_idle_timeout,
+            max_age=pool_max_age)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    @property
+    def retry_stats(self):
+        """Retry statistics, see :class:`stormpath.retry.RetryStats`."""
+        return self.retry_policy.stats
+
+    @property
+    def pool_stats(self):
+        """Connection pool statistics, see
+        :class:`stormpath.http.ConnectionPoolStats`, or None if the
+        transport doesn't pool connections."""
+        return getattr(self.adapter, 'stats', None)
+
     def is_throttling_or_unexpected_error(self, status):
         """Helper method for determining if the request was told to back off,
         or if an unexpected error in the 5xx range occured."""
@@ -87,28 +342,90 @@ class HttpExecutor(object):
         else:
             return False
 
-    def pause_exponentially(self, retries):
-        """Helper method for calculating the number of milliseconds to sleep
-        before re-trying a request."""
+    def get_backoff_delay(self, retries):
+        """Helper method for calculating the number of milliseconds to wait
+        before re-trying a request.
+
+        The default strategy is an exponential backoff with jitter, so that
+        clients failing at the same time don't retry in lockstep.
+        """
 
         if self.get_delay is not None:
             delay = self.get_delay(retries)
         else:
-            scale_factor = 500 + random.randint(1, 100)
-            delay = 2 ** retries * scale_factor
+            delay = min(2 ** retries * self.BASE_BACKOFF_IN_MILLISECONDS, self.MAX_BACKOFF_IN_MILLISECONDS)
+            delay = delay / 2.0 + random.uniform(0, delay / 2.0)
+
+        return min(delay, self.MAX_BACKOFF_IN_MILLISECONDS)
 
-        delay = min(delay, self.MAX_BACKOFF_IN_MILLISECONDS)
+    def pause_exponentially(self, retries):
+        """Deprecated, retries wait for :meth:`get_backoff_delay` (or for
+        the ``Retry-After`` header) instead."""
 
         # sleep in seconds
-        time.sleep(delay / float(1000))
+        time.sleep(self.get_backoff_delay(retries) / float(1000))
 
     def should_retry(self, retries, status):
         """Helper method for deciding if a request should be retried."""
         if self.is_throttling_or_unexpected_error(status):
-            if retries < self.DEFAULT_MAX_RETRIES:
+            if retries < self.retry_policy.max_retries:
                 return True
         return False
 
+    def get_retry_delay(self, method, retries, status, response=None, deadline=None):
+        """Helper method for deciding if and when a failed request should be
+        retried.
+
+        It returns the number of milliseconds to wait before retrying, or None
+        if the request shouldn't be retried. A ``Retry-After`` header sent
+        along a 429 or 503 response is honoured, unless it asks to wait longer
+        than ``MAX_BACKOFF_IN_MILLISECONDS``, in which case the request isn't
+        retried.
+        """
+        if not self.should_retry(retries, status):
+            if self.is_throttling_or_unexpected_error(status):
+                self.retry_policy.stats.incr('exhausted')
+            return None
+
+        delay = self.get_backoff_delay(retries)
+        if response is not None and status in (429, 503):
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                # Don't block the request for longer than any backoff, the
+                # error is raised instead.
+                if retry_after > self.MAX_BACKOFF_IN_MILLISECONDS:
+                    self.retry_policy.stats.incr('not_retryable')
+                    return None
+
+                delay = max(delay, retry_after)
+
+        if not self.retry_policy.allow_retry(method, status, delay, deadline):
+            return None
+
+        return delay
+
+    def check_circuit(self):
+        """Helper method failing fast while the circuit breaker is open."""
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow_request():
+            raise CircuitOpenError()
+
+    def record_attempt(self, status, started_at, headers=None):
+        """Helper method reporting the outcome of a request to the circuit
+        breaker and the rate limiter."""
+        if self.circuit_breaker is not None:
+            failed = not isinstance(status, int) or status >= 500
+            self.circuit_breaker.record(failed, time.time() - started_at)
+
+        if self.rate_limiter is not None and isinstance(status, int):
+            self.rate_limiter.update(status, headers)
+
+    def get_attempt_timeout(self, deadline):
+        """The time left for the request to complete, in seconds."""
+        if deadline is None:
+            return None
+
+        return max(deadline - time.time(), 0.001)
+
     def raise_error(self, r):
         try:
             ret = r.json()
@@ -125,11 +442,23 @@ class HttpExecutor(object):
         raise Error(ret, http_status=r.status_code)
 
     def return_response(self, r):
-        if not r.text:
+        if r.status_code == 304:
+            return {'sp_http_status': r.status_code}
+
+        # Check the raw body, r.text would decode it only for r.json() to
+        # decode it again.
+        if not r.content:
             return {}
         try:
             d = r.json()
             d['sp_http_status'] = r.status_code
+
+            etag = r.headers.get('ETag')
+            last_modified = r.headers.get('Last-Modified')
+            if isinstance(d, dict) and (isinstance(etag, string_types) or isinstance(last_modified, string_types)):
+                d = ResponseData(d)
+                d.etag = etag if isinstance(etag, string_types) else None
+                d.last_modified = last_modified if isinstance(last_modified, string_types) else None
         except ValueError:
             d = {}
             d['content'] = r.content
@@ -138,43 +467,89 @@ class HttpExecutor(object):
             d['filename'] = params.get('filename')
         return d
 
-    def request(self, method, url, data=None, params=None, headers=None, retry_count=0):
+    def request(self, method, url, data=None, params=None, headers=None, retry_count=0, stream=False):
         if params:
             params = OrderedDict(sorted(params.items()))
 
         if not url.startswith(self.base_url):
             url = self.base_url + url
 
-        try:
-            r = self.session.request(method, url, data=data, params=params, headers=headers, allow_redirects=False)
-        except Exception as e:
-            if self.should_retry(retry_count, e):
-                self.pause_exponentially(retry_count)
-                return self.request(method, url, data=data, params=params, headers=headers, retry_count=retry_count + 1)
+        deadline = self.retry_policy.get_deadline()
+        self.retry_policy.start()
+
+        while True:
+            kwargs = {}
+            if deadline is not None:
+                kwargs['timeout'] = self.get_attempt_timeout(deadline)
+            if stream:
+                kwargs['stream'] = True
+
+            self.check_circuit()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            r = None
+            started_at = time.time()
+            try:
+                r = self.session.request(method, url, data=data, params=params, headers=headers, allow_redirects=False, **kwargs)
+            except Exception as e:
+                status = e
+                self.record_attempt(status, started_at)
             else:
-                raise Error({'developerMessage': str(e)})
+                self.record_attempt(r.status_code, started_at, r.headers)
 
-        if r.status_code in [301, 302] and 'location' in r.headers:
-            if not r.headers['location'].startswith(self.base_url):
-                message = 'Trying to redirect outside of API base url: {}'.format(r.headers['location'])
-                raise Error({'developerMessage': message})
+                if r.status_code in [301, 302] and 'location' in r.headers:
+                    if not r.headers['location'].startswith(self.base_url):
+                        message = 'Trying to redirect outside of API base url: {}'.format(r.headers['location'])
+                        raise Error({'developerMessage': message})
 
-            return self.request('GET', r.headers['location'], params=params)
+                    return self.request('GET', r.headers['location'], params=params, stream=stream)
+
+                if not (r.status_code >= 400 and r.status_code <= 600):
+                    return r if stream else self.return_response(r)
+
+                status = r.status_code
+
+            delay = self.get_retry_delay(method, retry_count, status, response=r, deadline=deadline)
+            if delay is None:
+                if r is None:
+                    raise Error({'developerMessage': str(status)})
 
-        if r.status_code >= 400 and r.status_code <= 600:
-            if self.should_retry(retry_count, r.status_code):
-                self.pause_exponentially(retry_count)
-                return self.request(method, url, data=data, params=params, headers=headers, retry_count=retry_count + 1)
-            else:
                 self.raise_error(r)
 
-        return self.return_response(r)
+            if stream and r is not None:
+                r.close()
+
+            time.sleep(delay / float(1000))
+            retry_count += 1
+
+    def get(self, url, params=None, headers=None):
+        return self.request('GET', url, params=params, headers=headers)
+
+    def iter_items(self, url, params=None):
+        """Fetch a collection page, and yield its items one at a time as they
+        are parsed from the (streamed) response body.
 
-    def get(self, url, params=None):
-        return self.request('GET', url, params=params)
+        It requires the executor to be created with ``stream_collections``.
+        """
+        if not self.stream_collections:
+            raise ValueError('Streaming collections is not enabled.')
+
+        r = self.request('GET', url, params=params, stream=True)
+        r.raw.decode_content = True
+
+        try:
+            for item in self._ijson.items(r.raw, 'items.item', use_float=True):
+                yield item
+        finally:
+            r.close()
 
     def post(self, url, data, params=None, headers=None):
         return self.request('POST', url, data=dumps(data), params=params, headers=headers)
 
     def delete(self, url):
         return self.request('DELETE', url)
+
+    def close(self):
+        """Close the pooled connections, new ones are opened as needed."""
+        self.session.close()
@@ -0,0 +1,43 @@
+"""Per-request identity maps of resources."""
+
+from collections import namedtuple
+
+
+class IdentityMap(object):
+    """Maps the hrefs of the resources loaded during a unit of work (like a
+    web request) to their objects, so that every href is represented by a
+    single resource object, built and hydrated once.
+
+    Identity maps are not meant to be used directly, but through
+    :meth:`stormpath.client.Client.session`.
+    """
+    Summary = namedtuple('IdentityMapStats', 'hits misses size')
+
+    def __init__(self):
+        self._resources = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cls, href):
+        """The resource of ``href`` if it was loaded as a ``cls``."""
+        resource = self._resources.get(href)
+        if resource is None or not isinstance(resource, cls):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return resource
+
+    def add(self, resource):
+        if resource.href is not None:
+            self._resources[resource.href] = resource
+
+    def clear(self):
+        self._resources.clear()
+
+    def __len__(self):
+        return len(self._resources)
+
+    @property
+    def summary(self):
+        return self.Summary(self.hits, self.misses, len(self._resources))
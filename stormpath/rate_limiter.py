@@ -0,0 +1,132 @@
+"""Client-side adaptive rate limiting."""
+
+import time
+
+from collections import namedtuple
+from threading import Lock
+
+from .retry import parse_retry_after
+
+
+class AdaptiveRateLimiter(object):
+    """A token bucket limiting the rate of requests sent to the Stormpath
+    API, which adapts its rate to the throttling it encounters.
+
+    The permitted rate follows an AIMD (additive increase, multiplicative
+    decrease) control: every second worth of successful requests raises it
+    by ``increase`` requests per second, up to ``max_rate``, while a 429
+    response multiplies it by ``decrease_factor``, down to ``min_rate``.
+    A ``Retry-After`` header on the 429 response pauses the bucket (for at
+    most ``MAX_PAUSE`` seconds), and the
+    ``X-RateLimit-Remaining`` / ``X-RateLimit-Reset`` (seconds until the
+    quota resets) headers, when sent, cap the rate to what's left of the
+    current quota.
+
+    A limiter is meant to be shared by all the threads using a client, so
+    that the whole process backs off together.
+
+    :param rate: The initial permitted rate, in requests per second.
+    :param burst: The size of the bucket, i.e. how many requests may be sent
+        at once after a quiet period. Defaults to the initial rate.
+
+    Example::
+
+        limiter = AdaptiveRateLimiter(rate=50, max_rate=200)
+        client = Client(id='xxx', secret='xxx', rate_limiter=limiter)
+        limiter.summary  # current rate, average queue wait time, ...
+    """
+    Summary = namedtuple('RateLimiterStats', 'rate requests throttled waiting wait_time average_wait')
+    DECREASE_INTERVAL = 1.0  # seconds
+    MAX_PAUSE = 20.0  # seconds, like the longest retry backoff
+
+    def __init__(self, rate=50.0, min_rate=1.0, max_rate=500.0, burst=None, increase=0.5, decrease_factor=0.5):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.burst = float(burst or rate)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+
+        self._lock = Lock()
+        self._tokens = self.burst
+        self._updated_at = time.time()
+        self._decreased_at = 0
+        self.requests = 0
+        self.throttled = 0
+        self.waiting = 0
+        self.wait_time = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self._tokens + (now - self._updated_at) * self.rate, self.burst)
+        self._updated_at = now
+
+    def reserve(self):
+        """Take a token from the bucket, and return the number of seconds
+        the caller has to wait before sending its request."""
+        with self._lock:
+            now = time.time()
+            self._refill(now)
+
+            self._tokens -= 1
+            self.requests += 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.wait_time += wait
+
+            return wait
+
+    def acquire(self):
+        """Block until a request may be sent, returns the time waited."""
+        wait = self.reserve()
+
+        if wait > 0:
+            with self._lock:
+                self.waiting += 1
+
+            try:
+                time.sleep(wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+        return wait
+
+    def update(self, status, headers=None):
+        """Adapt the permitted rate to a response from the API."""
+        headers = headers or {}
+
+        with self._lock:
+            now = time.time()
+            self._refill(now)
+
+            if status == 429:
+                self.throttled += 1
+
+                # Only back off once per burst of throttled responses.
+                if now - self._decreased_at >= self.DECREASE_INTERVAL:
+                    self.rate = max(self.rate * self.decrease_factor, self.min_rate)
+                    self._decreased_at = now
+
+                retry_after = parse_retry_after(headers.get('Retry-After'))
+                if retry_after:
+                    pause = min(retry_after / 1000.0, self.MAX_PAUSE)
+                    self._tokens = min(self._tokens, -pause * self.rate)
+            else:
+                self.rate = min(self.rate + self.increase / self.rate, self.max_rate)
+
+            remaining = headers.get('X-RateLimit-Remaining')
+            reset = parse_retry_after(headers.get('X-RateLimit-Reset'))
+            if remaining is not None and reset:
+                try:
+                    quota_rate = float(remaining) / (reset / 1000.0)
+                except ValueError:
+                    pass
+                else:
+                    self.rate = min(self.rate, max(quota_rate, self.min_rate))
+
+    @property
+    def average_wait(self):
+        return self.wait_time / self.requests if self.requests else 0.0
+
+    @property
+    def summary(self):
+        return self.Summary(self.rate, self.requests, self.throttled, self.waiting, self.wait_time, self.average_wait)
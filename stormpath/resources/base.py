@@ -16,12 +16,23 @@ except NameError:
 
 from pydispatch import dispatcher
 
+from ..identity_map import IdentityMap
+
 
 SIGNAL_RESOURCE_CREATED = 'resource-created'
 SIGNAL_RESOURCE_UPDATED = 'resource-updated'
 SIGNAL_RESOURCE_DELETED = 'resource-deleted'
 
 
+class NotLoadedError(AttributeError):
+    """Raised when the attributes of a resource of the async client are
+    accessed before the resource was loaded with ``await``.
+
+    It is an :class:`AttributeError`, so that ``hasattr``, ``getattr``
+    with a default and ``str`` work with resources which aren't loaded.
+    """
+
+
 class ResourceEncoder(JSONEncoder):
     def default(self, o):
         data = {}
@@ -137,9 +148,34 @@ class Resource(object):
     def get_resource_attributes():
         return {}
 
+    def _get_identity_map(self):
+        identity_map = getattr(self._client, 'identity_map', None)
+        return identity_map if isinstance(identity_map, IdentityMap) else None
+
+    def _get_mapped_resource(self, cls, properties, identity_map):
+        # Resource factories (like AccountStore) are mapped as any resource,
+        # collections aren't mapped since they depend on their query.
+        kind = cls if isinstance(cls, type) else Resource
+        if not issubclass(kind, Resource) or issubclass(kind, CollectionResource):
+            return cls(self._client, properties=properties)
+
+        resource = identity_map.get(kind, properties['href'])
+        if resource is None:
+            resource = cls(self._client, properties=properties)
+            identity_map.add(resource)
+        elif len(properties) > 1 and resource._get_property_names() == ['href']:
+            # The resource was only referenced so far, e.g. now expanded.
+            resource._set_properties(properties)
+
+        return resource
+
     def _wrap_resource_attr(self, cls, value):
+        identity_map = self._get_identity_map()
+
         if isinstance(value, Resource):
             return value
+        elif isinstance(value, dict) and 'href' in value and identity_map is not None:
+            return self._get_mapped_resource(cls, value, identity_map)
         elif isinstance(value, dict) or (isinstance(value, list) and cls == ListOnResource):
             return cls(self._client, properties=value)
         elif value is None:
@@ -251,10 +287,7 @@ class Resource(object):
     def is_new(self):
         return self.href is None
 
-    def _ensure_data(self, overwrite=False):
-        if self.is_new():
-            return
-
+    def _get_params(self):
         params = {}
         if self._query:
             params.update(self._query)
@@ -266,12 +299,33 @@ class Resource(object):
             params['limit'] = self.__dict__['limit']
             params['offset'] = self.__dict__['offset']
 
-        if not params:
-            params = None
+        return params or None
+
+    def _ensure_data(self, overwrite=False):
+        if self.is_new():
+            return
+
+        # Async data stores can't fetch anything from a synchronous attribute
+        # access, the resource has to be loaded with `await resource` first.
+        if getattr(self._store, 'is_async', False) is True:
+            if self._get_property_names() == ['href']:
+                raise NotLoadedError(
+                    "%r has not been loaded yet, use 'await' to fetch it "
+                    "through the async client." % self)
+            return
 
-        data = self._store.get_resource(self.href, params=params)
+        data = self._store.get_resource(self.href, params=self._get_params())
         self._set_properties(data, overwrite=overwrite)
 
+    def __await__(self):
+        """Loads the resource through an async data store.
+
+        Example::
+
+            account = await client.accounts.get(href)
+        """
+        return self._store.load_resource(self).__await__()
+
     def refresh(self):
         """Refreshes the local copy of a Resource or Resource List from the API
 
@@ -398,29 +452,45 @@ class CollectionResource(Resource):
         if items is not None:
             self.__dict__['items'] = [self._wrap_resource_attr(self.resource_class, item) for item in items]
 
-    def _get_next_page(self, offset, limit):
+    def _get_next_page_params(self, offset, limit):
         params = deepcopy(self._query) or {}
 
         # If the user explicitly asked for a limited set of data, do nothing.
         if 'offset' in params or 'limit' in params:
-            return []
+            return None
 
         # We know the full size of the Collection via the size property
         # we get from the API. If we've reached the end don't make
         # that one extra API call because it's not necessary
         if not (offset < self.size):
-            return []
+            return None
 
         params['offset'] = offset
         params['limit'] = limit
 
-        data = self._store.get_resource(self.href, params=params)
-        items = [self._wrap_resource_attr(self.resource_class, item) for item in data.get('items', [])]
+        return params
+
+    def _add_items(self, items):
+        items = [self._wrap_resource_attr(self.resource_class, item) for item in items]
         self.__dict__['items'].extend(items)
         self.__dict__['limit'] += len(items)
 
         return items
 
+    def _add_page(self, data):
+        return self._add_items(data.get('items', []))
+
+    def _get_next_page(self, offset, limit):
+        params = self._get_next_page_params(offset, limit)
+        if params is None:
+            return []
+
+        # Hydrate items as they are parsed, without holding the whole page.
+        if getattr(self._store, 'stream_collections', False) is True:
+            return self._add_items(self._store.iter_resource_items(self.href, params=params))
+
+        return self._add_page(self._store.get_resource(self.href, params=params))
+
     def __iter__(self):
         self._ensure_data()
 
@@ -441,6 +511,16 @@ class CollectionResource(Resource):
 
         self.__dict__['limit'] = limit
 
+    def __aiter__(self):
+        """Iterates over the collection through an async data store.
+
+        Example::
+
+            async for account in application.accounts:
+                ...
+        """
+        return self._store.iter_collection(self)
+
     def __len__(self):
         self._ensure_data()
         return self.__dict__.get('_sliced_size', self.size)
@@ -472,6 +552,10 @@ class CollectionResource(Resource):
         if '/' not in href:
             href = self._get_create_path() + '/' + href
 
+        identity_map = self._get_identity_map()
+        if identity_map is not None and expand is None:
+            return self._get_mapped_resource(self.resource_class, {'href': href}, identity_map)
+
         return self.resource_class(self._client, href=href, expand=expand)
 
     def search(self, query):
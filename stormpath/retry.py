@@ -0,0 +1,172 @@
+"""Retry policies used by the HTTP executors."""
+
+import time
+
+from collections import namedtuple
+from email.utils import mktime_tz, parsedate_tz
+from threading import Lock
+
+from requests.exceptions import ConnectTimeout
+
+
+def parse_retry_after(value):
+    """Parse a ``Retry-After`` header value (either a number of seconds or
+    an HTTP date) into a number of milliseconds, or None if it's invalid."""
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0) * 1000
+    except ValueError:
+        pass
+
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+
+    return max(mktime_tz(parsed) - time.time(), 0) * 1000
+
+
+class RetryBudget(object):
+    """A token bucket limiting the number of retries issued by a client.
+
+    Every request deposits ``ratio`` tokens in the bucket (up to
+    ``max_tokens``), and every retry withdraws one, so that retries can't
+    exceed the given share of the traffic. On top of that ``min_per_second``
+    retries are always allowed, so that clients with little traffic can still
+    retry. A budget is meant to be shared by all the threads using a client,
+    to stop retry storms when the Stormpath API is degraded.
+
+    :param ratio: Retries allowed per request.
+    :param min_per_second: Retries always allowed every second.
+    :param max_tokens: The maximum number of tokens that can be saved up.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=10, max_tokens=100):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._lock = Lock()
+        self._tokens = 0.0
+        self._reserve = float(min_per_second)
+        self._refilled_at = time.time()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """Take a token out of the budget, returns False if it's depleted."""
+        with self._lock:
+            now = time.time()
+            self._reserve = min(self._reserve + (now - self._refilled_at) * self.min_per_second, self.min_per_second)
+            self._refilled_at = now
+
+            if self._reserve >= 1:
+                self._reserve -= 1
+                return True
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+
+            return False
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+
+class RetryStats(object):
+    """Represents retry statistics.
+
+    ``exhausted`` counts requests which failed after using all their
+    retries, ``budget_exceeded`` and ``deadline_exceeded`` count retries
+    denied by the retry budget and by the request deadline, and
+    ``not_retryable`` counts failed non-idempotent requests which were not
+    retried.
+    """
+    Summary = namedtuple('RetryStats', 'requests retries exhausted budget_exceeded deadline_exceeded not_retryable')
+
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = 0
+        self.retries = 0
+        self.exhausted = 0
+        self.budget_exceeded = 0
+        self.deadline_exceeded = 0
+        self.not_retryable = 0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @property
+    def summary(self):
+        return self.Summary(self.requests, self.retries, self.exhausted,
+            self.budget_exceeded, self.deadline_exceeded, self.not_retryable)
+
+
+class RetryPolicy(object):
+    """Decides if and when failed requests are retried.
+
+    :param max_retries: The maximum number of retries of a single request.
+
+    :param deadline: The number of seconds a request, including all of its
+        retries, is allowed to take. None means no deadline.
+
+    :param budget: A :class:`RetryBudget` limiting retries across all
+        requests. Defaults to a new budget, pass False to disable it.
+
+    :param retry_non_idempotent: Retry failed POST requests like any other
+        request. By default they are only retried when they were throttled
+        (429), or when the connection to the API could not be established,
+        since otherwise the request may have been processed already.
+    """
+    DEFAULT_MAX_RETRIES = 4
+    IDEMPOTENT_METHODS = ('DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT')
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, deadline=None, budget=None, retry_non_idempotent=False):
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.budget = RetryBudget() if budget is None else budget
+        self.retry_non_idempotent = retry_non_idempotent
+        self.stats = RetryStats()
+
+    def get_deadline(self):
+        if self.deadline is None:
+            return None
+
+        return time.time() + self.deadline
+
+    def start(self):
+        """Record a new request."""
+        self.stats.incr('requests')
+        if self.budget:
+            self.budget.deposit()
+
+    def is_retryable(self, method, status):
+        """Whether a request which failed with the given status (or
+        exception) may be replayed safely."""
+        if self.retry_non_idempotent or method.upper() in self.IDEMPOTENT_METHODS:
+            return True
+
+        return status == 429 or isinstance(status, ConnectTimeout)
+
+    def allow_retry(self, method, status, delay, deadline):
+        """Check the idempotency rules, the deadline and the retry budget for
+        a retry of a request which has to wait ``delay`` milliseconds."""
+        if not self.is_retryable(method, status):
+            self.stats.incr('not_retryable')
+            return False
+
+        if deadline is not None and time.time() + delay / float(1000) >= deadline:
+            self.stats.incr('deadline_exceeded')
+            return False
+
+        if self.budget and not self.budget.withdraw():
+            self.stats.incr('budget_exceeded')
+            return False
+
+        self.stats.incr('retries')
+        return True
@@ -0,0 +1,10 @@
+"""Network-free transports for testing and benchmarking the SDK.
+
+:class:`RecordingAdapter` records real exchanges with the Stormpath API,
+:class:`ReplayAdapter` replays them, and :class:`FakeStormpathAPI` fakes the
+core of the API in process. They are all passed to the client as its
+``transport``.
+"""
+
+from .fake_api import FakeStormpathAPI
+from .transport import RecordingAdapter, ReplayAdapter
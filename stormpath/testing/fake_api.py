@@ -0,0 +1,566 @@
+"""An in-process fake of the Stormpath API."""
+
+import re
+import time
+
+from base64 import b64decode
+from collections import OrderedDict
+from datetime import datetime
+from fnmatch import fnmatch
+from itertools import count
+from json import dumps, loads
+from threading import Lock
+
+import jwt
+
+from requests.adapters import BaseAdapter
+from six import string_types
+from six.moves.urllib.parse import parse_qsl, urlsplit
+
+from .transport import build_response
+
+
+class FakeStormpathAPI(BaseAdapter):
+    """A transport adapter answering requests from an in-memory tenant, as
+    the Stormpath API would, without any network access.
+
+    It implements the core of the API: the current tenant, applications,
+    directories, account store mappings, accounts, groups, group
+    memberships, custom data, login attempts and the ``oauth/token``
+    password and refresh token grants. Collections support paging, ``q``
+    and attribute (with ``*`` wildcards) searches, and resources support
+    one level of ``expand``. Request signatures aren't checked.
+
+    :param latency: The time each response takes, in seconds. Either a
+        number or a callable taking the request and returning a number.
+
+    Example::
+
+        api = FakeStormpathAPI(latency=0.02)
+        client = api.client()
+        application = client.applications.create({'name': 'app'}, create_directory=True)
+        application.accounts.create({'email': 'john@example.com', 'password': 'Password1!', ...})
+        application.authenticate_account('john@example.com', 'Password1!')
+    """
+    DEFAULT_BASE_URL = 'https://api.stormpath.com/v1'
+    DEFAULT_LIMIT = 25
+    MAX_LIMIT = 100
+    TOKEN_TTL = 3600  # seconds
+
+    # The collections linked from every kind of resource.
+    LINKS = {
+        'tenants': ('accounts', 'applications', 'directories', 'groups'),
+        'applications': ('accounts', 'accountStoreMappings', 'groups', 'loginAttempts'),
+        'directories': ('accounts', 'groups'),
+        'accounts': ('groups', 'groupMemberships'),
+        'groups': ('accounts', 'accountMemberships'),
+        'accountStoreMappings': (),
+        'groupMemberships': (),
+        'accessTokens': (),
+        'refreshTokens': (),
+    }
+    CUSTOM_DATA = ('accounts', 'applications', 'directories', 'groups', 'tenants')
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, api_key_id='fake-id', api_key_secret='fake-secret', latency=0):
+        super(FakeStormpathAPI, self).__init__()
+        self.base_url = base_url
+        self.api_key_id = api_key_id
+        self.api_key_secret = api_key_secret
+        self.latency = latency
+
+        self._lock = Lock()
+        self._ids = count(1)
+        self.resources = OrderedDict()
+        self.custom_data = {}
+        self.passwords = {}
+        self.requests = 0
+
+        self.tenant = self._add('tenants', {'name': 'fake', 'key': 'fake'})
+
+    def client(self, **kwargs):
+        """A :class:`stormpath.client.Client` using this fake API (or the
+        given ``transport``, e.g. to record exchanges with it)."""
+        from ..client import Client
+
+        kwargs.setdefault('base_url', self.base_url)
+        kwargs.setdefault('transport', self)
+        return Client(id=self.api_key_id, secret=self.api_key_secret, **kwargs)
+
+    @staticmethod
+    def _now():
+        return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+    @staticmethod
+    def _kind(href):
+        return href.split('/')[-2]
+
+    def _href(self, path):
+        return self.base_url + path
+
+    def _add(self, kind, properties):
+        href = self._href('/%s/%022x' % (kind, next(self._ids)))
+        now = self._now()
+
+        data = dict(properties)
+        data.update({'createdAt': now, 'modifiedAt': now})
+        if kind != 'tenants':
+            data['tenant'] = {'href': self.tenant}
+
+        self.resources[href] = data
+        if kind in self.CUSTOM_DATA:
+            self.custom_data[href] = {'createdAt': now, 'modifiedAt': now}
+
+        return href
+
+    def _find(self, kind, **refs):
+        """Hrefs of the resources of a kind, referencing the given hrefs."""
+        prefix = self._href('/%s/' % kind)
+
+        return [href for href, data in self.resources.items() if href.startswith(prefix) and
+            all(data.get(name, {}).get('href') in (ref if isinstance(ref, list) else [ref]) for name, ref in refs.items())]
+
+    def _account_stores(self, application):
+        mappings = self._find('accountStoreMappings', application=application)
+        return [self.resources[m]['accountStore']['href'] for m in mappings]
+
+    def _default_store(self, application, flag):
+        mappings = self._find('accountStoreMappings', application=application)
+        for mapping in mappings:
+            if self.resources[mapping].get(flag):
+                return self.resources[mapping]['accountStore']['href']
+
+        return self.resources[mappings[0]]['accountStore']['href'] if mappings else None
+
+    def _members(self, group):
+        return [self.resources[m]['account']['href'] for m in self._find('groupMemberships', group=group)]
+
+    def _collection(self, href, name):
+        """Hrefs of the items of the ``name`` collection of a resource."""
+        kind = self._kind(href)
+
+        if kind == 'tenants':
+            return self._find(name)
+
+        if kind == 'applications':
+            if name == 'accountStoreMappings':
+                return self._find('accountStoreMappings', application=href)
+
+            stores = self._account_stores(href)
+            if name == 'groups':
+                return self._find('groups', directory=stores)
+
+            accounts = self._find('accounts', directory=stores)
+            for group in stores:
+                accounts.extend(a for a in self._members(group) if a not in accounts)
+
+            return accounts
+
+        if kind == 'directories':
+            return self._find(name, directory=href)
+
+        if kind == 'accounts':
+            memberships = self._find('groupMemberships', account=href)
+            if name == 'groupMemberships':
+                return memberships
+
+            return [self.resources[m]['group']['href'] for m in memberships]
+
+        if kind == 'groups':
+            if name == 'accountMemberships':
+                return self._find('groupMemberships', group=href)
+
+            return self._members(href)
+
+        return []
+
+    def _render_custom_data(self, href):
+        data = dict(self.custom_data[href])
+        data['href'] = href + '/customData'
+
+        return data
+
+    def _render(self, href, expand=None):
+        data = dict(self.resources[href])
+        data['href'] = href
+
+        kind = self._kind(href)
+        for name in self.LINKS[kind]:
+            data[name] = {'href': href + '/' + name}
+        if kind in self.CUSTOM_DATA:
+            data['customData'] = {'href': href + '/customData'}
+        if kind == 'applications':
+            mappings = self._find('accountStoreMappings', application=href)
+            default = [m for m in mappings if self.resources[m].get('isDefaultAccountStore')]
+            data['defaultAccountStoreMapping'] = {'href': default[0]} if default else None
+
+        for name, options in (expand or {}).items():
+            link = data.get(name)
+            if not isinstance(link, dict) or 'href' not in link:
+                continue
+
+            if name == 'customData':
+                data[name] = self._render_custom_data(href)
+            elif name in self.LINKS[kind]:
+                data[name] = self._page(href, name, options)
+            elif link['href'] in self.resources:
+                data[name] = self._render(link['href'])
+
+        return data
+
+    @staticmethod
+    def _parse_expand(expand):
+        """Parse ``groups(offset:0,limit:10),customData`` into a dict of
+        expanded names and their options."""
+        expanded = {}
+        for name, options in re.findall(r'(\w+)(?:\(([^)]*)\))?', expand or ''):
+            expanded[name] = dict(o.split(':', 1) for o in options.split(',') if ':' in o)
+
+        return expanded
+
+    def _matches(self, href, params):
+        data = self.resources[href]
+
+        for name, value in params.items():
+            if name == 'q':
+                if not any(value.lower() in v.lower() for v in data.values() if isinstance(v, string_types)):
+                    return False
+            elif not fnmatch(str(data.get(name, '')).lower(), value.lower()):
+                return False
+
+        return True
+
+    def _page(self, href, name, params):
+        params = dict(params)
+        offset = int(params.pop('offset', 0))
+        limit = min(int(params.pop('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        expand = self._parse_expand(params.pop('expand', None))
+        params.pop('orderBy', None)
+
+        items = [i for i in self._collection(href, name) if self._matches(i, params)]
+
+        return {
+            'href': href + '/' + name,
+            'offset': offset,
+            'limit': limit,
+            'size': len(items),
+            'items': [self._render(i, expand) for i in items[offset:offset + limit]],
+        }
+
+    @staticmethod
+    def _error(status, code, message):
+        return status, {
+            'status': status,
+            'code': code,
+            'message': message,
+            'developerMessage': message,
+            'moreInfo': 'https://docs.stormpath.com/rest/product-guide/latest/errors.html#error-%s' % code,
+        }
+
+    def _not_found(self):
+        return self._error(404, 404, 'The requested resource does not exist.')
+
+    def _update(self, href, properties):
+        data = self.resources[href]
+
+        for name, value in properties.items():
+            if name == 'customData' and isinstance(value, dict):
+                self._update_custom_data(href, value)
+            elif name == 'password':
+                self.passwords[href] = value
+            elif name not in ('href', 'createdAt', 'modifiedAt'):
+                data[name] = value
+
+        if self._kind(href) == 'accounts':
+            data['fullName'] = ' '.join(n for n in (data.get('givenName'), data.get('surname')) if n)
+
+        data['modifiedAt'] = self._now()
+
+    def _update_custom_data(self, href, properties):
+        data = self.custom_data[href]
+        for name, value in properties.items():
+            if name not in ('href', 'createdAt', 'modifiedAt'):
+                data[name] = value
+
+        data['modifiedAt'] = self._now()
+
+    def _create_account(self, directory, properties):
+        if directory is None:
+            return self._error(400, 5102, 'The application has no default account store.')
+
+        email = properties.get('email')
+        if not email or not properties.get('password'):
+            return self._error(400, 2000, 'Account email and password are required.')
+
+        if any(self.resources[a].get('email', '').lower() == email.lower() for a in self._find('accounts', directory=directory)):
+            return self._error(409, 2001, 'Account with that email already exists.')
+
+        href = self._add('accounts', {
+            'directory': {'href': directory},
+            'email': email,
+            'username': properties.get('username') or email,
+            'status': 'ENABLED',
+        })
+        self._update(href, properties)
+
+        return 201, self._render(href)
+
+    def _create(self, kind, properties, params):
+        if kind == 'applications':
+            href = self._add('applications', {'status': 'ENABLED'})
+            self._update(href, properties)
+
+            if params.get('createDirectory') in ('true', 'True'):
+                directory = self._add('directories', {'name': properties.get('name', '') + ' Directory', 'status': 'ENABLED'})
+                self._add('accountStoreMappings', {
+                    'application': {'href': href},
+                    'accountStore': {'href': directory},
+                    'listIndex': 0,
+                    'isDefaultAccountStore': True,
+                    'isDefaultGroupStore': True,
+                })
+        elif kind == 'directories':
+            href = self._add('directories', {'status': 'ENABLED'})
+            self._update(href, properties)
+        elif kind == 'accountStoreMappings':
+            href = self._add('accountStoreMappings', {'listIndex': 0, 'isDefaultAccountStore': False, 'isDefaultGroupStore': False})
+            self._update(href, properties)
+        elif kind == 'groupMemberships':
+            href = self._add('groupMemberships', {})
+            self._update(href, properties)
+        else:
+            return self._not_found()
+
+        return 201, self._render(href)
+
+    def _create_group(self, directory, properties):
+        if directory is None:
+            return self._error(400, 5103, 'The application has no default group store.')
+
+        href = self._add('groups', {'directory': {'href': directory}, 'status': 'ENABLED'})
+        self._update(href, properties)
+
+        return 201, self._render(href)
+
+    def _authenticate(self, application, login, password):
+        for href in self._collection(application, 'accounts'):
+            account = self.resources[href]
+            if login.lower() in (account.get('username', '').lower(), account.get('email', '').lower()):
+                if self.passwords.get(href) != password:
+                    break
+                if account.get('status') != 'ENABLED':
+                    return None, self._error(400, 7101, 'Login attempt failed because the Account is not enabled.')
+
+                return href, None
+
+        return None, self._error(400, 7100, 'Login attempt failed because the specified password is incorrect.')
+
+    def _login_attempt(self, application, properties, expand):
+        try:
+            login, password = b64decode(properties.get('value', '')).decode('utf-8').split(':', 1)
+        except (TypeError, ValueError):
+            return self._error(400, 2000, 'Invalid login attempt value.')
+
+        account, error = self._authenticate(application, login, password)
+        if error:
+            return error
+
+        account = self._render(account) if 'account' in expand else {'href': account}
+        return 200, {'account': account}
+
+    def _issue_tokens(self, application, account, refresh_token=None):
+        now = int(time.time())
+
+        if refresh_token is None:
+            refresh = self._add('refreshTokens', {'account': {'href': account}, 'application': {'href': application}})
+            refresh_token = self._encode(refresh, application, account, now, 2 * self.TOKEN_TTL)
+            self.resources[refresh]['jwt'] = refresh_token
+
+        access = self._add('accessTokens', {'account': {'href': account}, 'application': {'href': application}})
+        access_token = self._encode(access, application, account, now, self.TOKEN_TTL)
+        self.resources[access]['jwt'] = access_token
+
+        return 200, {
+            'access_token': access_token,
+            'refresh_token': refresh_token,
+            'token_type': 'Bearer',
+            'expires_in': self.TOKEN_TTL,
+            'stormpath_access_token_href': access,
+        }
+
+    def _encode(self, href, application, account, now, ttl):
+        token = jwt.encode({
+            'jti': href.split('/')[-1],
+            'iat': now,
+            'iss': application,
+            'sub': account,
+            'exp': now + ttl,
+        }, self.api_key_secret, algorithm='HS256')
+
+        return token.decode('utf-8') if isinstance(token, bytes) else token
+
+    def _oauth_token(self, application, form):
+        grant_type = form.get('grant_type')
+
+        if grant_type == 'password':
+            account, error = self._authenticate(application, form.get('username', ''), form.get('password', ''))
+            if error:
+                return 400, {'error': 'invalid_grant', 'message': 'Invalid username or password.'}
+
+            return self._issue_tokens(application, account)
+
+        if grant_type == 'refresh_token':
+            for href in self._find('refreshTokens', application=application):
+                if self.resources[href].get('jwt') == form.get('refresh_token'):
+                    return self._issue_tokens(application, self.resources[href]['account']['href'], form['refresh_token'])
+
+            return 400, {'error': 'invalid_grant', 'message': 'Token is invalid.'}
+
+        return 400, {'error': 'unsupported_grant_type', 'message': 'Unsupported grant type.'}
+
+    def _post(self, path, body, params, form):
+        parts = path.strip('/').split('/')
+        properties = body if isinstance(body, dict) else {}
+
+        if len(parts) == 1:
+            return self._create(parts[0], properties, params)
+
+        resource = self._href('/' + '/'.join(parts[:2]))
+        if resource not in self.resources:
+            return self._not_found()
+
+        if len(parts) == 2:
+            self._update(resource, properties)
+            return 200, self._render(resource)
+
+        name = parts[2]
+        kind = parts[0]
+
+        if name == 'customData' and kind in self.CUSTOM_DATA:
+            self._update_custom_data(resource, properties)
+            return 200, self._render_custom_data(resource)
+
+        if kind == 'applications' and name == 'loginAttempts':
+            return self._login_attempt(resource, properties, self._parse_expand(params.get('expand')))
+
+        if kind == 'applications' and name == 'oauth' and parts[3:] == ['token']:
+            # The refresh grant is sent as query params, not as a form.
+            grant = dict(params)
+            grant.update(form)
+            return self._oauth_token(resource, grant)
+
+        if name == 'accounts' and kind in ('applications', 'directories'):
+            store = resource if kind == 'directories' else self._default_store(resource, 'isDefaultAccountStore')
+            return self._create_account(store, properties)
+
+        if name == 'groups' and kind in ('applications', 'directories'):
+            store = resource if kind == 'directories' else self._default_store(resource, 'isDefaultGroupStore')
+            return self._create_group(store, properties)
+
+        return self._not_found()
+
+    def _get(self, path, params):
+        parts = path.strip('/').split('/')
+
+        if parts == ['tenants', 'current']:
+            return 302, {'location': self.tenant}
+
+        resource = self._href('/' + '/'.join(parts[:2]))
+        if len(parts) < 2 or resource not in self.resources:
+            return self._not_found()
+
+        if len(parts) == 2:
+            return 200, self._render(resource, self._parse_expand(params.get('expand')))
+
+        name = parts[2]
+        if name == 'customData' and len(parts) == 3 and resource in self.custom_data:
+            return 200, self._render_custom_data(resource)
+
+        if len(parts) == 3 and name in self.LINKS[parts[0]] and name != 'loginAttempts':
+            return 200, self._page(resource, name, params)
+
+        return self._not_found()
+
+    def _delete(self, path):
+        parts = path.strip('/').split('/')
+        resource = self._href('/' + '/'.join(parts[:2]))
+        if len(parts) < 2 or resource not in self.resources:
+            return self._not_found()
+
+        if len(parts) == 2:
+            deleted = [resource]
+            if parts[0] == 'directories':
+                deleted += self._find('accounts', directory=resource) + self._find('groups', directory=resource)
+
+            for href in deleted:
+                del self.resources[href]
+                self.custom_data.pop(href, None)
+                self.passwords.pop(href, None)
+
+            # Drop the mappings and memberships of the deleted resources.
+            for href, data in list(self.resources.items()):
+                if any(isinstance(v, dict) and v.get('href') in deleted for v in data.values()):
+                    del self.resources[href]
+
+            return 204, None
+
+        if parts[2] == 'customData' and resource in self.custom_data:
+            data = self.custom_data[resource]
+            if len(parts) == 3:
+                self.custom_data[resource] = {'createdAt': data['createdAt'], 'modifiedAt': self._now()}
+            else:
+                data.pop(parts[3], None)
+
+            return 204, None
+
+        return self._not_found()
+
+    def handle(self, method, url, body=None, content_type=None):
+        """Handle a request, returns the response status and JSON data."""
+        if not url.startswith(self.base_url):
+            return self._not_found()
+
+        parts = urlsplit(url[len(self.base_url):])
+        params = dict(parse_qsl(parts.query))
+
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+
+        form = {}
+        data = None
+        if body and content_type and content_type.startswith('application/x-www-form-urlencoded'):
+            form = dict(parse_qsl(body))
+        elif body:
+            try:
+                data = loads(body)
+            except ValueError:
+                return self._error(400, 400, 'The request body is not valid JSON.')
+
+        with self._lock:
+            self.requests += 1
+
+            if method == 'GET':
+                return self._get(parts.path, params)
+            elif method == 'POST':
+                return self._post(parts.path, data, params, form)
+            elif method == 'DELETE':
+                return self._delete(parts.path)
+
+            return self._error(405, 405, 'Method not allowed.')
+
+    def send(self, request, **kwargs):
+        latency = self.latency(request) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+
+        status, data = self.handle(request.method, request.url, request.body, request.headers.get('Content-Type'))
+
+        headers = {'Content-Type': 'application/json;charset=UTF-8'}
+        if status == 302:
+            headers['Location'] = data['location']
+            data = None
+
+        body = dumps(data).encode('utf-8') if data is not None else b''
+        return build_response(request, status, headers, body, elapsed=latency)
+
+    def close(self):
+        pass
@@ -0,0 +1,201 @@
+"""Transport adapters recording and replaying Stormpath API exchanges."""
+
+import time
+
+from base64 import b64decode, b64encode
+from collections import deque
+from datetime import timedelta
+from io import BytesIO
+from json import dumps, loads
+from threading import Lock
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from six.moves.urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    from urllib3 import HTTPResponse
+except ImportError:
+    from requests.packages.urllib3 import HTTPResponse
+
+from ..http import PoolingHTTPAdapter
+
+
+# Headers which don't apply to the decoded body we record.
+TRANSPORT_HEADERS = ('Connection', 'Content-Encoding', 'Content-Length', 'Keep-Alive', 'Transfer-Encoding')
+
+
+def normalize_url(url):
+    """Sort the query string of an url, so that equivalent requests match."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+def build_response(request, status, headers=None, body=b'', reason=None, elapsed=0.0):
+    """Build a :class:`requests.Response` to ``request`` without a
+    connection, the body is served from memory (and can be streamed)."""
+    headers = CaseInsensitiveDict(headers or {})
+
+    r = Response()
+    r.status_code = status
+    r.reason = reason
+    r.headers = headers
+    r.encoding = get_encoding_from_headers(headers)
+    r.raw = HTTPResponse(body=BytesIO(body), headers=dict(headers), status=status, reason=reason, preload_content=False)
+    r.url = request.url
+    r.request = request
+    r.elapsed = timedelta(seconds=elapsed)
+
+    return r
+
+
+class RecordingAdapter(BaseAdapter):
+    """Sends requests through another adapter, and records the exchanges in
+    a file which can be replayed with :class:`ReplayAdapter`.
+
+    Exchanges are appended to the file as JSON lines as they happen. Only
+    the method, url and body of requests are recorded, not their headers, so
+    credentials don't end up in recordings.
+
+    :param path: The file to record to.
+    :param adapter: The adapter actually sending the requests, defaults to a
+        :class:`stormpath.http.PoolingHTTPAdapter`.
+
+    Example::
+
+        client = Client(id='xxx', secret='xxx', transport=RecordingAdapter('login.jsonl'))
+    """
+
+    def __init__(self, path, adapter=None):
+        super(RecordingAdapter, self).__init__()
+        self.path = path
+        self.adapter = adapter or PoolingHTTPAdapter()
+        self._lock = Lock()
+        self.recorded = 0
+
+    @property
+    def stats(self):
+        return getattr(self.adapter, 'stats', None)
+
+    @staticmethod
+    def _encode_body(exchange, key, body):
+        if body is None:
+            return
+
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        try:
+            exchange[key] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            exchange[key + '_base64'] = b64encode(body).decode('ascii')
+
+    def send(self, request, **kwargs):
+        r = self.adapter.send(request, **kwargs)
+        content = r.content
+        headers = dict((k, v) for k, v in r.headers.items() if k not in TRANSPORT_HEADERS)
+
+        exchange = {
+            'method': request.method,
+            'url': normalize_url(request.url),
+            'status': r.status_code,
+            'reason': r.reason,
+            'headers': headers,
+            'elapsed': r.elapsed.total_seconds(),
+        }
+        self._encode_body(exchange, 'request_body', request.body)
+        self._encode_body(exchange, 'body', content)
+
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(dumps(exchange, sort_keys=True) + '\n')
+
+            self.recorded += 1
+
+        # The body was read for the recording, hand out a fresh response so
+        # that it can still be streamed.
+        return build_response(request, r.status_code, headers, content, reason=r.reason, elapsed=exchange['elapsed'])
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests with the exchanges recorded by a
+    :class:`RecordingAdapter`, without any network access.
+
+    Requests are matched on their method and url (with a normalized query
+    string). Requests to the same url get the recorded responses in order,
+    and the last one over and over once they run out, so recordings can be
+    replayed in a loop for benchmarks.
+
+    :param path: The recording to replay.
+
+    :param latency: The time each response takes, in seconds. Either a
+        number, a callable taking the recorded exchange and returning a
+        number, or :attr:`RECORDED` to reproduce the recorded latency.
+
+    A :exc:`LookupError` is raised for requests which weren't recorded.
+
+    Example::
+
+        api = ReplayAdapter('login.jsonl', latency=0.05)
+        client = Client(id='xxx', secret='xxx', transport=api)
+    """
+    RECORDED = 'recorded'
+
+    def __init__(self, path, latency=0):
+        super(ReplayAdapter, self).__init__()
+        self.path = path
+        self.latency = latency
+        self._lock = Lock()
+        self._exchanges = {}
+        self.replayed = 0
+
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    self.add(loads(line))
+
+    def add(self, exchange):
+        """Add a recorded exchange to replay."""
+        key = (exchange['method'], normalize_url(exchange['url']))
+        self._exchanges.setdefault(key, deque()).append(exchange)
+
+    def _get_latency(self, exchange):
+        if self.latency == self.RECORDED:
+            return exchange.get('elapsed', 0)
+        elif callable(self.latency):
+            return self.latency(exchange)
+
+        return self.latency
+
+    def send(self, request, **kwargs):
+        key = (request.method, normalize_url(request.url))
+
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                raise LookupError('No recorded response for %s %s.' % key)
+
+            exchange = exchanges.popleft() if len(exchanges) > 1 else exchanges[0]
+            self.replayed += 1
+
+        latency = self._get_latency(exchange)
+        if latency:
+            time.sleep(latency)
+
+        if 'body_base64' in exchange:
+            body = b64decode(exchange['body_base64'])
+        else:
+            body = exchange.get('body', '').encode('utf-8')
+
+        return build_response(request, exchange['status'], exchange.get('headers'), body,
+            reason=exchange.get('reason'), elapsed=latency or 0)
+
+    def close(self):
+        pass
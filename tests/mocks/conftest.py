@@ -0,0 +1,8 @@
+from sys import version_info
+
+
+collect_ignore = []
+
+# The asyncio client relies on async/await syntax and on contextvars.
+if version_info < (3, 7):
+    collect_ignore.append('test_aio.py')
@@ -0,0 +1,294 @@
+import asyncio
+from unittest import TestCase, main
+
+try:
+    from mock import patch, MagicMock
+except ImportError:
+    from unittest.mock import patch, MagicMock
+
+from stormpath.aio.client import AsyncClient
+from stormpath.aio.data_store import AsyncDataStore
+from stormpath.aio.http import AsyncHttpExecutor, AsyncResponse
+from stormpath.error import Error
+from stormpath.resources.account import Account, AccountList
+from stormpath.resources.base import NotLoadedError
+
+
+class ClientError(Exception):
+    pass
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def done(value):
+    f = asyncio.Future()
+    f.set_result(value)
+    return f
+
+
+def response(status, body=b'', headers=None):
+    return AsyncResponse(status, headers or {}, body)
+
+
+def aiohttp_mock():
+    return patch.dict('sys.modules', {'aiohttp': MagicMock(ClientError=ClientError)})
+
+
+class TestAsyncHttpExecutor(TestCase):
+
+    def executor(self, responses):
+        with aiohttp_mock():
+            ex = AsyncHttpExecutor('https://api.stormpath.com/v1', None, get_delay=lambda retries: 0)
+
+        calls = []
+
+        def send(method, url, data=None, params=None, headers=None, timeout=None):
+            calls.append((method, url, params))
+            r = responses.pop(0)
+            if isinstance(r, Exception):
+                raise r
+
+            return done(r)
+
+        ex._send = send
+        return ex, calls
+
+    def test_aiohttp_not_available(self):
+        with patch.dict('sys.modules', {'aiohttp': None}):
+            with self.assertRaises(RuntimeError):
+                AsyncHttpExecutor('https://api.stormpath.com/v1', None)
+
+    def test_get_request(self):
+        ex, calls = self.executor([response(200, b'{"name": "foo"}')])
+
+        data = run(ex.get('/test', {'q': 'foo'}))
+
+        self.assertEqual(data, {'name': 'foo', 'sp_http_status': 200})
+        self.assertEqual(calls, [('GET', 'https://api.stormpath.com/v1/test', {'q': 'foo'})])
+
+    def test_get_request_error(self):
+        ex, _ = self.executor([response(400, b'{"developerMessage": "bad"}')])
+
+        with self.assertRaises(Error) as ctx:
+            run(ex.get('/test'))
+
+        self.assertEqual(ctx.exception.developer_message, 'bad')
+        self.assertEqual(ctx.exception.status, 400)
+
+    def test_retries_on_errors_and_server_failures(self):
+        ex, calls = self.executor([
+            ClientError('connection reset'),
+            response(503),
+            response(200, b'{"name": "foo"}'),
+        ])
+
+        data = run(ex.get('/test'))
+
+        self.assertEqual(data['name'], 'foo')
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_after_max_retries(self):
+        max_retries = AsyncHttpExecutor.DEFAULT_MAX_RETRIES
+        ex, calls = self.executor([response(500)] * (max_retries + 1))
+
+        with self.assertRaises(Error):
+            run(ex.get('/test'))
+
+        self.assertEqual(len(calls), max_retries + 1)
+
+    def test_requests_are_sent_through_aiohttp(self):
+        class Response(object):
+            status = 200
+            headers = {'Content-Type': 'application/json'}
+            charset = 'utf-8'
+
+            async def read(self):
+                return b'{"name": "foo"}'
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                pass
+
+        with aiohttp_mock():
+            ex = AsyncHttpExecutor('https://api.stormpath.com/v1', None)
+
+        session = ex._aiohttp.ClientSession.return_value
+        session.closed = False
+        session.request.return_value = Response()
+
+        data = run(ex.get('/test', {'q': 'foo'}))
+
+        self.assertEqual(data, {'name': 'foo', 'sp_http_status': 200})
+        args, kwargs = session.request.call_args
+        self.assertEqual(args, ('GET', 'https://api.stormpath.com/v1/test?q=foo'))
+        self.assertEqual(kwargs['headers']['User-Agent'], ex.USER_AGENT)
+        self.assertIsNone(kwargs['proxy'])
+        self.assertFalse(kwargs['allow_redirects'])
+
+        self.assertIs(ex._get_session(), session)
+        self.assertEqual(ex._aiohttp.ClientSession.call_count, 1)
+
+    def test_signs_requests_with_auth_handler(self):
+        auth = MagicMock(side_effect=lambda r: r)
+        with aiohttp_mock():
+            ex = AsyncHttpExecutor('https://api.stormpath.com/v1', auth)
+
+        prepared = ex._sign('GET', 'https://api.stormpath.com/v1/test', None, {'q': 'foo'}, None)
+
+        auth.assert_called_once_with(prepared)
+        self.assertEqual(prepared.url, 'https://api.stormpath.com/v1/test?q=foo')
+        self.assertEqual(prepared.headers['User-Agent'], ex.USER_AGENT)
+
+
+class TestAsyncDataStore(TestCase):
+
+    def setUp(self):
+        self.executor = MagicMock()
+        self.ds = AsyncDataStore(self.executor)
+        self.client = MagicMock(BASE_URL='https://api.stormpath.com/v1', data_store=self.ds)
+
+    def test_get_resource_is_cached(self):
+        href = 'https://api.stormpath.com/v1/accounts/FOO'
+        self.executor.get.side_effect = lambda href, params=None: done({'href': href, 'email': 'foo@example.com'})
+
+        self.assertEqual(run(self.ds.get_resource(href))['email'], 'foo@example.com')
+        self.assertEqual(run(self.ds.get_resource(href))['email'], 'foo@example.com')
+        self.assertEqual(self.executor.get.call_count, 1)
+
+    def test_concurrent_gets_are_collapsed(self):
+        href = 'https://api.stormpath.com/v1/accounts/FOO'
+
+        async def get(href, params=None):
+            await asyncio.sleep(0)
+            return {'href': href, 'email': 'foo@example.com'}
+
+        self.executor.get.side_effect = get
+
+        async def gather():
+            return await asyncio.gather(*[self.ds.get_resource(href) for _ in range(5)])
+
+        self.assertEqual(len(run(gather())), 5)
+        self.assertEqual(self.executor.get.call_count, 1)
+        self.assertEqual(self.ds.single_flight.summary, (5, 1, 4))
+
+    def test_stale_entries_are_refreshed_in_background(self):
+        href = 'https://api.stormpath.com/v1/accounts/FOO'
+        self.executor.get.side_effect = lambda href, params=None: done({'href': href, 'email': 'bar@example.com'})
+        ds = AsyncDataStore(self.executor, {'regions': {'accounts': {'ttl': 0, 'stale_while_revalidate': 300}}})
+        ds._cache_put(href, {'href': href, 'email': 'foo@example.com'})
+
+        async def get_twice():
+            first = await ds.get_resource(href)
+            await ds.get_resource(href)
+            await asyncio.sleep(0)
+            return first
+
+        self.assertEqual(run(get_twice())['email'], 'foo@example.com')
+        self.assertEqual(self.executor.get.call_count, 1)
+        self.assertEqual(ds.refresher.deduplicated, 1)
+        self.assertEqual(ds.refresher.refreshed, 1)
+
+    def test_await_resource(self):
+        href = 'https://api.stormpath.com/v1/accounts/FOO'
+        self.executor.get.side_effect = lambda href, params=None: done({'href': href, 'email': 'foo@example.com'})
+
+        account = Account(self.client, href=href)
+
+        # lazy loading is not possible without awaiting the resource
+        with self.assertRaises(NotLoadedError):
+            account.email
+        self.assertFalse(hasattr(account, 'email'))
+        self.assertIsNone(getattr(account, 'email', None))
+
+        async def load():
+            return await account
+
+        self.assertIs(run(load()), account)
+        self.assertEqual(account.email, 'foo@example.com')
+
+    def test_async_iteration_over_collection(self):
+        href = 'https://api.stormpath.com/v1/directories/DIR/accounts'
+
+        def get(href, params=None):
+            offset = (params or {}).get('offset', 0)
+            items = [{'href': 'https://api.stormpath.com/v1/accounts/%d' % i} for i in range(offset, min(offset + 2, 3))]
+
+            return done({'href': href, 'offset': offset, 'limit': 2, 'size': 3, 'items': items})
+
+        self.executor.get.side_effect = get
+        accounts = AccountList(self.client, href=href)
+
+        async def collect():
+            return [account.href async for account in accounts]
+
+        self.assertEqual(run(collect()), ['https://api.stormpath.com/v1/accounts/%d' % i for i in range(3)])
+        self.assertEqual(self.executor.get.call_count, 2)
+
+
+class TestAsyncClient(TestCase):
+
+    def setUp(self):
+        with aiohttp_mock():
+            self.client = AsyncClient(api_key={'id': 'MyId', 'secret': 'Shush!'})
+
+        self.executor = MagicMock()
+        self.client.data_store.executor = self.executor
+
+    @patch('stormpath.aio.client.dispatcher')
+    def test_create_save_delete(self, dispatcher):
+        href = 'https://api.stormpath.com/v1/accounts/FOO'
+        self.executor.post.side_effect = lambda url, data, params=None: done(dict(data, href=href))
+        self.executor.delete.side_effect = lambda url: done(None)
+
+        accounts = AccountList(self.client, href='https://api.stormpath.com/v1/directories/DIR/accounts')
+        account = run(self.client.create(accounts, {'email': 'foo@example.com'}))
+
+        self.assertIsInstance(account, Account)
+        self.assertEqual(account.href, href)
+        self.assertEqual(account.email, 'foo@example.com')
+
+        account.email = 'bar@example.com'
+        run(self.client.save(account))
+        self.assertEqual(self.executor.post.call_args[0][1]['email'], 'bar@example.com')
+
+        run(self.client.delete(account))
+        self.executor.delete.assert_called_once_with(href)
+        self.assertEqual(dispatcher.send.call_count, 3)
+
+    def test_blocking_options_are_rejected(self):
+        with aiohttp_mock():
+            with self.assertRaises(ValueError):
+                AsyncClient(api_key={'id': 'MyId', 'secret': 'Shush!'}, stream_collections=True)
+            with self.assertRaises(ValueError):
+                AsyncClient(api_key={'id': 'MyId', 'secret': 'Shush!'}, transport=MagicMock())
+
+    def test_concurrent_sessions_are_isolated(self):
+        async def request(started):
+            with self.client.session() as identity_map:
+                started.append(identity_map)
+                await asyncio.sleep(0)
+                self.assertIs(self.client.identity_map, identity_map)
+
+                return identity_map
+
+        async def requests():
+            started = []
+            maps = await asyncio.gather(request(started), request(started))
+            self.assertIsNone(self.client.identity_map)
+
+            return maps
+
+        first, second = run(requests())
+        self.assertIsNot(first, second)
+
+
+if __name__ == '__main__':
+    main()
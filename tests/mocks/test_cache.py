@@ -1,4 +1,14 @@
+import os
+import time
+
+from collections import defaultdict
+from datetime import datetime
+from json import dumps, loads
+from shutil import rmtree
+from tempfile import mkdtemp
 from unittest import TestCase, main
+from threading import Thread
+from six.moves.queue import Queue
 try:
     from mock import patch, MagicMock
 except ImportError:
@@ -8,37 +18,50 @@ from stormpath.cache.entry import CacheEntry
 from stormpath.cache.stats import CacheStats
 from stormpath.cache.cache import Cache
 from stormpath.cache.manager import CacheManager
-from stormpath.cache.memory_store import MemoryStore
+from stormpath.cache.memory_store import MemoryStore, ShardedMemoryStore, \
+    approximate_entry_size, approximate_size
 from stormpath.cache.redis_store import RedisStore
-from stormpath.cache.memcached_store import MemcachedStore, \
-    json_deserializer, json_serializer
+from stormpath.cache.tiered_store import TieredStore
+from stormpath.cache.sqlite_store import SQLiteStore
+from stormpath.cache.invalidation import LocalInvalidationBus, \
+    RedisInvalidationBus
+from stormpath.cache.memcached_store import MemcachedStore, CODEC_VALUE, \
+    json_serializer
+from stormpath.cache.codecs import EntryCodec, JSONCodec
 
 
 class TestCacheEntry(TestCase):
 
     def setUp(self):
-        from datetime import datetime as real_datetime
-        self.hour_before = real_datetime(2013, 1, 1, 9, 30, 0, 0)
-        self.minute_before = real_datetime(2013, 1, 1, 10, 29, 0, 0)
-        self.now = real_datetime(2013, 1, 1, 10, 30, 0, 0)
+        # 2013-01-01 09:30, 10:29 and 10:30
+        self.hour_before = 1357032600.0
+        self.minute_before = 1357036140.0
+        self.now = 1357036200.0
 
-    @patch('stormpath.cache.entry.datetime')
-    def test_entry_init_with_default_values(self, datetime):
+    @patch('stormpath.cache.entry.time')
+    def test_entry_init_with_default_values(self, time):
         e = CacheEntry('foo')
 
-        self.assertEqual(e.created_at, datetime.utcnow.return_value)
-        self.assertEqual(e.last_accessed_at, datetime.utcnow.return_value)
+        self.assertEqual(e.created_at, time.return_value)
+        self.assertEqual(e.last_accessed_at, time.return_value)
 
-    @patch('stormpath.cache.entry.datetime')
-    def test_entry_init_with_custom_values(self, datetime):
+    def test_entry_init_with_custom_values(self):
         e = CacheEntry('foo', created_at=self.hour_before,
             last_accessed_at=self.minute_before)
         self.assertEqual(e.created_at, self.hour_before)
         self.assertEqual(e.last_accessed_at, self.minute_before)
 
-    @patch('stormpath.cache.entry.datetime')
-    def test_touch_updates_last_accessed(self, datetime):
-        datetime.utcnow.return_value = self.now
+        e = CacheEntry('foo', created_at=datetime(2013, 1, 1, 9, 30))
+        self.assertEqual(e.created_at, self.hour_before)
+        self.assertEqual(e.last_accessed_at, self.hour_before)
+
+    def test_entry_is_slotted(self):
+        with self.assertRaises(AttributeError):
+            CacheEntry('foo').foo = 'bar'
+
+    @patch('stormpath.cache.entry.time')
+    def test_touch_updates_last_accessed(self, time):
+        time.return_value = self.now
 
         e = CacheEntry('foo', created_at=self.minute_before,
             last_accessed_at=self.minute_before)
@@ -46,9 +69,9 @@ class TestCacheEntry(TestCase):
         e.touch()
         self.assertEqual(e.last_accessed_at, self.now)
 
-    @patch('stormpath.cache.entry.datetime')
-    def test_is_expired_checks_ttl_tti(self, datetime):
-        datetime.utcnow.return_value = self.now
+    @patch('stormpath.cache.entry.time')
+    def test_is_expired_checks_ttl_tti(self, time):
+        time.return_value = self.now
 
         e = CacheEntry('foo', created_at=self.hour_before,
             last_accessed_at=self.minute_before)
@@ -60,6 +83,22 @@ class TestCacheEntry(TestCase):
         self.assertTrue(e.is_expired(24 * 3600, 60))
         self.assertFalse(e.is_expired(24 * 3600, 61))
 
+    @patch('stormpath.cache.entry.time')
+    def test_is_expired_follows_touch_and_refresh(self, time):
+        time.return_value = self.now
+
+        e = CacheEntry('foo', created_at=self.hour_before,
+            last_accessed_at=self.hour_before)
+        self.assertTrue(e.is_expired(24 * 3600, 60))
+
+        e.touch()
+        self.assertFalse(e.is_expired(24 * 3600, 60))
+        time.return_value = self.now + 60
+        self.assertTrue(e.is_expired(24 * 3600, 60))
+
+        e.refresh()
+        self.assertFalse(e.is_expired(3600, 60))
+
     def test_parse(self):
         e = CacheEntry.parse({
             'value': 'foo',
@@ -71,31 +110,50 @@ class TestCacheEntry(TestCase):
         self.assertEqual(e.created_at, self.hour_before)
         self.assertEqual(e.last_accessed_at, self.minute_before)
 
-    @patch('stormpath.cache.entry.datetime')
-    def test_parse_invalid_dates(self, datetime):
-        datetime.strptime.side_effect = ValueError
-
-        e = CacheEntry.parse({'value': 'foo'})
+    @patch('stormpath.cache.entry.time')
+    def test_parse_invalid_dates(self, time):
+        e = CacheEntry.parse({'value': 'foo', 'created_at': 'yesterday'})
 
         self.assertEqual(e.value, 'foo')
-        self.assertEqual(e.created_at, datetime.utcnow.return_value)
-        self.assertEqual(e.last_accessed_at, datetime.utcnow.return_value)
+        self.assertEqual(e.created_at, time.return_value)
+        self.assertEqual(e.last_accessed_at, time.return_value)
 
     def test_to_dict(self):
-        e = CacheEntry('foo', created_at=self.hour_before,
+        e = CacheEntry('foo', created_at=self.hour_before + 0.25,
             last_accessed_at=self.minute_before)
 
         data = e.to_dict()
 
         self.assertEqual(data['value'], 'foo')
         self.assertEqual(data['created_at'],
-            '2013-01-01 09:30:00.000000')
+            '2013-01-01 09:30:00.250000')
         self.assertEqual(data['last_accessed_at'],
             '2013-01-01 10:29:00.000000')
+        self.assertEqual(CacheEntry.parse(data).created_at, self.hour_before + 0.25)
+
+    def test_validators_round_trip(self):
+        e = CacheEntry('foo', etag='"v1"')
+        self.assertTrue(e.has_validators)
+        self.assertNotIn('last_modified', e.to_dict())
+
+        e = CacheEntry.parse(e.to_dict())
+        self.assertEqual(e.etag, '"v1"')
+        self.assertIsNone(e.last_modified)
+        self.assertFalse(CacheEntry('foo').has_validators)
 
 
 class CacheStatsTest(TestCase):
 
+    def test_hit_ratio(self):
+        s = CacheStats()
+        self.assertEqual(s.hit_ratio, 0.0)
+
+        s.hit()
+        s.hit()
+        s.hit()
+        s.miss()
+        self.assertEqual(s.hit_ratio, 0.75)
+
     def test_everything(self):
         s = CacheStats()
 
@@ -124,8 +182,51 @@ class CacheStatsTest(TestCase):
         s.clear()
         self.assertEqual(s.size, 0)
 
-        # puts hits misses expirations size
-        self.assertEqual(s.summary, (3, 1, 2, 1, 0))
+        s.track_bytes(MagicMock(bytes=100, evicted_bytes=50))
+
+        # puts hits misses expirations size bytes evicted_bytes
+        self.assertEqual(s.summary, (3, 1, 2, 1, 0, 100, 50))
+
+    def test_counts_of_all_threads_are_summed(self):
+        s = CacheStats()
+
+        def worker():
+            for _ in range(1000):
+                s.put()
+                s.hit()
+
+        threads = [Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        s.miss()
+
+        self.assertEqual(s.puts, 4000)
+        self.assertEqual(s.size, 4000)
+        self.assertEqual(s.hits, 4000)
+        self.assertEqual(s.misses, 1)
+
+    def test_short_lived_threads_dont_add_counters(self):
+        s = CacheStats()
+
+        for _ in range(200):
+            t = Thread(target=s.hit)
+            t.start()
+            t.join()
+
+        self.assertEqual(s.hits, 200)
+        self.assertEqual(len(s._slots), CacheStats.SLOTS)
+
+    def test_bytes_are_read_from_the_tracked_store(self):
+        s = CacheStats()
+        store = MemoryStore(max_bytes=1000)
+        s.track_bytes(store)
+
+        store['foo'] = CacheEntry('bar')
+
+        self.assertEqual(s.bytes, store.bytes)
+        self.assertTrue(s.bytes > 0)
 
 
 @patch('stormpath.cache.cache.CacheStats')
@@ -165,6 +266,89 @@ class TestCache(TestCase):
         CacheStats.return_value.miss.assert_called_once_with(expired=True)
         self.assertIsNone(foo)
 
+    def test_cache_get_expired_key_with_stale_ttl(self, CacheStats):
+        store = MagicMock()
+        store.__getitem__.return_value.is_expired.side_effect = lambda ttl, tti: ttl < 400
+
+        c = Cache(store=MagicMock(return_value=store), ttl=300, tti=300, stale_ttl=200)
+
+        self.assertIsNone(c.get('foo'))
+        self.assertFalse(store.__delitem__.called)
+        self.assertEqual(c.get_stale('foo'), store.__getitem__.return_value.value)
+        CacheStats.return_value.stale_hit.assert_called_once_with()
+
+        c.stale_ttl = 50
+        self.assertIsNone(c.get_stale('foo'))
+        self.assertIsNone(c.get('foo'))
+        store.__delitem__.assert_called_once_with('foo')
+
+    def test_cache_get_expired_key_with_validators(self, CacheStats):
+        store = MagicMock()
+        entry = store.__getitem__.return_value
+        entry.is_expired.return_value = True
+        entry.has_validators = True
+
+        c = Cache(store=MagicMock(return_value=store))
+
+        self.assertIsNone(c.get('foo', revalidate=True))
+        self.assertFalse(store.__delitem__.called)
+        self.assertEqual(c.get_entry('foo'), entry)
+
+        c.revalidate('foo', entry)
+        entry.refresh.assert_called_once_with()
+        store.__setitem__.assert_called_once_with('foo', entry)
+        CacheStats.return_value.revalidation.assert_called_once_with()
+
+        self.assertIsNone(c.get('foo'))
+        store.__delitem__.assert_called_once_with('foo')
+
+    def test_cache_get_stale_while_revalidate(self, CacheStats):
+        store = MagicMock()
+        entry = store.__getitem__.return_value
+        entry.is_expired.side_effect = lambda ttl, tti: ttl < 330
+
+        c = Cache(store=MagicMock(return_value=store), ttl=300, tti=300, stale_while_revalidate=60)
+        refresh = MagicMock()
+
+        self.assertEqual(c.get('foo', refresh=refresh), entry.value)
+        refresh.assert_called_once_with()
+        CacheStats.return_value.stale_hit.assert_called_once_with()
+
+        self.assertIsNone(c.get('foo'))
+        self.assertFalse(store.__delitem__.called)
+
+        c.stale_while_revalidate = 20
+        self.assertIsNone(c.get('foo', refresh=refresh))
+        self.assertEqual(refresh.call_count, 1)
+        store.__delitem__.assert_called_once_with('foo')
+
+    def test_cache_get_refresh_ahead(self, CacheStats):
+        store = MagicMock()
+        entry = store.__getitem__.return_value
+        entry.is_expired.side_effect = lambda ttl, tti: ttl < 250
+
+        c = Cache(store=MagicMock(return_value=store), ttl=300, tti=300, refresh_ahead_ratio=0.8)
+        refresh = MagicMock()
+
+        self.assertEqual(c.get('foo', refresh=refresh), entry.value)
+        refresh.assert_called_once_with()
+
+        c.refresh_ahead_ratio = 0.9
+        self.assertEqual(c.get('foo', refresh=refresh), entry.value)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(CacheStats.return_value.hit.call_count, 2)
+
+    def test_cache_refresh_ahead_ratio_is_validated(self, CacheStats):
+        with self.assertRaises(ValueError):
+            Cache(refresh_ahead_ratio=1.5)
+
+    def test_cache_get_stale_is_disabled_by_default(self, CacheStats):
+        store = MagicMock()
+        c = Cache(store=MagicMock(return_value=store))
+
+        self.assertIsNone(c.get_stale('foo'))
+        self.assertFalse(store.__getitem__.called)
+
     def test_cache_get_missing_key(self, CacheStats):
         store = MagicMock()
         store.__getitem__.return_value = None
@@ -220,6 +404,37 @@ class TestCache(TestCase):
         self.assertEqual(2, len(cache.store))
         self.assertEqual(list(cache.store.store.keys()), [8,9])
 
+    def test_cache_max_bytes(self, CacheStats):
+        cache = Cache(store=MemoryStore, store_opts={'max_bytes': 4096})
+        for i in range(100):
+            cache.put(i, {'name': 'x' * 100})
+
+        self.assertTrue(0 < len(cache.store) < 100)
+        cache.stats.track_bytes.assert_called_once_with(cache.store)
+        self.assertTrue(cache.store.bytes <= 4096)
+
+    def test_cache_batches(self, CacheStats):
+        cache = Cache(store=ShardedMemoryStore, ttl=60)
+        cache.put_many([('foo', 'Foo'), ('bar', 'Bar')], validators={'foo': {'etag': '"v1"'}})
+
+        self.assertEqual(CacheStats.return_value.put.call_count, 2)
+        self.assertEqual(cache.get_entry('foo').etag, '"v1"')
+        self.assertEqual(cache.get_many(['foo', 'bar', 'baz']), {'foo': 'Foo', 'bar': 'Bar'})
+        self.assertEqual(CacheStats.return_value.hit.call_count, 2)
+        self.assertEqual(CacheStats.return_value.miss.call_count, 1)
+
+        cache.delete_many(['foo', 'bar'])
+        self.assertEqual(cache.size, 0)
+
+    def test_cache_batches_without_store_support(self, CacheStats):
+        store = defaultdict(lambda: None)
+        cache = Cache(store=lambda: store)
+        cache.put_many([('foo', 'Foo')])
+        self.assertEqual(cache.get_many(['foo', 'bar']), {'foo': 'Foo'})
+
+        cache.delete_many(['foo'])
+        self.assertNotIn('foo', store)
+
     def test_cache_does_not_allow_max_entries_to_fall_bellow_one(self, CacheStats):
         self.assertRaises(
                 ValueError,
@@ -235,7 +450,7 @@ class TestCacheManager(TestCase):
         m = CacheManager()
 
         m.create_cache('region', foo=1, bar=2, baz=3)
-        Cache.assert_called_once_with(foo=1, bar=2, baz=3)
+        Cache.assert_called_once_with(region='region', foo=1, bar=2, baz=3)
 
         c = m.get_cache('region')
         self.assertEqual(c, Cache.return_value)
@@ -271,6 +486,401 @@ class MemoryStoreTest(TestCase):
         s.clear()
         self.assertEqual(len(s), 0)
 
+    def fill(self, s, hot, cold):
+        for key in cold:
+            s[hot]
+            s[key] = key
+
+    def test_lru_policy_keeps_recently_used_entries(self):
+        s = MemoryStore(max_entries=3)
+        s['hot'] = 'hot'
+        self.fill(s, 'hot', range(10))
+
+        self.assertEqual(s['hot'], 'hot')
+        self.assertEqual(len(s), 3)
+        self.assertEqual(s.evictions, 8)
+
+    def test_fifo_policy_evicts_oldest_entries(self):
+        s = MemoryStore(max_entries=3, policy='fifo')
+        s['hot'] = 'hot'
+        self.fill(s, 'hot', range(10))
+
+        self.assertIsNone(s['hot'])
+
+    def scan(self, s):
+        for i in range(50):
+            s['hot%d' % i] = i
+        for _ in range(5):
+            for i in range(50):
+                s['hot%d' % i]
+
+        for i in range(1000):
+            s['scan%d' % i] = i
+
+        return len([i for i in range(50) if s['hot%d' % i] is not None])
+
+    def test_tinylfu_policy_resists_scans(self):
+        self.assertEqual(self.scan(MemoryStore(max_entries=100)), 0)
+
+        s = MemoryStore(max_entries=100, policy='tinylfu')
+        self.assertTrue(self.scan(s) >= 45)
+        self.assertEqual(len(s), 100)
+        self.assertTrue(s.store.rejections > 0)
+
+        del s['hot0']
+        self.assertIsNone(s['hot0'])
+        s.clear()
+        self.assertEqual(len(s), 0)
+
+    def test_max_bytes(self):
+        for policy in MemoryStore.POLICIES:
+            s = MemoryStore(max_bytes=10000, policy=policy)
+            size = approximate_entry_size('key000', {'name': 'x' * 100})
+            for i in range(100):
+                s['key%03d' % i] = {'name': 'x' * 100}
+
+            self.assertTrue(s.bytes <= 10000, policy)
+            self.assertEqual(s.bytes, len(s) * size, policy)
+            self.assertEqual(s.evicted_bytes, (100 - len(s)) * size, policy)
+
+            for i in range(100):
+                del s['key%03d' % i]
+            self.assertEqual(s.bytes, 0, policy)
+
+    def test_max_bytes_rejects_entries_larger_than_the_store(self):
+        for policy in MemoryStore.POLICIES:
+            s = MemoryStore(max_bytes=10000, policy=policy)
+            s['small'] = 'x'
+            s['large'] = 'x' * 20000
+
+            self.assertEqual(s['small'], 'x', policy)
+            self.assertIsNone(s['large'], policy)
+            self.assertTrue(s.evicted_bytes > 20000, policy)
+
+    def test_max_bytes_replacing_with_an_entry_larger_than_the_store(self):
+        for policy in MemoryStore.POLICIES:
+            s = MemoryStore(max_bytes=10000, policy=policy)
+            s['a'] = 'x' * 6000
+            s['a'] = 'x' * 20000
+            self.assertEqual(s.bytes, 0, policy)
+
+            s['b'] = 'x' * 5000
+            self.assertEqual(s['b'], 'x' * 5000, policy)
+            self.assertEqual(s.bytes, approximate_entry_size('b', s.store.get('b')), policy)
+
+    def test_tinylfu_rejects_popular_entries_larger_than_the_store(self):
+        s = MemoryStore(max_bytes=100000, policy='tinylfu')
+        for i in range(150):
+            s['key%03d' % i] = 'x' * 100
+        size = len(s)
+
+        for _ in range(10):
+            s['blob']
+        s['blob'] = 'x' * 200000
+
+        self.assertIsNone(s['blob'])
+        self.assertEqual(len(s), size)
+        self.assertTrue(s.evicted_bytes < 250000)
+
+    def test_approximate_size(self):
+        self.assertTrue(approximate_size({'items': ['x' * 1000]}) > 1000)
+        self.assertTrue(approximate_size({'a': 1, 'b': [1, 2]}) > approximate_size({'a': 1}))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            MemoryStore(policy='random')
+
+
+class ShardedMemoryStoreTest(TestCase):
+
+    def test_everything(self):
+        s = ShardedMemoryStore(shards=4, max_entries=8)
+        self.assertEqual(len(s.shards), 4)
+        self.assertIsNone(s['foo'])
+
+        for i in range(100):
+            s['key%d' % i] = i
+        self.assertTrue(len(s) <= 8)
+        self.assertEqual(s.evictions, 100 - len(s))
+        self.assertEqual(s['key99'], 99)
+
+        del s['key99']
+        self.assertIsNone(s['key99'])
+        del s['nonexistent']
+
+        s.clear()
+        self.assertEqual(len(s), 0)
+
+    def test_shards_split_the_limits(self):
+        s = ShardedMemoryStore(shards=4, max_entries=10, max_bytes=4000, policy='fifo')
+        self.assertEqual(s.shards[0].store.size_limit, 3)
+        self.assertEqual(s.shards[0].store.bytes_limit, 1000)
+        self.assertEqual(s.shards[0].policy, 'fifo')
+
+        with self.assertRaises(ValueError):
+            ShardedMemoryStore(shards=0)
+
+    def test_threads(self):
+        cache = Cache(store=ShardedMemoryStore, store_opts={'max_entries': 50})
+
+        def worker(n):
+            for i in range(2000):
+                key = (n * 7 + i) % 100
+                if cache.get(key) is None:
+                    cache.put(key, key)
+
+        threads = [Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(cache.stats.hits + cache.stats.misses, 8 * 2000)
+        self.assertEqual(cache.stats.misses, cache.stats.puts)
+        self.assertTrue(len(cache.store) <= 64)
+
+
+class TieredStoreTest(TestCase):
+
+    def setUp(self):
+        self.store = TieredStore(l2_store=MemoryStore, l1_opts={'max_entries': 10}, l1_ttl=5)
+        self.entry = CacheEntry({'name': 'foo'})
+
+    @patch('stormpath.cache.tiered_store.time')
+    def test_reads_are_served_from_l1(self, time):
+        time.time.return_value = 100
+        self.store['foo'] = self.entry
+        self.assertIs(self.store.l2['foo'], self.entry)
+
+        self.assertIs(self.store['foo'], self.entry)
+        self.assertEqual(self.store.l1_stats.hits, 1)
+        self.assertEqual(self.store.l2_stats.hits, 0)
+
+        # L1 entries expire after l1_ttl, then L2 hits are promoted again.
+        time.time.return_value = 106
+        self.assertIs(self.store['foo'], self.entry)
+        self.assertEqual(self.store.l1_stats.expirations, 1)
+        self.assertEqual(self.store.l2_stats.hits, 1)
+
+        self.assertIs(self.store['foo'], self.entry)
+        self.assertEqual(self.store.l1_stats.hits, 2)
+
+    def test_l2_hits_are_promoted(self):
+        self.store.l2['foo'] = self.entry
+
+        self.assertIs(self.store['foo'], self.entry)
+        self.assertIs(self.store.l1['foo'].entry, self.entry)
+        self.assertEqual(self.store.l1_stats.misses, 1)
+        self.assertEqual(self.store.l2_stats.hits, 1)
+
+        self.assertIsNone(self.store['bar'])
+        self.assertEqual(self.store.l2_stats.misses, 1)
+
+        # l1 hits, l2 hits
+        self.assertEqual(self.store.summary.l1[1], 0)
+        self.assertEqual(self.store.summary.l2[1], 1)
+
+    def test_writes_go_through_both_tiers(self):
+        self.store['foo'] = self.entry
+        self.assertEqual(len(self.store), 1)
+
+        del self.store['foo']
+        self.assertIsNone(self.store.l1['foo'])
+        self.assertIsNone(self.store.l2['foo'])
+
+        self.store['foo'] = self.entry
+        self.store.clear()
+        self.assertIsNone(self.store['foo'])
+
+    def test_cache(self):
+        cache = Cache(store=TieredStore, store_opts={'l2_store': MemoryStore})
+        cache.put('foo', 'Value Of Foo')
+
+        self.assertEqual(cache.get('foo'), 'Value Of Foo')
+        self.assertEqual(cache.store.l1_stats.hits, 1)
+
+
+class InvalidationBusTest(TestCase):
+
+    def test_local_bus(self):
+        path = mkdtemp()
+        publisher, subscriber = LocalInvalidationBus(path), LocalInvalidationBus(path)
+        received = Queue()
+        subscriber.subscribe(received.put)
+        publisher.subscribe(received.put)
+
+        # A socket left behind by a dead process.
+        open(os.path.join(path, 'dead.sock'), 'w').close()
+
+        publisher.publish('href')
+        self.assertEqual(received.get(timeout=5), 'href')  # local subscriber
+        self.assertEqual(received.get(timeout=5), 'href')  # other process
+        self.assertEqual(publisher.summary, (1, 0, 0))
+        self.assertEqual(subscriber.summary, (0, 1, 0))
+        self.assertFalse(os.path.exists(os.path.join(path, 'dead.sock')))
+
+        subscriber.close()
+        publisher.close()
+        self.assertEqual(os.listdir(path), [])
+        rmtree(path)
+
+    def test_failing_subscribers_dont_stop_the_bus(self):
+        path = mkdtemp()
+        publisher, subscriber = LocalInvalidationBus(path), LocalInvalidationBus(path)
+        received = Queue()
+
+        def fail(href):
+            raise Exception('boom')
+
+        subscriber.subscribe(fail)
+        subscriber.subscribe(received.put)
+        publisher.subscribe(fail)
+
+        publisher.publish('href')
+        publisher.publish('other-href')
+        self.assertEqual(received.get(timeout=5), 'href')
+        self.assertEqual(received.get(timeout=5), 'other-href')
+        self.assertEqual(publisher.summary, (2, 0, 2))
+        self.assertEqual(subscriber.summary, (0, 2, 2))
+
+        subscriber.close()
+        publisher.close()
+        rmtree(path)
+
+    def test_redis_not_available(self):
+        with patch.dict('sys.modules', {'redis': object()}):
+            with self.assertRaises(RuntimeError):
+                RedisInvalidationBus()
+
+    def test_redis_bus(self):
+        redis = MagicMock()
+        with patch.dict('sys.modules', {'redis': MagicMock(Redis=MagicMock(return_value=redis))}):
+            bus = RedisInvalidationBus(channel='invalidations')
+
+        received = []
+        message = dumps({'origin': 'other', 'href': 'href'}).encode('utf-8')
+        redis.pubsub.return_value.listen.return_value = [
+            {'type': 'message', 'data': message},
+        ]
+        bus.subscribe(received.append)
+        redis.pubsub.return_value.subscribe.assert_called_once_with('invalidations')
+
+        bus.publish('other-href', exclude=received.append)
+        self.assertEqual(redis.publish.call_args[0][0], 'invalidations')
+        self.assertEqual(loads(redis.publish.call_args[0][1].decode('utf-8'))['href'], 'other-href')
+
+        deadline = time.time() + 5
+        while not received and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(received, ['href'])
+
+        redis.publish.side_effect = Exception('boom')
+        bus.publish('href')
+        self.assertEqual(bus.summary, (1, 1, 1))
+
+
+class TestSQLiteStore(TestCase):
+
+    def setUp(self):
+        self.path = mkdtemp()
+        self.db = os.path.join(self.path, 'cache.db')
+
+    def tearDown(self):
+        rmtree(self.path)
+
+    def test_everything(self):
+        s = SQLiteStore(self.db)
+        self.assertEqual(len(s), 0)
+        self.assertIsNone(s['foo'])
+
+        s['foo'] = CacheEntry({'name': 'Foo'}, etag='"v1"')
+        self.assertEqual(len(s), 1)
+        self.assertEqual(s['foo'].value, {'name': 'Foo'})
+        self.assertEqual(s['foo'].etag, '"v1"')
+
+        del s['foo']
+        self.assertEqual(len(s), 0)
+        del s['nonexistent']  # shouldn't raise anything
+
+        s.put_many([('key%d' % i, CacheEntry(i)) for i in range(600)])
+        self.assertEqual(len(s.get_many(['key%d' % i for i in range(0, 1200, 2)])), 300)
+        s.delete_many(['key%d' % i for i in range(100)])
+        self.assertEqual(len(s), 500)
+
+        s.clear()
+        self.assertEqual(len(s), 0)
+
+    def test_entries_are_shared_between_processes(self):
+        SQLiteStore(self.db)['foo'] = CacheEntry('Foo')
+
+        s = SQLiteStore(self.db)
+        self.assertEqual(s['foo'].value, 'Foo')
+
+        values = []
+        t = Thread(target=lambda: values.append(s['foo'].value))
+        t.start()
+        t.join()
+        self.assertEqual(values, ['Foo'])
+
+    @patch('stormpath.cache.sqlite_store.time')
+    def test_ttl(self, time):
+        time.time.return_value = 1000
+        s = SQLiteStore(self.db, ttl=60)
+        s['foo'] = CacheEntry('Foo')
+
+        time.time.return_value = 1059
+        self.assertEqual(s['foo'].value, 'Foo')
+
+        time.time.return_value = 1060
+        self.assertIsNone(s['foo'])
+        self.assertEqual(s.get_many(['foo']), {})
+        self.assertEqual(len(s), 0)
+
+    def test_max_entries(self):
+        s = SQLiteStore(self.db, max_entries=50)
+        for i in range(150):
+            s['key%d' % i] = CacheEntry(i)
+            time.sleep(0.0001)
+
+        s.trim()
+        self.assertEqual(len(s), 50)
+        self.assertEqual(s.evictions, 100)
+        self.assertIsNone(s['key0'])
+        self.assertEqual(s['key149'].value, 149)
+
+        with self.assertRaises(ValueError):
+            SQLiteStore(self.db, max_entries=0)
+
+    def test_cache(self):
+        cache = Cache(store=SQLiteStore, store_opts={'path': self.db, 'max_entries': 10, 'policy': 'lru'})
+        self.assertEqual(cache.store.max_entries, 10)
+
+        cache.put('foo', 'Value Of Foo')
+        self.assertEqual(cache.get('foo'), 'Value Of Foo')
+
+    def test_regions_are_kept_apart(self):
+        m = CacheManager()
+        store_opts = {'path': self.db, 'max_entries': 10}
+        m.create_cache('accounts', store=SQLiteStore, store_opts=store_opts)
+        m.create_cache('groups', store=SQLiteStore, store_opts=store_opts)
+        accounts, groups = m.get_cache('accounts'), m.get_cache('groups')
+
+        accounts.put('foo', 'Account Foo')
+        groups.put('foo', 'Group Foo')
+        groups.put('bar', 'Group Bar')
+        self.assertEqual(accounts.get('foo'), 'Account Foo')
+        self.assertEqual(groups.get('foo'), 'Group Foo')
+        self.assertEqual(accounts.size, 1)
+        self.assertEqual(groups.size, 2)
+
+        accounts.clear()
+        self.assertIsNone(accounts.get('foo'))
+        self.assertEqual(groups.get('foo'), 'Group Foo')
+        self.assertEqual(store_opts, {'path': self.db, 'max_entries': 10})
+
+        with self.assertRaises(ValueError):
+            SQLiteStore(self.db, region='foo; DROP TABLE entries')
+
 
 class TestRedisStore(TestCase):
 
@@ -281,12 +891,34 @@ class TestRedisStore(TestCase):
         def get(self, key):
             return self.data.get(key)
 
+        def mget(self, keys):
+            return [self.data.get(key) for key in keys]
+
         def setex(self, key, data, ttl):
             self.data[key] = data
 
-        def delete(self, key):
-            if key in self.data:
-                del self.data[key]
+        def delete(self, *keys):
+            for key in keys:
+                if key in self.data:
+                    del self.data[key]
+
+        def pipeline(self, transaction=True):
+            redis = self
+
+            class Pipeline(object):
+                commands = []
+
+                def setex(self, *args):
+                    self.commands.append(args)
+
+                def execute(self):
+                    redis.round_trips += 1
+                    for args in self.commands:
+                        redis.setex(*args)
+
+            return Pipeline()
+
+        round_trips = 0
 
         def flushdb(self):
             self.data = {}
@@ -322,26 +954,64 @@ class TestRedisStore(TestCase):
         s.clear()
         self.assertEqual(len(s), 0)
 
+    def test_batches(self):
+        with patch.dict('sys.modules', {'redis': MagicMock(Redis=self.Redis)}):
+            s = RedisStore()
+
+        s.put_many([('foo', CacheEntry('Foo')), ('bar', CacheEntry('Bar'))])
+        self.assertEqual(s.redis.round_trips, 1)
+        self.assertEqual(len(s), 2)
+
+        entries = s.get_many(['foo', 'bar', 'nonexistent'])
+        self.assertEqual(sorted(entries), ['bar', 'foo'])
+        self.assertEqual(entries['foo'].value, 'Foo')
+        self.assertEqual(s.get_many([]), {})
+
+        s.delete_many(['foo', 'bar'])
+        self.assertEqual(len(s), 0)
+
+    def test_codec(self):
+        with patch.dict('sys.modules', {'redis': MagicMock(Redis=self.Redis)}):
+            s = RedisStore(codec=EntryCodec(compression='zlib'))
+
+        s['foo'] = CacheEntry('Value Of Foo')
+        self.assertEqual(s.redis.data['foo'][:1], EntryCodec.MAGIC)
+        self.assertEqual(s['foo'].value, 'Value Of Foo')
+        self.assertEqual(s.get_many(['foo'])['foo'].value, 'Value Of Foo')
+
 
 class TestMemcachedStore(TestCase):
 
     class Memcache(object):
         def __init__(self, *args, **kwargs):
             self.data = {}
+            self.serializer = kwargs['serializer']
+            self.deserializer = kwargs['deserializer']
 
         def get(self, key):
             data, flags = self.data.get(key)
-            data = json_deserializer(key, data, flags)
+            data = self.deserializer(key, data, flags)
             return data
 
         def set(self, key, entry, expire):
-            data, flags = json_serializer(key, entry)
+            data, flags = self.serializer(key, entry)
             self.data[key] = (data, flags)
 
         def delete(self, key):
             if key in self.data:
                 del self.data[key]
 
+        def get_many(self, keys):
+            return dict((key, self.get(key)) for key in keys if key in self.data)
+
+        def set_many(self, entries, expire):
+            for key, entry in entries.items():
+                self.set(key, entry, expire)
+
+        def delete_many(self, keys):
+            for key in keys:
+                self.delete(key)
+
         def flush_all(self):
             self.data = {}
 
@@ -374,6 +1044,86 @@ class TestMemcachedStore(TestCase):
         s.clear()
         self.assertEqual(len(s), 0)
 
+    def test_batches(self):
+        with patch.dict('sys.modules', {'pymemcache': object(), 'pymemcache.client': MagicMock(Client=self.Memcache)}):
+            s = MemcachedStore()
+
+        s.put_many([('foo', CacheEntry('Foo')), ('bar', CacheEntry('Bar'))])
+        self.assertEqual(len(s), 2)
+
+        entries = s.get_many(['foo', 'nonexistent'])
+        self.assertEqual(list(entries), ['foo'])
+        self.assertEqual(entries['foo'].value, 'Foo')
+
+        s.delete_many(['foo', 'bar'])
+        self.assertEqual(len(s), 0)
+
+    def test_codec(self):
+        with patch.dict('sys.modules', {'pymemcache': object(), 'pymemcache.client': MagicMock(Client=self.Memcache)}):
+            s = MemcachedStore(codec=EntryCodec())
+
+        s['foo'] = CacheEntry('Value Of Foo')
+        self.assertEqual(s.memcache.data['foo'][1], CODEC_VALUE)
+        self.assertEqual(s['foo'].value, 'Value Of Foo')
+
+        # entries written by older versions
+        s.memcache.data['bar'] = json_serializer('bar', CacheEntry('Value Of Bar'))
+        self.assertEqual(s['bar'].value, 'Value Of Bar')
+
+
+class EntryCodecTest(TestCase):
+
+    def setUp(self):
+        self.entry = CacheEntry({'href': 'href', 'items': [1, 2.5, None, True]}, etag='"v1"')
+
+    def assertEntryEqual(self, entry, other):
+        self.assertEqual(entry.value, other.value)
+        # the JSON format keeps microseconds
+        self.assertAlmostEqual(entry.created_at, other.created_at, places=5)
+        self.assertAlmostEqual(entry.last_accessed_at, other.last_accessed_at, places=5)
+        self.assertEqual(entry.etag, other.etag)
+        self.assertEqual(entry.last_modified, other.last_modified)
+
+    def test_round_trip(self):
+        codec = EntryCodec()
+        data = codec.encode(self.entry)
+
+        self.assertEqual(data[:4], b'\xfe\x01m\x00')
+        self.assertEntryEqual(codec.decode(data), self.entry)
+        self.assertTrue(len(data) < len(JSONCodec().encode(self.entry)))
+
+    def test_compression(self):
+        codec = EntryCodec(compression='zlib', compress_threshold=100)
+        small = codec.encode(self.entry)
+        self.assertEqual(small[3:4], b'\x00')
+
+        self.entry.value['description'] = 'x' * 1000
+        large = codec.encode(self.entry)
+        self.assertEqual(large[3:4], b'\x01')
+        self.assertTrue(len(large) < 1000)
+
+        # any codec decodes any compression
+        self.assertEntryEqual(EntryCodec().decode(large), self.entry)
+
+    def test_versions(self):
+        codec = EntryCodec()
+        self.assertEntryEqual(codec.decode(JSONCodec().encode(self.entry)), self.entry)
+
+        data = codec.encode(self.entry)
+        self.assertIsNone(codec.decode(data[:1] + b'\x02' + data[2:]))
+
+    def test_options(self):
+        with self.assertRaises(ValueError):
+            EntryCodec('pickle')
+        with self.assertRaises(ValueError):
+            EntryCodec(compression='bz2')
+        with patch.dict('sys.modules', {'msgpack': None}):
+            with self.assertRaises(RuntimeError):
+                EntryCodec('msgpack')
+        with patch.dict('sys.modules', {'lz4': None, 'lz4.frame': None}):
+            with self.assertRaises(RuntimeError):
+                EntryCodec(compression='lz4')
+
 
 if __name__ == '__main__':
     main()
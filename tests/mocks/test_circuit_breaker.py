@@ -0,0 +1,96 @@
+from unittest import TestCase, main
+
+try:
+    from mock import MagicMock, patch
+except ImportError:
+    from unittest.mock import MagicMock, patch
+
+from stormpath.circuit_breaker import CircuitBreaker
+
+
+@patch('stormpath.circuit_breaker.time.time')
+class TestCircuitBreaker(TestCase):
+
+    def breaker(self, **kwargs):
+        self.hook = MagicMock()
+        options = {'minimum_calls': 4, 'window': 10, 'open_timeout': 30, 'on_state_change': self.hook}
+        options.update(kwargs)
+
+        return CircuitBreaker(**options)
+
+    def test_opens_on_failure_rate(self, now):
+        now.return_value = 100
+        breaker = self.breaker(failure_rate_threshold=0.5)
+
+        breaker.record(False, 0.1)
+        breaker.record(True, 0.1)
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record(True, 0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.hook.assert_called_once_with(breaker, CircuitBreaker.CLOSED, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.summary.rejected, 1)
+
+    def test_opens_on_slow_calls(self, now):
+        now.return_value = 100
+        breaker = self.breaker(slow_call_duration=2, slow_call_rate_threshold=0.75)
+
+        for duration in (1, 3, 3, 3):
+            breaker.record(False, duration)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_old_calls_leave_the_window(self, now):
+        breaker = self.breaker()
+
+        now.return_value = 100
+        for _ in range(3):
+            breaker.record(True, 0.1)
+
+        now.return_value = 111
+        breaker.record(True, 0.1)
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.summary.calls, 1)
+
+    def test_half_open_probe_success_closes(self, now):
+        now.return_value = 100
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(True, 0.1)
+
+        now.return_value = 131
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # only one probe at a time
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+        self.assertEqual([c[0][1:] for c in self.hook.call_args_list], [
+            (CircuitBreaker.CLOSED, CircuitBreaker.OPEN),
+            (CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN),
+            (CircuitBreaker.HALF_OPEN, CircuitBreaker.CLOSED),
+        ])
+
+    def test_half_open_probe_failure_reopens(self, now):
+        now.return_value = 100
+        breaker = self.breaker()
+        for _ in range(4):
+            breaker.record(True, 0.1)
+
+        now.return_value = 131
+        self.assertTrue(breaker.allow_request())
+        breaker.record(True, 0.1)
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.summary.opened, 2)
+
+
+if __name__ == '__main__':
+    main()
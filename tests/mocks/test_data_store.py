@@ -0,0 +1,512 @@
+from shutil import rmtree
+from tempfile import mkdtemp
+from threading import Event, Thread
+from time import sleep, time
+from unittest import TestCase, main
+
+try:
+    from mock import MagicMock
+except ImportError:
+    from unittest.mock import MagicMock
+
+from pydispatch import dispatcher
+
+from stormpath.cache.invalidation import LocalInvalidationBus
+from stormpath.data_store import NO_CACHE, BackgroundRefresher, DataStore, SingleFlight
+from stormpath.error import CircuitOpenError, Error
+
+
+class TestSingleFlight(TestCase):
+
+    def run_concurrently(self, sf, fn, count=5):
+        results = []
+        errors = []
+
+        def worker():
+            try:
+                results.append(sf.do('key', fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [Thread(target=worker) for _ in range(count)]
+        for t in threads:
+            t.start()
+
+        return threads, results, errors
+
+    def test_concurrent_calls_are_collapsed(self):
+        sf = SingleFlight()
+        release = Event()
+        fn = MagicMock(side_effect=lambda: release.wait() and {'name': 'foo'})
+
+        threads, results, errors = self.run_concurrently(sf, fn)
+
+        # wait for all the threads to be queued behind the first one
+        while sf.calls < len(threads):
+            release.wait(0.001)
+
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(fn.call_count, 1)
+        self.assertEqual(results, [{'name': 'foo'}] * len(threads))
+        self.assertEqual(errors, [])
+        self.assertEqual(sf.summary, (5, 1, 4))
+
+    def test_errors_are_shared(self):
+        sf = SingleFlight()
+        release = Event()
+
+        def fn():
+            release.wait()
+            raise Error('boom')
+
+        threads, results, errors = self.run_concurrently(sf, fn, count=3)
+        while sf.calls < len(threads):
+            release.wait(0.001)
+
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 3)
+
+    def test_sequential_calls_are_not_collapsed(self):
+        sf = SingleFlight()
+        fn = MagicMock(return_value=1)
+
+        sf.do('key', fn)
+        sf.do('key', fn)
+
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(sf.summary, (2, 2, 0))
+
+
+class TestBackgroundRefresher(TestCase):
+
+    def test_refreshes_are_deduplicated(self):
+        refresher = BackgroundRefresher()
+        started = Event()
+        release = Event()
+
+        def refresh():
+            started.set()
+            release.wait()
+
+        self.assertTrue(refresher.schedule('foo', refresh))
+        started.wait(5)
+        self.assertFalse(refresher.schedule('foo', refresh))
+
+        release.set()
+        for _ in range(100):
+            if refresher.summary.pending == 0:
+                break
+            sleep(0.01)
+
+        self.assertEqual(refresher.summary, (1, 1, 0, 1, 0, 0))
+
+    def test_refreshes_are_bounded(self):
+        refresher = BackgroundRefresher(max_pending=0)
+
+        self.assertFalse(refresher.schedule('foo', lambda: None))
+        self.assertEqual(refresher.summary.dropped, 1)
+
+
+class TestDataStore(TestCase):
+
+    def test_get_resource_request_key_ignores_params_order(self):
+        self.assertEqual(
+            DataStore._get_request_key('href', {'a': 1, 'b': 2}),
+            DataStore._get_request_key('href', {'b': 2, 'a': 1}))
+        self.assertNotEqual(
+            DataStore._get_request_key('href', {'a': 1}),
+            DataStore._get_request_key('href', {'a': 2}))
+
+    def test_get_resource_fetches_and_caches(self):
+        href = 'https://api.stormpath.com/v1/applications/APP'
+        executor = MagicMock()
+        executor.get.return_value = {'href': href, 'name': 'foo'}
+        ds = DataStore(executor)
+
+        self.assertEqual(ds.get_resource(href)['name'], 'foo')
+        self.assertEqual(ds.get_resource(href)['name'], 'foo')
+
+        executor.get.assert_called_once_with(href, params=None)
+        self.assertEqual(ds.single_flight.summary, (1, 1, 0))
+
+    def test_get_resource_serves_stale_entries_while_circuit_is_open(self):
+        href = 'https://api.stormpath.com/v1/applications/APP'
+        executor = MagicMock()
+        ds = DataStore(executor, {'regions': {'applications': {'ttl': 0, 'stale_ttl': 300}}})
+        ds._cache_put(href, {'href': href, 'name': 'foo'})
+
+        executor.get.side_effect = CircuitOpenError()
+        self.assertEqual(ds.get_resource(href)['name'], 'foo')
+
+        executor.get.side_effect = Error('boom')
+        with self.assertRaises(Error):
+            ds.get_resource(href)
+
+        executor.get.side_effect = CircuitOpenError()
+        with self.assertRaises(CircuitOpenError):
+            ds.get_resource(href + 'X')
+
+    def test_get_resource_revalidates_expired_entries(self):
+        href = 'https://api.stormpath.com/v1/applications/APP'
+        executor = MagicMock()
+        ds = DataStore(executor, {'regions': {'applications': {'ttl': 0}}})
+        ds._cache_put(href, {'href': href, 'name': 'foo'}, validators={'etag': '"v1"'})
+        cache = ds._get_cache(href)
+
+        executor.get.return_value = {'sp_http_status': 304}
+        self.assertEqual(ds.get_resource(href)['name'], 'foo')
+
+        executor.get.assert_called_once_with(href, params=None, headers={'If-None-Match': '"v1"'})
+        self.assertEqual(cache.stats.revalidations, 1)
+        self.assertEqual(cache.get_entry(href).etag, '"v1"')
+
+    def test_get_resource_replaces_changed_entries(self):
+        href = 'https://api.stormpath.com/v1/applications/APP'
+        executor = MagicMock()
+        ds = DataStore(executor, {'regions': {'applications': {'ttl': 0}}})
+        ds._cache_put(href, {'href': href, 'name': 'foo'}, validators={'last_modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        cache = ds._get_cache(href)
+
+        executor.get.return_value = {'href': href, 'name': 'bar'}
+        self.assertEqual(ds.get_resource(href)['name'], 'bar')
+
+        executor.get.assert_called_once_with(href, params=None, headers={'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(cache.stats.revalidations, 0)
+        self.assertFalse(cache.get_entry(href).has_validators)
+
+    def test_get_resource_refreshes_stale_entries_in_background(self):
+        href = 'https://api.stormpath.com/v1/applications/APP'
+        executor = MagicMock()
+        fetched = Event()
+
+        def get(href, params=None):
+            fetched.set()
+            return {'href': href, 'name': 'bar'}
+
+        executor.get.side_effect = get
+        ds = DataStore(executor, {'regions': {'applications': {'ttl': 0, 'stale_while_revalidate': 300}}})
+        ds._cache_put(href, {'href': href, 'name': 'foo'})
+
+        self.assertEqual(ds.get_resource(href)['name'], 'foo')
+        self.assertTrue(fetched.wait(5))
+        executor.get.assert_called_once_with(href, params=None)
+
+    def test_iter_resource_items_caches_items(self):
+        href = 'https://api.stormpath.com/v1/applications/APP'
+        executor = MagicMock(stream_collections=True)
+        executor.iter_items.return_value = iter([{'href': href, 'name': 'foo'}])
+        ds = DataStore(executor)
+
+        self.assertTrue(ds.stream_collections)
+        self.assertEqual(list(ds.iter_resource_items('https://api.stormpath.com/v1/applications')), [{'href': href, 'name': 'foo'}])
+        self.assertEqual(ds.get_resource(href)['name'], 'foo')
+        self.assertFalse(executor.get.called)
+        self.assertFalse(DataStore(MagicMock()).stream_collections)
+
+    def test_iter_resource_items_batches_puts(self):
+        hrefs = ['https://api.stormpath.com/v1/accounts/A%d' % i for i in range(60)]
+        executor = MagicMock(stream_collections=True)
+        executor.iter_items.return_value = iter([{'href': href, 'name': 'foo'} for href in hrefs])
+        ds = DataStore(executor)
+        cache = ds.cache_manager.get_cache('accounts')
+        cache.put = MagicMock(wraps=cache.put)
+        cache.put_many = MagicMock(wraps=cache.put_many)
+
+        items = ds.iter_resource_items('https://api.stormpath.com/v1/accounts')
+        for _ in range(30):
+            next(items)
+        self.assertEqual(cache.put_many.call_count, 1)
+        self.assertEqual(len(cache.put_many.call_args[0][0]), ds.STREAM_BATCH_SIZE)
+
+        items.close()
+        self.assertEqual(cache.put_many.call_count, 2)
+        self.assertEqual(cache.size, 30)
+        self.assertFalse(cache.put.called)
+
+    def test_cache_put_batches_expansions_and_items_by_region(self):
+        href = 'https://api.stormpath.com/v1/applications/APP/accounts'
+        ds = DataStore(MagicMock())
+        caches = dict((region, ds.cache_manager.get_cache(region)) for region in ('accounts', 'directories'))
+        for cache in caches.values():
+            cache.put_many = MagicMock(wraps=cache.put_many)
+
+        ds._cache_fetched(href, {'href': href, 'items': [
+            {
+                'href': 'https://api.stormpath.com/v1/accounts/A%d' % i,
+                'directory': {'href': 'https://api.stormpath.com/v1/directories/D', 'name': 'dir'},
+            } for i in range(100)
+        ]})
+
+        self.assertEqual(caches['accounts'].put_many.call_count, 1)
+        self.assertEqual(len(caches['accounts'].put_many.call_args[0][0]), 100)
+        self.assertEqual(caches['directories'].put_many.call_count, 1)
+        self.assertEqual(ds._cache_get('https://api.stormpath.com/v1/accounts/A7')['directory'],
+            {'href': 'https://api.stormpath.com/v1/directories/D'})
+        self.assertEqual(ds._cache_get('https://api.stormpath.com/v1/directories/D')['name'], 'dir')
+
+    def test_get_cache_routes_hrefs_to_regions(self):
+        ds = DataStore(MagicMock())
+        ds.cache_manager.caches.pop('groups')
+        ds._compile_routes()
+        base = 'https://api.stormpath.com/v1'
+        get_cache = ds.cache_manager.get_cache
+
+        self.assertIs(ds._get_cache(base + '/accounts/A'), get_cache('accounts'))
+        self.assertIs(ds._get_cache(base + '/accounts/A/customData'), get_cache('customData'))
+        self.assertIs(ds._get_cache(base + '/accounts/A/customData/key'), get_cache('customData'))
+        self.assertIs(ds._get_cache(base + '/applications/A/accounts'), NO_CACHE)
+        self.assertIs(ds._get_cache(base + '/groups/G'), NO_CACHE)
+        self.assertIs(ds._get_cache('/accounts/A'), get_cache('accounts'))
+        self.assertIs(ds._get_cache('accounts'), NO_CACHE)
+
+    def test_get_cache_memo_is_bounded(self):
+        ds = DataStore(MagicMock())
+        ds.ROUTE_CACHE_SIZE = 10
+        for i in range(25):
+            self.assertIs(ds._get_cache('https://api.stormpath.com/v1/accounts/%d' % i), ds.cache_manager.get_cache('accounts'))
+
+        self.assertEqual(len(ds._route_cache), 5)
+
+    def test_get_resource_caches_not_found_errors(self):
+        href = 'https://api.stormpath.com/v1/apiKeys/UNKNOWN'
+        executor = MagicMock()
+        executor.get.side_effect = Error({'status': 404, 'code': 404, 'developerMessage': 'Not found.'})
+        ds = DataStore(executor, {'not_found': {'ttl': 60}})
+
+        for _ in range(3):
+            with self.assertRaises(Error) as ctx:
+                ds.get_resource(href)
+            self.assertEqual(ctx.exception.status, 404)
+            self.assertEqual(ctx.exception.developer_message, 'Not found.')
+
+        self.assertEqual(executor.get.call_count, 1)
+        self.assertEqual(ds.cache_manager.stats['notFound'].hits, 2)
+
+        # other errors aren't cached
+        executor.get.side_effect = Error({'status': 500})
+        for _ in range(2):
+            with self.assertRaises(Error):
+                ds.get_resource(href + 'X')
+        self.assertEqual(executor.get.call_count, 3)
+
+    def test_not_found_errors_are_forgotten_once_created(self):
+        href = 'https://api.stormpath.com/v1/accounts/ACCOUNT'
+        executor = MagicMock()
+        executor.get.side_effect = Error({'status': 404})
+        ds = DataStore(executor, {'not_found': {}})
+
+        with self.assertRaises(Error):
+            ds.get_resource(href)
+
+        not_found = ds.cache_manager.get_cache('notFound')
+        self.assertIsNotNone(not_found.get(href))
+
+        executor.post.return_value = {'href': href, 'givenName': 'foo'}
+        ds.create_resource('https://api.stormpath.com/v1/directories/D/accounts', {'givenName': 'foo'})
+        self.assertIsNone(not_found.get(href))
+
+        executor.get.side_effect = None
+        executor.get.return_value = {'href': href, 'givenName': 'foo'}
+        self.assertEqual(ds.get_resource(href)['givenName'], 'foo')
+
+        # invalidations from other processes go through uncache_resource
+        ds._cache_not_found(href + 'X', Error({'status': 404}))
+        ds.uncache_resource(href + 'X')
+        self.assertIsNone(not_found.get(href + 'X'))
+
+    def query_store(self):
+        base = 'https://api.stormpath.com/v1'
+        self.groups_href = base + '/directories/DIRECTORY/groups'
+        self.group_href = base + '/groups/GROUP'
+        executor = MagicMock()
+        executor.get.return_value = {
+            'href': self.groups_href, 'offset': 0, 'limit': 25, 'size': 1,
+            'items': [{'href': self.group_href, 'name': 'admins'}],
+        }
+
+        return executor, DataStore(executor, {'queries': {'ttl': 60}})
+
+    def test_get_resource_caches_queries(self):
+        executor, ds = self.query_store()
+
+        for params in ({'name': 'admins', 'limit': 25}, {'limit': 25, 'name': 'admins'}):
+            data = ds.get_resource(self.groups_href, params=params)
+            self.assertEqual(data['size'], 1)
+            self.assertEqual(data['items'], [{'href': self.group_href, 'name': 'admins'}])
+
+        self.assertEqual(executor.get.call_count, 1)
+        self.assertEqual(ds.cache_manager.stats['queries'].hits, 1)
+
+        # other params are other queries
+        ds.get_resource(self.groups_href, params={'name': 'users'})
+        self.assertEqual(executor.get.call_count, 2)
+
+    def test_cached_queries_need_their_items(self):
+        executor, ds = self.query_store()
+        ds.get_resource(self.groups_href)
+
+        ds._get_cache(self.group_href).delete(self.group_href)
+        ds.get_resource(self.groups_href)
+        self.assertEqual(executor.get.call_count, 2)
+
+    def test_cached_queries_expire_on_changes(self):
+        executor, ds = self.query_store()
+        executor.post.return_value = {'href': self.group_href, 'name': 'admins'}
+        base = 'https://api.stormpath.com/v1'
+
+        changes = [
+            lambda: ds.create_resource(self.groups_href, {'name': 'users'}),
+            lambda: ds.update_resource(self.group_href, {'name': 'users'}),
+            lambda: ds.delete_resource(base + '/groups/OTHER'),
+            lambda: ds.create_resource(base + '/groupMemberships', {}),
+        ]
+        for i, change in enumerate(changes):
+            ds.get_resource(self.groups_href)
+            ds.get_resource(self.groups_href)
+            self.assertEqual(executor.get.call_count, i + 1)
+            change()
+
+        # other types don't matter
+        ds.get_resource(self.groups_href)
+        ds.delete_resource(base + '/accounts/ACCOUNT')
+        ds.get_resource(self.groups_href)
+        self.assertEqual(executor.get.call_count, len(changes) + 1)
+
+    def test_expanded_collections_are_served_from_their_resource(self):
+        base = 'https://api.stormpath.com/v1'
+        account_href = base + '/accounts/ACCOUNT'
+        groups_href = account_href + '/groups'
+        executor = MagicMock()
+        executor.get.return_value = {
+            'href': account_href,
+            'groups': {
+                'href': groups_href, 'offset': 0, 'limit': 25, 'size': 1,
+                'items': [{'href': base + '/groups/GROUP', 'name': 'admins'}],
+            },
+        }
+        ds = DataStore(executor)
+        ds.get_resource(account_href, params={'expand': 'groups(offset:0,limit:25)'})
+
+        for params in ({'offset': 0, 'limit': 25}, None):
+            data = ds.get_resource(groups_href, params=params)
+            self.assertEqual(data['size'], 1)
+            self.assertEqual(data['items'], [{'href': base + '/groups/GROUP', 'name': 'admins'}])
+        self.assertEqual(executor.get.call_count, 1)
+        self.assertEqual(ds.expansion_stats.summary, (2, 0))
+
+        # other pages, and pages of a changed type, are fetched
+        ds.get_resource(groups_href, params={'offset': 25, 'limit': 25})
+        self.assertEqual(executor.get.call_count, 2)
+        ds.delete_resource(base + '/groups/OTHER')
+        ds.get_resource(groups_href, params={'offset': 0, 'limit': 25})
+        self.assertEqual(executor.get.call_count, 3)
+
+    def test_resources_are_fetched_again_for_missing_expansions(self):
+        href = 'https://api.stormpath.com/v1/accounts/ACCOUNT'
+        executor = MagicMock()
+        executor.get.return_value = {'href': href, 'customData': {'href': href + '/customData'}}
+        ds = DataStore(executor)
+        ds.get_resource(href)
+
+        executor.get.return_value = {'href': href, 'customData': {'href': href + '/customData', 'plan': 'free'}}
+        for _ in range(2):
+            data = ds.get_resource(href, params={'expand': 'customData'})
+            self.assertEqual(data['customData']['href'], href + '/customData')
+
+        self.assertEqual(executor.get.call_count, 2)
+        self.assertEqual(ds.expansion_stats.summary, (0, 1))
+        self.assertEqual(ds._cache_get(href + '/customData')['plan'], 'free')
+
+    def test_expansions_of_resources_which_are_not_cached_are_ignored(self):
+        href = 'https://api.stormpath.com/v1/applications/APPLICATION'
+        executor = MagicMock()
+        executor.get.return_value = {'href': href, 'oauthPolicy': {'href': href.replace('applications', 'oAuthPolicies')}}
+        ds = DataStore(executor)
+
+        for _ in range(3):
+            ds.get_resource(href, params={'expand': 'oauthPolicy'})
+
+        self.assertEqual(executor.get.call_count, 1)
+        self.assertEqual(ds.expansion_stats.summary, (0, 0))
+
+    def test_queries_are_not_cached_by_default(self):
+        executor, _ = self.query_store()
+        ds = DataStore(executor)
+
+        for _ in range(2):
+            ds.get_resource(self.groups_href)
+        self.assertEqual(executor.get.call_count, 2)
+        self.assertNotIn('queries', ds.cache_manager.stats)
+
+    def test_not_found_errors_are_not_cached_by_default(self):
+        executor = MagicMock()
+        executor.get.side_effect = Error({'status': 404})
+        ds = DataStore(executor)
+
+        for _ in range(2):
+            with self.assertRaises(Error):
+                ds.get_resource('https://api.stormpath.com/v1/accounts/ACCOUNT')
+        self.assertEqual(executor.get.call_count, 2)
+        self.assertNotIn('notFound', ds.cache_manager.stats)
+
+
+class TestDataStoreInvalidation(TestCase):
+    href = 'https://api.stormpath.com/v1/accounts/ACCOUNT'
+
+    def setUp(self):
+        # Two buses with their own sockets behave like two processes.
+        self.path = mkdtemp()
+        self.buses = [LocalInvalidationBus(self.path), LocalInvalidationBus(self.path)]
+        self.executor = MagicMock()
+        self.executor.post.return_value = {'href': self.href, 'givenName': 'bar'}
+        self.stores = [DataStore(self.executor, invalidation_bus=bus) for bus in self.buses]
+        for ds in self.stores:
+            ds._cache_put(self.href, {'href': self.href, 'givenName': 'foo'})
+
+    def tearDown(self):
+        for bus in self.buses:
+            bus.close()
+        rmtree(self.path)
+
+    def wait_for_eviction(self, ds):
+        deadline = time() + 5
+        while ds._cache_get(self.href) is not None and time() < deadline:
+            sleep(0.01)
+
+        return ds._cache_get(self.href) is None
+
+    def test_delete_resource_evicts_other_processes(self):
+        self.stores[0].delete_resource(self.href)
+
+        self.assertTrue(self.wait_for_eviction(self.stores[1]))
+        self.assertEqual(self.buses[0].summary, (1, 0, 0))
+        self.assertEqual(self.buses[1].received, 1)
+
+    def test_update_resource_keeps_the_publisher_up_to_date(self):
+        self.stores[0].update_resource(self.href, {'givenName': 'bar'})
+
+        self.assertTrue(self.wait_for_eviction(self.stores[1]))
+        self.assertEqual(self.stores[0]._cache_get(self.href)['givenName'], 'bar')
+
+    def test_signals_of_other_data_stores_are_published(self):
+        resource = MagicMock(_store=DataStore(self.executor))
+        dispatcher.send(signal='resource-deleted', sender=resource, href=self.href)
+
+        self.assertTrue(self.wait_for_eviction(self.stores[1]))
+        self.assertIsNone(self.stores[0]._cache_get(self.href))
+
+        # Resources of the data store itself were already published.
+        resource = MagicMock(_store=self.stores[0])
+        dispatcher.send(signal='resource-updated', sender=resource, href=self.href)
+        self.assertEqual(self.buses[0].published, 1)
+
+
+if __name__ == '__main__':
+    main()
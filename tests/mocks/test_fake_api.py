@@ -0,0 +1,154 @@
+from unittest import TestCase, main
+
+from stormpath.api_auth import PasswordGrantAuthenticator, RefreshGrantAuthenticator
+from stormpath.error import Error
+from stormpath.resources.base import Expansion
+from stormpath.testing import FakeStormpathAPI
+
+
+class TestFakeStormpathAPI(TestCase):
+
+    def setUp(self):
+        self.api = FakeStormpathAPI()
+        self.client = self.api.client()
+        self.application = self.client.applications.create({'name': 'app'}, create_directory=True)
+        self.account = self.application.accounts.create({
+            'email': 'john@example.com',
+            'password': 'Password1!',
+            'given_name': 'John',
+            'surname': 'Doe',
+            'custom_data': {'plan': 'free'},
+        })
+
+    def test_current_tenant(self):
+        self.assertEqual(self.client.tenant.name, 'fake')
+        self.assertEqual([a.name for a in self.client.applications], ['app'])
+
+    def test_accounts(self):
+        self.assertEqual(self.account.full_name, 'John Doe')
+        self.assertEqual(self.account.directory.name, 'app Directory')
+        self.assertEqual(self.account.custom_data['plan'], 'free')
+
+        with self.assertRaises(Error) as ctx:
+            self.application.accounts.create({'email': 'john@example.com', 'password': 'Password1!'})
+        self.assertEqual(ctx.exception.code, 2001)
+
+    def test_paging_and_search(self):
+        for i in range(30):
+            self.application.accounts.create({'email': 'user%d@example.com' % i, 'password': 'Password1!'})
+
+        self.assertEqual(len(list(self.application.accounts)), 31)
+        self.assertEqual(len(self.application.accounts.search({'email': 'user1*'})), 11)
+        self.assertEqual(len(self.application.accounts.search('john')), 1)
+
+    def test_groups_and_memberships(self):
+        group = self.application.groups.create({'name': 'admins'})
+        self.account.add_group(group)
+
+        self.assertEqual([g.name for g in self.account.groups], ['admins'])
+        self.assertEqual([a.email for a in group.accounts], ['john@example.com'])
+
+        self.account.delete()
+        self.assertEqual(len(list(group.accounts)), 0)
+
+    def test_custom_data(self):
+        self.account.custom_data['plan'] = 'paid'
+        self.account.custom_data.save()
+        del self.account.custom_data['plan']
+        self.account.custom_data.save()
+
+        self.assertNotIn('plan', self.api.custom_data[self.account.href])
+
+    def test_expansion(self):
+        account = self.client.accounts.get(self.account.href, expand=Expansion('customData'))
+
+        self.assertEqual(account.custom_data['plan'], 'free')
+
+    def test_expanded_collections_are_cached(self):
+        group = self.application.groups.create({'name': 'admins'})
+        self.account.add_group(group)
+
+        client = self.api.client()
+        account = client.accounts.get(self.account.href, expand=Expansion('groups'))
+        self.assertEqual([g.name for g in account.groups], ['admins'])
+
+        requests = self.api.requests
+        account = client.accounts.get(self.account.href, expand=Expansion('groups'))
+        self.assertEqual([g.name for g in account.groups], ['admins'])
+        self.assertEqual(self.api.requests, requests)
+
+    def test_session(self):
+        group = self.application.groups.create({'name': 'admins'})
+        self.account.add_group(group)
+
+        client = self.api.client()
+        with client.session() as identity_map:
+            account = client.accounts.get(self.account.href)
+            self.assertIs(client.accounts.get(self.account.href), account)
+
+            groups = [m.group for m in account.group_memberships]
+            self.assertEqual([g.name for g in groups], ['admins'])
+            self.assertIs([m.group for m in account.group_memberships][0], groups[0])
+            self.assertIs(groups[0].directory, account.directory)
+
+            with client.session() as nested:
+                self.assertIs(nested, identity_map)
+
+        self.assertGreater(identity_map.hits, 0)
+        self.assertIsNone(client.identity_map)
+        self.assertIsNot(client.accounts.get(self.account.href), account)
+
+    def test_login_attempts(self):
+        result = self.application.authenticate_account('john@example.com', 'Password1!')
+        self.assertEqual(result.account.href, self.account.href)
+
+        with self.assertRaises(Error) as ctx:
+            self.application.authenticate_account('john@example.com', 'wrong')
+        self.assertEqual(ctx.exception.code, 7100)
+
+    def test_oauth_tokens(self):
+        result = PasswordGrantAuthenticator(self.application).authenticate('john@example.com', 'Password1!')
+        self.assertEqual(result.account.href, self.account.href)
+
+        refreshed = RefreshGrantAuthenticator(self.application).authenticate(result.refresh_token.token)
+        self.assertEqual(refreshed.account.href, self.account.href)
+        self.assertIsNone(PasswordGrantAuthenticator(self.application).authenticate('john@example.com', 'wrong'))
+
+
+    def assert_warm(self, client):
+        requests = self.api.requests
+        application = client.applications.get(self.application.href)
+        directory = application.default_account_store_mapping.account_store
+
+        self.assertEqual(application.name, 'app')
+        self.assertIn('created_at', application.custom_data)
+        self.assertEqual(directory.name, 'app Directory')
+        self.assertIn('created_at', directory.custom_data)
+        self.assertEqual(self.api.requests, requests)
+
+    def test_warm_cache(self):
+        for i in range(3):
+            self.client.applications.create({'name': 'app%d' % i}, create_directory=True)
+
+        client = self.api.client()
+        requests = self.api.requests
+        client.warm_cache(limit=2)
+
+        # the (redirected) tenant, and 2 pages of applications and directories
+        self.assertEqual(self.api.requests - requests, 6)
+        self.assert_warm(client)
+
+    def test_warm_cache_of_some_applications(self):
+        self.client.applications.create({'name': 'other'}, create_directory=True)
+
+        client = self.api.client()
+        requests = self.api.requests
+        client.warm_cache([self.application.href])
+
+        # the (redirected) tenant, the application and its directory
+        self.assertEqual(self.api.requests - requests, 4)
+        self.assert_warm(client)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,16 @@
 
+import gzip
+from io import BytesIO
 from unittest import TestCase, main
 from collections import OrderedDict
+from requests import Response
 from requests import RequestException
-from stormpath.http import HttpExecutor
-from stormpath.error import Error
+from urllib3 import HTTPResponse
+from stormpath.circuit_breaker import CircuitBreaker
+from stormpath.http import HttpExecutor, PoolingHTTPAdapter
+from stormpath.rate_limiter import AdaptiveRateLimiter
+from stormpath.retry import RetryBudget, RetryPolicy
+from stormpath.error import CircuitOpenError, Error
 from stormpath.client import Client
 
 try:
@@ -39,6 +46,69 @@ class HttpTest(TestCase):
 
         self.assertEqual(data, s.request.return_value.json.return_value)
 
+    @patch('stormpath.http.Session')
+    def test_get_request_with_validators(self, Session):
+        s = Session.return_value
+        s.request.return_value.status_code = 200
+        s.request.return_value.json.return_value = {'name': 'foo'}
+        s.request.return_value.headers = {'ETag': '"v1"'}
+
+        ex = HttpExecutor('http://api.stormpath.com/v1', ('user', 'pass'))
+        data = ex.get('/test')
+
+        self.assertEqual(data, {'name': 'foo', 'sp_http_status': 200})
+        self.assertEqual(data.validators, {'etag': '"v1"'})
+
+        s.request.return_value.status_code = 304
+        data = ex.get('/test', headers={'If-None-Match': '"v1"'})
+
+        s.request.assert_called_with(
+            'GET', 'http://api.stormpath.com/v1/test', data=None,
+            params=None, headers={'If-None-Match': '"v1"'}, allow_redirects=False)
+        self.assertEqual(data, {'sp_http_status': 304})
+
+    @patch('stormpath.http.Session')
+    def test_response_body_is_decoded_once(self, Session):
+        s = Session.return_value
+        r = s.request.return_value
+        r.status_code = 200
+        r.content = b'{"name": "foo"}'
+        type(r).text = PropertyMock(side_effect=AssertionError)
+
+        ex = HttpExecutor('http://api.stormpath.com/v1', ('user', 'pass'))
+
+        self.assertEqual(ex.get('/test'), r.json.return_value)
+
+        r.content = b''
+        self.assertEqual(ex.get('/test'), {})
+
+    @patch('stormpath.http.Session')
+    def test_iter_items_streams_compressed_pages(self, Session):
+        body = BytesIO()
+        f = gzip.GzipFile(fileobj=body, mode='wb')
+        f.write(b'{"href": "/accounts", "items": [{"href": "/accounts/A"}, {"href": "/accounts/B", "n": 1.5}], "size": 2}')
+        f.close()
+
+        r = Response()
+        r.status_code = 200
+        r.raw = HTTPResponse(body=BytesIO(body.getvalue()), headers={'Content-Encoding': 'gzip'}, preload_content=False)
+        s = Session.return_value
+        s.request.return_value = r
+
+        ex = HttpExecutor('http://api.stormpath.com/v1', ('user', 'pass'), stream_collections=True)
+        items = ex.iter_items('/accounts', {'offset': 25})
+
+        self.assertEqual(next(items), {'href': '/accounts/A'})
+        self.assertEqual(list(items), [{'href': '/accounts/B', 'n': 1.5}])
+        s.request.assert_called_once_with(
+            'GET', 'http://api.stormpath.com/v1/accounts', data=None,
+            params={'offset': 25}, headers=None, allow_redirects=False, stream=True)
+
+    def test_stream_collections_requires_ijson(self):
+        with patch.dict('sys.modules', {'ijson': None}):
+            with self.assertRaises(RuntimeError):
+                HttpExecutor('http://api.stormpath.com/v1', ('user', 'pass'), stream_collections=True)
+
     @patch('stormpath.http.Session')
     def test_get_binary_request(self, Session):
         s = Session.return_value
@@ -163,6 +233,145 @@ class HttpTest(TestCase):
         ]
         ShouldRetry.assert_has_calls(should_retry_calls)
 
+    def retrying_executor(self, Session, responses, **policy):
+        def request(*args, **kwargs):
+            r = responses.pop(0)
+            if isinstance(r, Exception):
+                raise r
+            return r
+
+        Session.return_value = MagicMock(request=MagicMock(side_effect=request))
+
+        return HttpExecutor('http://api.stormpath.com/v1', ('user', 'pass'),
+            get_delay=lambda retries: 10, retry_policy=RetryPolicy(**policy))
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_post_is_not_retried_on_server_errors(self, Session, sleep):
+        ex = self.retrying_executor(Session, [MagicMock(status_code=500, headers={})])
+
+        with self.assertRaises(Error):
+            ex.post('/test', {})
+
+        self.assertEqual(Session.return_value.request.call_count, 1)
+        self.assertEqual(ex.retry_stats.not_retryable, 1)
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_throttled_post_is_retried_after_retry_after(self, Session, sleep):
+        ex = self.retrying_executor(Session, [
+            MagicMock(status_code=429, headers={'Retry-After': '3'}),
+            MagicMock(status_code=201, json=MagicMock(return_value={'hello': 'World'})),
+        ])
+
+        self.assertEqual(ex.post('/test', {})['hello'], 'World')
+        sleep.assert_called_once_with(3)
+        self.assertEqual(ex.retry_stats.summary, (1, 1, 0, 0, 0, 0))
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_long_retry_after_is_not_waited_for(self, Session, sleep):
+        ex = self.retrying_executor(Session, [
+            MagicMock(status_code=429, headers={'Retry-After': '3600'}),
+        ])
+
+        with self.assertRaises(Error):
+            ex.get('/test')
+
+        self.assertFalse(sleep.called)
+        self.assertEqual(ex.retry_stats.not_retryable, 1)
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_non_idempotent_retries_can_be_enabled(self, Session, sleep):
+        ex = self.retrying_executor(Session, [
+            MagicMock(status_code=500, headers={}),
+            MagicMock(status_code=201, json=MagicMock(return_value={'hello': 'World'})),
+        ], retry_non_idempotent=True)
+
+        self.assertEqual(ex.post('/test', {})['hello'], 'World')
+        sleep.assert_called_once_with(0.01)
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_retries_are_limited_by_budget(self, Session, sleep):
+        ex = self.retrying_executor(Session, [RequestException('boom')] * 2,
+            budget=RetryBudget(ratio=0, min_per_second=0))
+
+        with self.assertRaises(Error):
+            ex.get('/test')
+
+        self.assertEqual(Session.return_value.request.call_count, 1)
+        self.assertEqual(ex.retry_stats.budget_exceeded, 1)
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_retries_are_limited_by_deadline(self, Session, sleep):
+        ex = self.retrying_executor(Session, [
+            MagicMock(status_code=503, headers={'Retry-After': '15'}),
+        ], deadline=10)
+
+        with self.assertRaises(Error):
+            ex.get('/test')
+
+        self.assertEqual(ex.retry_stats.deadline_exceeded, 1)
+        self.assertLessEqual(Session.return_value.request.call_args[1]['timeout'], 10)
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_retries_are_exhausted(self, Session, sleep):
+        ex = self.retrying_executor(Session, [RequestException('boom')] * 3, max_retries=2)
+
+        with self.assertRaises(Error):
+            ex.get('/test')
+
+        self.assertEqual(Session.return_value.request.call_count, 3)
+        self.assertEqual(ex.retry_stats.summary, (1, 2, 1, 0, 0, 0))
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_open_circuit_fails_fast(self, Session, sleep):
+        breaker = CircuitBreaker(minimum_calls=2)
+        ex = self.retrying_executor(Session, [RequestException('boom')] * 5)
+        ex.circuit_breaker = breaker
+
+        with self.assertRaises(CircuitOpenError):
+            ex.get('/test')
+
+        # the breaker opened after two failures, and stopped the retries
+        self.assertEqual(Session.return_value.request.call_count, 2)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            ex.get('/test')
+
+        self.assertEqual(Session.return_value.request.call_count, 2)
+
+    @patch('stormpath.http.time.sleep')
+    @patch('stormpath.http.Session')
+    def test_requests_go_through_rate_limiter(self, Session, sleep):
+        limiter = AdaptiveRateLimiter(rate=10, decrease_factor=0.5)
+        ex = self.retrying_executor(Session, [
+            MagicMock(status_code=429, headers={}),
+            MagicMock(status_code=200, headers={}, json=MagicMock(return_value={})),
+        ])
+        ex.rate_limiter = limiter
+
+        ex.get('/test')
+
+        self.assertEqual(limiter.requests, 2)
+        self.assertEqual(limiter.throttled, 1)
+        self.assertLess(limiter.rate, 10)
+
+    def test_default_backoff_is_jittered_and_capped(self):
+        ex = HttpExecutor('http://api.stormpath.com/v1', ('user', 'pass'))
+
+        for retries in range(10):
+            delay = ex.get_backoff_delay(retries)
+            base = min(2 ** retries * ex.BASE_BACKOFF_IN_MILLISECONDS, ex.MAX_BACKOFF_IN_MILLISECONDS)
+            self.assertGreaterEqual(delay, base / 2.0)
+            self.assertLessEqual(delay, base)
+
     @patch('stormpath.http.Session')
     def test_follow_redirects(self, Session):
 
@@ -214,5 +423,64 @@ class HttpTest(TestCase):
         client = Client(api_key={'id': 'MyId', 'secret': 'Shush!'})
         self.assertEqual(client.data_store.executor.session.proxies, {})
 
+    @patch('stormpath.client.Auth.digest', new_callable=PropertyMock)
+    def test_connection_pool_options(self, auth):
+        client = Client(api_key={'id': 'MyId', 'secret': 'Shush!'},
+            pool_connections=4, pool_maxsize=32, pool_block=True,
+            pool_idle_timeout=30, pool_max_age=600)
+        executor = client.data_store.executor
+
+        self.assertIs(executor.session.get_adapter('https://api.stormpath.com/v1'), executor.adapter)
+        self.assertEqual(executor.adapter.poolmanager.connection_pool_kw['maxsize'], 32)
+        self.assertEqual(executor.adapter.poolmanager.connection_pool_kw['block'], True)
+        self.assertEqual(executor.adapter.idle_timeout, 30)
+        self.assertEqual(executor.adapter.max_age, 600)
+        self.assertEqual(executor.pool_stats.summary, (0, 0, 0, 0, 0))
+
+
+class ConnectionPoolTest(TestCase):
+
+    def setUp(self):
+        self.adapter = PoolingHTTPAdapter(pool_maxsize=2, idle_timeout=30, max_age=600)
+        pool_class = self.adapter._managed_pool_classes()['https']
+        self.pool = pool_class('api.stormpath.com', maxsize=2)
+        self.pool._new_conn = lambda: MagicMock(sock=None)
+
+    def checkout(self):
+        conn = self.pool._get_conn()
+        conn.sock = conn.sock or MagicMock()  # connection established
+        return conn
+
+    def test_connections_are_reused(self):
+        conn = self.checkout()
+        self.assertEqual(self.adapter.stats.summary, (1, 0, 0, 1, 0))
+
+        self.pool._put_conn(conn)
+        self.assertEqual(self.adapter.stats.summary, (1, 0, 0, 0, 1))
+
+        self.assertIs(self.checkout(), conn)
+        self.assertEqual(self.adapter.stats.summary, (1, 1, 0, 1, 0))
+
+    def test_idle_connections_are_reaped(self):
+        conn = self.checkout()
+        self.pool._put_conn(conn)
+        conn._sp_released_at -= 31
+        conn.close.side_effect = lambda: setattr(conn, 'sock', None)
+
+        self.assertIs(self.checkout(), conn)
+        conn.close.assert_called_once_with()
+        self.assertEqual(self.adapter.stats.summary, (2, 0, 1, 1, 0))
+
+    def test_old_connections_are_reaped(self):
+        conn = self.checkout()
+        self.pool._put_conn(conn)
+        conn._sp_connected_at -= 601
+        conn.close.side_effect = lambda: setattr(conn, 'sock', None)
+
+        self.checkout()
+        conn.close.assert_called_once_with()
+        self.assertEqual(self.adapter.stats.reaped, 1)
+
+
 if __name__ == '__main__':
     main()
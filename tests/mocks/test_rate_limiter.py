@@ -0,0 +1,76 @@
+from unittest import TestCase, main
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from stormpath.rate_limiter import AdaptiveRateLimiter
+
+
+@patch('stormpath.rate_limiter.time')
+class TestAdaptiveRateLimiter(TestCase):
+
+    def test_token_bucket(self, time):
+        time.time.return_value = 100
+        limiter = AdaptiveRateLimiter(rate=10, burst=2)
+
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertAlmostEqual(limiter.acquire(), 0.1)
+        time.sleep.assert_called_once_with(limiter.wait_time)
+
+        # the bucket is refilled over time
+        time.time.return_value = 101
+        self.assertEqual(limiter.acquire(), 0)
+
+        self.assertEqual(limiter.summary.requests, 4)
+        self.assertAlmostEqual(limiter.summary.average_wait, 0.025)
+
+    def test_throttling_decreases_rate_multiplicatively(self, time):
+        time.time.return_value = 100
+        limiter = AdaptiveRateLimiter(rate=40, min_rate=15)
+
+        limiter.update(429)
+        self.assertEqual(limiter.rate, 20)
+
+        # throttled responses from the same burst only count once
+        limiter.update(429)
+        self.assertEqual(limiter.rate, 20)
+
+        time.time.return_value = 102
+        limiter.update(429)
+        self.assertEqual(limiter.rate, 15)
+        self.assertEqual(limiter.throttled, 3)
+
+    def test_success_increases_rate_additively(self, time):
+        time.time.return_value = 100
+        limiter = AdaptiveRateLimiter(rate=10, max_rate=10.4, increase=0.5)
+
+        for _ in range(10):
+            limiter.update(200)
+
+        self.assertAlmostEqual(limiter.rate, 10.4)
+
+    def test_retry_after_pauses_the_bucket(self, time):
+        time.time.return_value = 100
+        limiter = AdaptiveRateLimiter(rate=10, burst=10, decrease_factor=1)
+
+        limiter.update(429, {'Retry-After': '2'})
+
+        self.assertAlmostEqual(limiter.reserve(), 2.1)
+
+        limiter.update(429, {'Retry-After': '3600'})
+        self.assertTrue(limiter.reserve() < AdaptiveRateLimiter.MAX_PAUSE + 1)
+
+    def test_rate_limit_headers_cap_the_rate(self, time):
+        time.time.return_value = 100
+        limiter = AdaptiveRateLimiter(rate=50)
+
+        limiter.update(200, {'X-RateLimit-Remaining': '20', 'X-RateLimit-Reset': '10'})
+
+        self.assertEqual(limiter.rate, 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -573,6 +573,26 @@ class TestCollectionResource(TestCase):
         self.assertEqual(
             hrefs, ['test/resource', 'another/resource', 'third/resource'])
 
+    def test_iter_streams_following_pages(self):
+        ds = MagicMock(stream_collections=True)
+        ds.get_resource.return_value = {
+            'href': '/',
+            'offset': 0,
+            'limit': 2,
+            'size': 3,
+            'items': [
+                {'href': 'test/resource'},
+                {'href': 'another/resource'}
+            ]
+        }
+        ds.iter_resource_items.return_value = iter([{'href': 'third/resource'}])
+
+        rl = CollectionResource(client=MagicMock(data_store=ds), href='/')
+
+        self.assertEqual([r.href for r in rl], ['test/resource', 'another/resource', 'third/resource'])
+        ds.iter_resource_items.assert_called_once_with('/', params={'offset': 2, 'limit': 2})
+        self.assertEqual(ds.get_resource.call_count, 1)
+
     def test_limit_offset_query(self):
         ds = MagicMock()
         ds.get_resource.return_value = {
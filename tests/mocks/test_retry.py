@@ -0,0 +1,85 @@
+from email.utils import formatdate
+from time import time
+from unittest import TestCase, main
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from requests.exceptions import ConnectTimeout, ReadTimeout
+
+from stormpath.retry import RetryBudget, RetryPolicy, parse_retry_after
+
+
+class TestParseRetryAfter(TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after('2'), 2000)
+        self.assertEqual(parse_retry_after('0.5'), 500)
+
+    def test_http_date(self):
+        delay = parse_retry_after(formatdate(time() + 10, usegmt=True))
+        self.assertTrue(8000 <= delay <= 10000)
+
+        self.assertEqual(parse_retry_after(formatdate(time() - 10, usegmt=True)), 0)
+
+    def test_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+
+
+@patch('stormpath.retry.time.time')
+class TestRetryBudget(TestCase):
+
+    def test_min_per_second_is_refilled(self, now):
+        now.return_value = 100
+        budget = RetryBudget(ratio=0, min_per_second=2)
+
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        now.return_value = 100.5
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_deposits(self, now):
+        now.return_value = 100
+        budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1)
+
+        self.assertFalse(budget.withdraw())
+
+        for _ in range(10):
+            budget.deposit()
+
+        self.assertEqual(budget.tokens, 1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+
+class TestRetryPolicy(TestCase):
+
+    def test_idempotency_rules(self):
+        policy = RetryPolicy()
+
+        self.assertTrue(policy.is_retryable('GET', 500))
+        self.assertTrue(policy.is_retryable('DELETE', ReadTimeout()))
+        self.assertTrue(policy.is_retryable('POST', 429))
+        self.assertTrue(policy.is_retryable('POST', ConnectTimeout()))
+        self.assertFalse(policy.is_retryable('POST', 500))
+        self.assertFalse(policy.is_retryable('POST', ReadTimeout()))
+
+        self.assertTrue(RetryPolicy(retry_non_idempotent=True).is_retryable('POST', 500))
+
+    def test_budget_can_be_disabled(self):
+        policy = RetryPolicy(budget=False)
+
+        for _ in range(100):
+            self.assertTrue(policy.allow_retry('GET', 500, 0, None))
+
+        self.assertEqual(policy.stats.retries, 100)
+
+
+if __name__ == '__main__':
+    main()
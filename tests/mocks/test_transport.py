@@ -0,0 +1,72 @@
+from json import loads
+from os import remove
+from tempfile import mkstemp
+from unittest import TestCase, main
+
+from requests import Request
+
+from stormpath.testing import FakeStormpathAPI, RecordingAdapter, ReplayAdapter
+from stormpath.testing.transport import normalize_url
+
+
+class TestRecordReplay(TestCase):
+
+    def setUp(self):
+        _, self.path = mkstemp()
+        self.addCleanup(remove, self.path)
+
+    def test_normalize_url_sorts_query(self):
+        self.assertEqual(
+            normalize_url('https://api.stormpath.com/v1/accounts?offset=25&limit=25'),
+            'https://api.stormpath.com/v1/accounts?limit=25&offset=25')
+
+    def login(self, client):
+        application = client.applications.create({'name': 'app'}, create_directory=True)
+        application.accounts.create({'email': 'john@example.com', 'password': 'Password1!',
+            'given_name': 'John', 'surname': 'Doe'})
+
+        result = application.authenticate_account('john@example.com', 'Password1!')
+        self.assertEqual(result.account.email, 'john@example.com')
+
+        return application
+
+    def test_record_and_replay(self):
+        api = FakeStormpathAPI()
+        recorder = RecordingAdapter(self.path, adapter=api)
+        self.login(api.client(transport=recorder))
+
+        with open(self.path) as f:
+            exchanges = [loads(line) for line in f]
+
+        self.assertEqual(len(exchanges), recorder.recorded)
+        self.assertIn(('POST', 201), [(e['method'], e['status']) for e in exchanges])
+
+        replay = ReplayAdapter(self.path)
+        requests = api.requests
+
+        application = self.login(api.client(transport=replay))
+        for _ in range(3):
+            result = application.authenticate_account('john@example.com', 'Password1!')
+            self.assertEqual(result.account.email, 'john@example.com')
+
+        self.assertEqual(api.requests, requests)
+        self.assertEqual(replay.replayed, recorder.recorded + 3)
+
+    def test_replay_latency_and_unknown_requests(self):
+        api = FakeStormpathAPI()
+        recorder = RecordingAdapter(self.path, adapter=api)
+        recorder.send(Request('GET', api.tenant).prepare())
+
+        seen = []
+        replay = ReplayAdapter(self.path, latency=lambda exchange: seen.append(exchange['url']))
+
+        r = replay.send(Request('GET', api.tenant).prepare())
+        self.assertEqual(r.json()['name'], 'fake')
+        self.assertEqual(seen, [api.tenant])
+
+        with self.assertRaises(LookupError):
+            replay.send(Request('GET', api.tenant + 'X').prepare())
+
+
+if __name__ == '__main__':
+    main()